@@ -1,19 +1,83 @@
 import os
+import json
+import math
+import time
 import logging
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
-import docx
-from utils.job_scraper import scrape_job_details
-from utils.openai_cover_letter import interpret_job_details, generate_cover_letter
+from utils.job_scraper import direct_breaker, scrape_job_details, get_page_cache, route_stats
+from utils.background_jobs import (
+    FINISHED_STATUSES, JOB_PRIORITY_MAX, JOB_TYPES, JOB_WAIT_MAX, JOB_WAIT_POLL, get_job_queue,
+)
+from utils.job_queue import QueueFull
+from utils.letter_render import (
+    FORMATS, get_render_cache, iter_zip_batch, list_templates, prepare_batch, prepare_letter, render_letter,
+)
+from utils.batch import BATCH_MAX_URLS, iter_batch_results, parse_job_urls, validate_job_urls
+from utils.block_detector import block_stats
+from utils.http_pools import pools
+from utils.metrics import HTTP_REQUEST_SECONDS, finish_profile, registry, stage_timer, start_profile
+from utils.rate_limit import RateLimited
+from utils.profile_store import (
+    DEFAULT_PROFILE, delete_profile, get_profile, get_profile_store, save_profile, summary_warning,
+)
+from utils.openai_cover_letter import (
+    COVER_LETTER_VARIANTS_MAX,
+    interpret_job_details,
+    generate_cover_letter,
+    generate_cover_letter_variants,
+    stream_cover_letter,
+    extract_and_generate,
+    get_job_data_cache,
+    openai_breaker,
+    usage_stats,
+)
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=["Content-Disposition"])  # lets the form name downloaded letters
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def cache_metrics():
+    """Prometheus samples for the page, job data and profile caches."""
+    caches = {"pages": get_page_cache(), "job_data": get_job_data_cache(), "profiles": get_profile_store(),
+              "renders": get_render_cache()}
+    caches = {name: cache.stats() for name, cache in caches.items() if cache is not None}
+    for field in ("hits", "misses", "evictions"):
+        yield (f"cover_letter_cache_{field}_total", "counter", f"Cache {field} by cache",
+               [({"cache": name}, stats[field]) for name, stats in caches.items()])
+    yield ("cover_letter_cache_entries", "gauge", "Entries in each cache",
+           [({"cache": name}, stats["entries"]) for name, stats in caches.items()])
+
+registry.register_collector(cache_metrics)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.profiler = start_profile(request.headers)
+
+@app.after_request
+def record_request_time(response):
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    elapsed = time.perf_counter() - g.get("request_started", time.perf_counter())
+    HTTP_REQUEST_SECONDS.observe(elapsed, endpoint=endpoint, method=request.method, status=response.status_code)
+    if g.get("profiler") is not None:
+        response.headers["X-Profile-File"] = finish_profile(g.pop("profiler"), endpoint)
+    return response
+
+@app.teardown_request
+def stop_unfinished_profile(exc):
+    # A request that failed before after_request ran must still release the profiler
+    if g.get("profiler") is not None:
+        finish_profile(g.pop("profiler"), request.url_rule.rule if request.url_rule else "unmatched")
+
+def retry_after_header(e):
+    """Retry-After header for a RateLimited error, so clients back off instead of retrying at once."""
+    return {"Retry-After": str(max(1, math.ceil(e.retry_after or 1)))}
+
 def extract_text_from_file(file):
     """Extract text from uploaded TXT or DOCX file."""
     filename = secure_filename(file.filename)
@@ -21,8 +85,10 @@ def extract_text_from_file(file):
     if filename.endswith('.txt'):
         return file.read().decode('utf-8')
     elif filename.endswith('.docx'):
-        doc = docx.Document(file)
-        return '\n'.join([paragraph.text for paragraph in doc.paragraphs])
+        with stage_timer("docx_parse"):
+            import docx  # only uploads need python-docx, so it stays out of worker startup
+            doc = docx.Document(file)
+            return '\n'.join([paragraph.text for paragraph in doc.paragraphs])
     else:
         raise ValueError("Unsupported file format. Please use TXT or DOCX files.")
 
@@ -54,56 +120,130 @@ def extract_job_details():
             "success": True
         })
 
+    except RateLimited as e:
+        return jsonify({"error": str(e), "success": False}), 503, retry_after_header(e)
     except Exception as e:
         logger.error(f"Job extraction error: {e}")
         return jsonify({"error": str(e), "success": False}), 500
 
-@app.route("/generate-cover-letter", methods=["POST"])
-def generate_cover_letter_endpoint():
-    """Step 2: Generate cover letter from job details and user profile."""
-    logger.info("Request received at /generate-cover-letter")
-    
+def parse_user_letter():
+    """The user's letter/profile from a stored profile ID, JSON, form text or an uploaded TXT/DOCX file.
+
+    Returns (user_cover_letter, error_response); falls back to DEFAULT_PROFILE.
+    A stored profile supplies its precomputed summary, so nothing is re-parsed.
+    """
     # Handle both JSON and form data
     if request.is_json:
         data = request.get_json()
-        job_data = data.get("job_data")
+        profile_id = data.get("profile_id")
         user_cover_letter = data.get("cover_letter_text", "")
     else:
-        job_data = request.form.get("job_data")
+        profile_id = request.form.get("profile-id")
         user_cover_letter = request.form.get("cover-letter-text", "")
-        
-        # Handle file upload
-        if 'file-upload' in request.files:
-            file = request.files['file-upload']
-            if file and file.filename:
-                try:
-                    file_content = extract_text_from_file(file)
-                    user_cover_letter = file_content if file_content else user_cover_letter
-                except Exception as e:
-                    return jsonify({"error": f"File processing error: {str(e)}"}), 400
+
+    if profile_id:
+        profile = get_profile(profile_id)
+        if profile is None:
+            return None, (jsonify({"error": "Profile not found; upload it again via /profiles"}), 404)
+        return profile["summary"], None
+
+    # Handle file upload
+    if not request.is_json and 'file-upload' in request.files:
+        file = request.files['file-upload']
+        if file and file.filename:
+            try:
+                file_content = extract_text_from_file(file)
+                user_cover_letter = file_content if file_content else user_cover_letter
+            except Exception as e:
+                return None, (jsonify({"error": f"File processing error: {str(e)}"}), 400)
+
+    # Use default profile if no cover letter provided
+    if not user_cover_letter.strip():
+        user_cover_letter = DEFAULT_PROFILE
+    return user_cover_letter, None
+
+def parse_generation_request():
+    """Read job data and the user's letter/profile from a JSON or form request.
+
+    Returns (job_data, user_cover_letter, error_response); error_response is a
+    (response, status) tuple when the request is invalid, otherwise None.
+    """
+    if request.is_json:
+        job_data = request.get_json().get("job_data")
+    else:
+        job_data = request.form.get("job_data")
+
+    user_cover_letter, error = parse_user_letter()
+    if error:
+        return None, None, error
 
     if not job_data:
-        return jsonify({"error": "No job data provided"}), 400
+        return None, None, (jsonify({"error": "No job data provided"}), 400)
 
     # Parse job_data if it's a string
     if isinstance(job_data, str):
-        import json
         try:
             job_data = json.loads(job_data)
         except json.JSONDecodeError:
-            return jsonify({"error": "Invalid job data format"}), 400
+            return None, None, (jsonify({"error": "Invalid job data format"}), 400)
 
-    # Use default profile if no cover letter provided
-    if not user_cover_letter.strip():
-        user_cover_letter = """
-        Joshua Carr - Mechanical Engineer
-        Experience:
-        - Mincham Aviation: rebuilding and maintaining industrial equipment
-        - University of Glasgow: designing and prototyping mechanical systems  
-        - Buzz Drones: manufacturing high-precision components
-        """
+    return job_data, user_cover_letter, None
 
+def parse_variant_options(data):
+    """Variants-mode options from a JSON body or form: (count, tones), or (None, None) for one letter.
+
+    "variants" is the number of letters (1 to COVER_LETTER_VARIANTS_MAX); "tones"
+    is a list (or comma-separated string) of TONE_PRESETS names. Raises
+    ValueError with a message for the client when either is malformed.
+    """
+    count = data.get("variants")
+    tones = data.get("tones") or []
+    if isinstance(tones, str):
+        tones = [tone.strip() for tone in tones.split(",") if tone.strip()]
+    if not isinstance(tones, list) or not all(isinstance(tone, str) for tone in tones):
+        raise ValueError("Tones must be a list of tone names")
+    if count in (None, "") and not tones:
+        return None, None
+    if count in (None, ""):
+        count = len(tones)
+    elif isinstance(count, bool) or not isinstance(count, (int, str)):
+        raise ValueError("Number of variants must be an integer")
     try:
+        count = int(count)
+    except ValueError:
+        raise ValueError("Number of variants must be an integer")
+    if not 1 <= count <= COVER_LETTER_VARIANTS_MAX:
+        raise ValueError(f"Number of variants must be between 1 and {COVER_LETTER_VARIANTS_MAX}")
+    return count, tones
+
+@app.route("/generate-cover-letter", methods=["POST"])
+def generate_cover_letter_endpoint():
+    """Step 2: Generate cover letter from job details and user profile.
+
+    With "variants" (and optionally "tones") set, returns several alternative
+    letters from one request under "variants", with latency and token cost.
+    """
+    logger.info("Request received at /generate-cover-letter")
+
+    job_data, user_cover_letter, error = parse_generation_request()
+    if error:
+        return error
+
+    try:
+        count, tones = parse_variant_options(request.get_json() if request.is_json else request.form)
+    except ValueError as e:
+        return jsonify({"error": str(e), "success": False}), 400
+
+    try:
+        if count:
+            report = generate_cover_letter_variants(job_data, user_cover_letter, count, tones)
+            return jsonify({
+                "job_data": job_data,
+                "cover_letter": report["variants"][0]["cover_letter"] if report["variants"] else "",
+                **report,
+                "success": True
+            })
+
         # Generate personalized cover letter using GPT-4
         cover_letter = generate_cover_letter(job_data, user_cover_letter)
 
@@ -113,10 +253,334 @@ def generate_cover_letter_endpoint():
             "success": True
         })
 
+    except ValueError as e:
+        return jsonify({"error": str(e), "success": False}), 400
+    except RateLimited as e:
+        return jsonify({"error": str(e), "success": False}), 503, retry_after_header(e)
     except Exception as e:
         logger.error(f"Cover letter generation error: {e}")
         return jsonify({"error": str(e), "success": False}), 500
 
+@app.route("/generate-cover-letter/one-shot", methods=["POST"])
+def one_shot_cover_letter():
+    """Job URL to cover letter in one step: one OpenAI call returns the job data and the letter.
+
+    For users who don't need to review the extracted fields; the two-step
+    endpoints remain for those who do.
+    """
+    logger.info("Request received at /generate-cover-letter/one-shot")
+
+    if request.is_json:
+        job_url = request.get_json().get("job_url")
+    else:
+        job_url = request.form.get("job-url")
+    if not job_url:
+        return jsonify({"error": "No job URL provided"}), 400
+
+    user_cover_letter, error = parse_user_letter()
+    if error:
+        return error
+
+    try:
+        raw_text = scrape_job_details(job_url)
+        job_data, cover_letter = extract_and_generate(raw_text, user_cover_letter)
+
+        return jsonify({
+            "job_data": job_data,
+            "cover_letter": cover_letter,
+            "success": True
+        })
+
+    except RateLimited as e:
+        return jsonify({"error": str(e), "success": False}), 503, retry_after_header(e)
+    except Exception as e:
+        logger.error(f"One-shot cover letter error: {e}")
+        return jsonify({"error": str(e), "success": False}), 500
+
+def sse_event(event, data):
+    """Format one server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route("/generate-cover-letter/stream", methods=["POST"])
+def generate_cover_letter_stream_endpoint():
+    """Step 2 (streaming): send the cover letter as server-sent events while it is generated.
+
+    Events: "token" ({"text": ...}) for each chunk, then "done" with timings
+    ({"ttfb_ms", "total_ms", "length"}) or "error" ({"error": ...}).
+    """
+    logger.info("Request received at /generate-cover-letter/stream")
+    started = time.perf_counter()
+
+    job_data, user_cover_letter, error = parse_generation_request()
+    if error:
+        return error
+
+    def events():
+        ttfb_ms = None
+        length = 0
+        try:
+            for text in stream_cover_letter(job_data, user_cover_letter):
+                if ttfb_ms is None:
+                    ttfb_ms = round((time.perf_counter() - started) * 1000, 1)
+                    logger.info(f"Cover letter stream TTFB: {ttfb_ms}ms")
+                length += len(text)
+                yield sse_event("token", {"text": text})
+        except Exception as e:
+            logger.error(f"Cover letter streaming error: {e}")
+            yield sse_event("error", {"error": str(e)})
+            return
+        total_ms = round((time.perf_counter() - started) * 1000, 1)
+        logger.info(f"Cover letter stream finished in {total_ms}ms ({length} characters)")
+        yield sse_event("done", {"ttfb_ms": ttfb_ms, "total_ms": total_ms, "length": length})
+
+    return Response(events(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # stop reverse proxies from buffering the stream
+    })
+
+def profile_view(profile):
+    """A stored profile for API responses: everything but the full text, plus a warning if the summary is partial."""
+    view = {key: value for key, value in profile.items() if key != "text"}
+    warning = summary_warning(profile)
+    if warning:
+        view["warning"] = warning
+    return view
+
+@app.route("/profiles", methods=["POST"])
+def upload_profile():
+    """Store a letter/profile once (TXT/DOCX upload or text) and return its profile ID.
+
+    Pass the ID as "profile_id" (JSON) or "profile-id" (form) to the generation
+    endpoints instead of re-sending the file.
+    """
+    filename = None
+    if request.is_json:
+        text = (request.get_json().get("cover_letter_text") or "")
+    else:
+        text = request.form.get("cover-letter-text", "")
+        file = request.files.get("file-upload")
+        if file and file.filename:
+            filename = secure_filename(file.filename)
+            try:
+                text = extract_text_from_file(file)
+            except Exception as e:
+                return jsonify({"error": f"File processing error: {str(e)}", "success": False}), 400
+
+    try:
+        profile = save_profile(text, filename=filename)
+    except ValueError as e:
+        return jsonify({"error": str(e), "success": False}), 400
+    return jsonify({**profile_view(profile), "success": True}), 201
+
+@app.route("/profiles/<profile_id>", methods=["GET", "DELETE"])
+def profile_detail(profile_id):
+    """Look up a stored profile's metadata and summary, or delete it."""
+    profile = get_profile(profile_id)
+    if profile is None:
+        return jsonify({"error": "Profile not found", "success": False}), 404
+    if request.method == "DELETE":
+        delete_profile(profile_id)
+        return jsonify({"profile_id": profile_id, "deleted": True, "success": True})
+    return jsonify({**profile_view(profile), "success": True})
+
+def parse_batch_request():
+    """Job URLs from {"job_urls": [...]} JSON or an NDJSON/plain-text body (one URL per line)."""
+    if request.is_json:
+        return validate_job_urls(request.get_json().get("job_urls") or [])
+    return validate_job_urls(parse_job_urls(request.get_data(as_text=True).splitlines()))
+
+@app.route("/batch/extract-job-details", methods=["POST"])
+def batch_extract_job_details():
+    """Scrape and interpret many job URLs, streaming one NDJSON result per line as each finishes."""
+    logger.info("Request received at /batch/extract-job-details")
+
+    try:
+        job_urls = parse_batch_request()
+    except (ValueError, AttributeError) as e:
+        return jsonify({"error": f"Invalid batch format: {e}"}), 400
+
+    if not job_urls:
+        return jsonify({"error": "No job URLs provided"}), 400
+    if len(job_urls) > BATCH_MAX_URLS:
+        return jsonify({"error": f"Too many job URLs (max {BATCH_MAX_URLS})"}), 400
+
+    def lines():
+        for result in iter_batch_results(job_urls):
+            yield json.dumps(result) + "\n"
+
+    return Response(lines(), mimetype="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
+
+def download_headers(item):
+    """Attachment headers for a rendered letter; the ETag is its content hash so re-downloads revalidate cheaply."""
+    return {
+        "Content-Disposition": f'attachment; filename="{item["filename"]}"',
+        "ETag": f'"{item["key"]}"',
+        "Cache-Control": "private, no-cache",
+    }
+
+@app.route("/render-templates")
+def render_templates():
+    """Letter templates and formats accepted by the render endpoints."""
+    return jsonify({"templates": list_templates(), "formats": list(FORMATS), "success": True})
+
+@app.route("/render-cover-letter", methods=["POST"])
+def render_cover_letter_endpoint():
+    """Render a letter to DOCX or PDF through a letter template and return it as a download.
+
+    Body: {"cover_letter", "format": "docx" | "pdf", "template", "job_data", "name"};
+    job_data fills the template's [Company Name]/[Job Title] and names the file.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        item = prepare_letter(data.get("cover_letter"), data.get("format", "docx"), data.get("template"),
+                              data.get("job_data"), data.get("name"))
+    except ValueError as e:
+        return jsonify({"error": str(e), "success": False}), 400
+
+    if request.if_none_match.contains(item["key"]):
+        return Response(status=304, headers=download_headers(item))
+    try:
+        document = render_letter(item)
+    except Exception as e:
+        return jsonify({"error": str(e), "success": False}), 500
+    return Response(document, mimetype=FORMATS[item["fmt"]], headers=download_headers(item))
+
+@app.route("/batch/render-cover-letters", methods=["POST"])
+def batch_render_cover_letters():
+    """Render many letters and stream them back as one zip, adding each file as soon as it is rendered.
+
+    Body: {"letters": [{"cover_letter", "job_data", "name", "template"}, ...], "format", "template"}.
+    Letters that fail to render are listed in errors.txt inside the zip.
+    """
+    logger.info("Request received at /batch/render-cover-letters")
+    data = request.get_json(silent=True) or {}
+    try:
+        items = prepare_batch(data.get("letters"), data.get("format", "docx"), data.get("template"))
+    except ValueError as e:
+        return jsonify({"error": str(e), "success": False}), 400
+
+    return Response(iter_zip_batch(items), mimetype="application/zip", headers={
+        "Content-Disposition": 'attachment; filename="cover_letters.zip"',
+        "X-Accel-Buffering": "no",
+    })
+
+def job_payload(data):
+    """Validate a POST /jobs body; returns (job_type, payload, error_message)."""
+    job_type = data.get("type", "pipeline")
+    if job_type not in JOB_TYPES:
+        return None, None, f"Unknown job type '{job_type}' (expected one of {', '.join(JOB_TYPES)})"
+
+    payload = {}
+    if job_type in ("extract", "pipeline"):
+        if not data.get("job_url"):
+            return None, None, "No job URL provided"
+        payload["job_url"] = data["job_url"]
+    if job_type == "generate":
+        if not isinstance(data.get("job_data"), dict):
+            return None, None, "No job data provided"
+        payload["job_data"] = data["job_data"]
+    if job_type in ("generate", "pipeline"):
+        if data.get("profile_id"):
+            profile = get_profile(data["profile_id"])
+            if profile is None:
+                return None, None, "Profile not found"
+            payload["cover_letter_text"] = profile["summary"]
+        else:
+            payload["cover_letter_text"] = data.get("cover_letter_text", "").strip() or DEFAULT_PROFILE
+    return job_type, payload, None
+
+def job_priority(data):
+    """Validate the optional "priority" of a POST /jobs body; returns (priority, error_message)."""
+    priority = data.get("priority", 0)
+    if isinstance(priority, str) and priority.strip().lstrip("-").isdigit():
+        priority = int(priority)
+    if isinstance(priority, bool) or not isinstance(priority, int) or abs(priority) > JOB_PRIORITY_MAX:
+        return None, f"Priority must be an integer between -{JOB_PRIORITY_MAX} and {JOB_PRIORITY_MAX}"
+    return priority, None
+
+@app.route("/jobs", methods=["POST"])
+def submit_job():
+    """Queue a background job and return its ID immediately.
+
+    Body: {"type": "extract" | "generate" | "pipeline", "priority": int, ...}
+    with job_url and/or job_data/cover_letter_text as for the sync endpoints.
+    """
+    data = request.get_json(silent=True) or {}
+    job_type, payload, error = job_payload(data)
+    priority, priority_error = job_priority(data)
+    if error or priority_error:
+        return jsonify({"error": error or priority_error, "success": False}), 400
+
+    try:
+        job_id = get_job_queue().submit(job_type, payload, priority=priority)
+    except QueueFull as e:
+        return jsonify({"error": str(e), "success": False}), 503, {"Retry-After": "5"}
+
+    return jsonify({"job_id": job_id, "status": "queued", "success": True}), 202
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    """Poll a background job's status; includes the result once it has succeeded."""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found", "success": False}), 404
+    return jsonify(job_view(job))
+
+def job_wait_options(args):
+    """(status the client last saw, seconds to wait) from a /jobs/<id>/wait query string."""
+    try:
+        timeout = float(args.get("timeout", JOB_WAIT_MAX))
+    except ValueError:
+        timeout = JOB_WAIT_MAX
+    return args.get("status"), max(0.0, min(timeout, JOB_WAIT_MAX))
+
+def job_changed(job, seen_status):
+    return job["status"] != seen_status or job["status"] in FINISHED_STATUSES
+
+@app.route("/jobs/<job_id>/wait")
+def job_wait(job_id):
+    """Long-poll a job: answers as soon as its status differs from ?status= (or it has finished).
+
+    Waits at most JOB_WAIT_MAX seconds (?timeout= can shorten it), then returns
+    the unchanged job; clients loop, passing the status they last saw. While
+    waiting the request blocks its sync worker, so JOB_WAIT_MAX stays well below
+    the gunicorn timeout and size WEB_CONCURRENCY for the expected number of
+    waiting clients. Event streams that stay open for a whole job are only
+    offered by async_app.
+    """
+    seen_status, timeout = job_wait_options(request.args)
+    queue = get_job_queue()
+    deadline = time.time() + timeout
+    job = queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found", "success": False}), 404
+    while not job_changed(job, seen_status) and time.time() < deadline:
+        time.sleep(min(JOB_WAIT_POLL, max(0.0, deadline - time.time())))
+        job = queue.get(job_id)
+    return jsonify(job_view(job))
+
+@app.route("/jobs/metrics")
+def job_metrics():
+    """Queue depth, queue latency and run time for background jobs."""
+    return jsonify(get_job_queue().metrics())
+
+def job_view(job):
+    view = {
+        "job_id": job["id"],
+        "type": job["kind"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "priority": job["priority"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+    }
+    if job["status"] == "succeeded":
+        view["result"] = job["result"]
+    if job["error"]:
+        view["error"] = job["error"]
+    return view
+
 @app.route("/process-cover-letter", methods=["POST"])
 def process_cover_letter():
     """Legacy endpoint - redirects to two-step process."""
@@ -126,10 +590,28 @@ def process_cover_letter():
         "success": False
     }), 400
 
+@app.route("/metrics")
+def metrics():
+    """Prometheus metrics: stage latency histograms, scrape/fallback/block counters, tokens and caches."""
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
 @app.route("/health")
 def health_check():
     """Health check endpoint."""
-    return jsonify({"status": "healthy"}), 200
+    caches = {}
+    for name, cache in (("pages", get_page_cache()), ("job_data", get_job_data_cache()), ("profiles", get_profile_store()),
+                        ("renders", get_render_cache())):
+        if cache is not None:
+            caches[name] = cache.stats()
+    return jsonify({
+        "status": "healthy",
+        "caches": caches,
+        "scrape_routes": route_stats.stats(),
+        "open_breakers": {"direct": direct_breaker.open_keys(), "openai": openai_breaker.open_keys()},
+        "pools": pools.stats(),
+        "blocks": block_stats.stats(),
+        "tokens": usage_stats.stats(),
+    }), 200
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 10000))
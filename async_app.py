@@ -0,0 +1,476 @@
+"""Async (ASGI) version of the API for I/O-bound load.
+
+Serves the same endpoints as app.py, but scraping and OpenAI calls are
+non-blocking, so a single worker can hold hundreds of in-flight requests:
+
+    hypercorn async_app:app --bind 0.0.0.0:$PORT
+
+The sync Flask app (gunicorn app:app) remains the default deployment.
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+from quart import Quart, Response, g, request, jsonify
+from quart_cors import cors
+from werkzeug.utils import secure_filename
+from app import (
+    download_headers, extract_text_from_file, job_changed, job_payload, job_priority, job_view, job_wait_options, parse_variant_options, profile_view,
+    retry_after_header, sse_event,
+)
+from utils.background_jobs import FINISHED_STATUSES, JOB_WAIT_POLL, get_job_queue
+from utils.job_queue import QueueFull
+from utils.letter_render import (
+    FORMATS, async_iter_zip_batch, async_render_letter, get_render_cache, list_templates, prepare_batch,
+    prepare_letter,
+)
+from utils.job_scraper import async_scrape_job_details, direct_breaker, get_page_cache, route_stats
+from utils.batch import BATCH_MAX_URLS, async_iter_batch_results, parse_job_urls, validate_job_urls
+from utils.block_detector import block_stats
+from utils.http_pools import pools
+from utils.metrics import HTTP_REQUEST_SECONDS, finish_profile, registry, start_profile
+from utils.rate_limit import RateLimited
+from utils.profile_store import DEFAULT_PROFILE, delete_profile, get_profile, get_profile_store, save_profile
+from utils.openai_cover_letter import (
+    async_interpret_job_details,
+    async_generate_cover_letter,
+    async_generate_cover_letter_variants,
+    async_stream_cover_letter,
+    async_extract_and_generate,
+    get_job_data_cache,
+    openai_breaker,
+    usage_stats,
+)
+
+app = Quart(__name__)
+app = cors(app, expose_headers=["Content-Disposition"])
+app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+@app.before_request
+async def start_request_timer():
+    g.request_started = time.perf_counter()
+    # cProfile sees the whole event loop, so a profile also includes concurrent requests
+    g.profiler = start_profile(request.headers)
+
+@app.after_request
+async def record_request_time(response):
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    elapsed = time.perf_counter() - g.get("request_started", time.perf_counter())
+    HTTP_REQUEST_SECONDS.observe(elapsed, endpoint=endpoint, method=request.method, status=response.status_code)
+    if g.get("profiler") is not None:
+        response.headers["X-Profile-File"] = finish_profile(g.pop("profiler"), endpoint)
+    return response
+
+@app.teardown_request
+async def stop_unfinished_profile(exc):
+    # A request that failed before after_request ran must still release the profiler
+    if g.get("profiler") is not None:
+        finish_profile(g.pop("profiler"), request.url_rule.rule if request.url_rule else "unmatched")
+
+async def parse_user_letter():
+    """Async counterpart of app.parse_user_letter."""
+    if request.is_json:
+        data = await request.get_json()
+        profile_id = data.get("profile_id")
+        user_cover_letter = data.get("cover_letter_text", "")
+    else:
+        form = await request.form
+        profile_id = form.get("profile-id")
+        user_cover_letter = form.get("cover-letter-text", "")
+
+    if profile_id:
+        profile = await asyncio.to_thread(get_profile, profile_id)
+        if profile is None:
+            return None, (jsonify({"error": "Profile not found; upload it again via /profiles"}), 404)
+        return profile["summary"], None
+
+    # Handle file upload; DOCX parsing is CPU-bound so keep it off the event loop
+    if not request.is_json:
+        files = await request.files
+        file = files.get('file-upload')
+        if file and file.filename:
+            try:
+                file_content = await asyncio.to_thread(extract_text_from_file, file)
+                user_cover_letter = file_content if file_content else user_cover_letter
+            except Exception as e:
+                return None, (jsonify({"error": f"File processing error: {str(e)}"}), 400)
+
+    if not user_cover_letter.strip():
+        user_cover_letter = DEFAULT_PROFILE
+    return user_cover_letter, None
+
+async def parse_generation_request():
+    """Async counterpart of app.parse_generation_request."""
+    if request.is_json:
+        job_data = (await request.get_json()).get("job_data")
+    else:
+        job_data = (await request.form).get("job_data")
+
+    user_cover_letter, error = await parse_user_letter()
+    if error:
+        return None, None, error
+
+    if not job_data:
+        return None, None, (jsonify({"error": "No job data provided"}), 400)
+
+    if isinstance(job_data, str):
+        try:
+            job_data = json.loads(job_data)
+        except json.JSONDecodeError:
+            return None, None, (jsonify({"error": "Invalid job data format"}), 400)
+
+    return job_data, user_cover_letter, None
+
+@app.route("/extract-job-details", methods=["POST"])
+async def extract_job_details():
+    """Step 1: Extract and parse job details from job URL."""
+    logger.info("Request received at /extract-job-details (async)")
+
+    if request.is_json:
+        data = await request.get_json()
+        job_url = data.get("job_url")
+    else:
+        job_url = (await request.form).get("job-url")
+
+    if not job_url:
+        return jsonify({"error": "No job URL provided"}), 400
+
+    try:
+        raw_text = await async_scrape_job_details(job_url)
+        job_data = await async_interpret_job_details(raw_text)
+
+        return jsonify({
+            "job_data": job_data,
+            "raw_text": raw_text[:2000],  # First 2000 chars for review
+            "success": True
+        })
+
+    except RateLimited as e:
+        return jsonify({"error": str(e), "success": False}), 503, retry_after_header(e)
+    except Exception as e:
+        logger.error(f"Job extraction error: {e}")
+        return jsonify({"error": str(e), "success": False}), 500
+
+@app.route("/generate-cover-letter", methods=["POST"])
+async def generate_cover_letter_endpoint():
+    """Step 2: Generate cover letter from job details and user profile (variants mode as in app.py)."""
+    logger.info("Request received at /generate-cover-letter (async)")
+
+    job_data, user_cover_letter, error = await parse_generation_request()
+    if error:
+        return error
+
+    try:
+        count, tones = parse_variant_options(await request.get_json() if request.is_json else await request.form)
+    except ValueError as e:
+        return jsonify({"error": str(e), "success": False}), 400
+
+    try:
+        if count:
+            report = await async_generate_cover_letter_variants(job_data, user_cover_letter, count, tones)
+            return jsonify({
+                "job_data": job_data,
+                "cover_letter": report["variants"][0]["cover_letter"] if report["variants"] else "",
+                **report,
+                "success": True
+            })
+
+        cover_letter = await async_generate_cover_letter(job_data, user_cover_letter)
+
+        return jsonify({
+            "job_data": job_data,
+            "cover_letter": cover_letter,
+            "success": True
+        })
+
+    except ValueError as e:
+        return jsonify({"error": str(e), "success": False}), 400
+    except RateLimited as e:
+        return jsonify({"error": str(e), "success": False}), 503, retry_after_header(e)
+    except Exception as e:
+        logger.error(f"Cover letter generation error: {e}")
+        return jsonify({"error": str(e), "success": False}), 500
+
+@app.route("/generate-cover-letter/one-shot", methods=["POST"])
+async def one_shot_cover_letter():
+    """Job URL to cover letter with one OpenAI call (see app.one_shot_cover_letter)."""
+    logger.info("Request received at /generate-cover-letter/one-shot (async)")
+
+    if request.is_json:
+        job_url = (await request.get_json()).get("job_url")
+    else:
+        job_url = (await request.form).get("job-url")
+    if not job_url:
+        return jsonify({"error": "No job URL provided"}), 400
+
+    user_cover_letter, error = await parse_user_letter()
+    if error:
+        return error
+
+    try:
+        raw_text = await async_scrape_job_details(job_url)
+        job_data, cover_letter = await async_extract_and_generate(raw_text, user_cover_letter)
+
+        return jsonify({
+            "job_data": job_data,
+            "cover_letter": cover_letter,
+            "success": True
+        })
+
+    except RateLimited as e:
+        return jsonify({"error": str(e), "success": False}), 503, retry_after_header(e)
+    except Exception as e:
+        logger.error(f"One-shot cover letter error: {e}")
+        return jsonify({"error": str(e), "success": False}), 500
+
+@app.route("/generate-cover-letter/stream", methods=["POST"])
+async def generate_cover_letter_stream_endpoint():
+    """Step 2 (streaming): same events as app.generate_cover_letter_stream_endpoint."""
+    logger.info("Request received at /generate-cover-letter/stream (async)")
+    started = time.perf_counter()
+
+    job_data, user_cover_letter, error = await parse_generation_request()
+    if error:
+        return error
+
+    async def events():
+        ttfb_ms = None
+        length = 0
+        try:
+            async for text in async_stream_cover_letter(job_data, user_cover_letter):
+                if ttfb_ms is None:
+                    ttfb_ms = round((time.perf_counter() - started) * 1000, 1)
+                    logger.info(f"Cover letter stream TTFB: {ttfb_ms}ms")
+                length += len(text)
+                yield sse_event("token", {"text": text}).encode("utf-8")
+        except Exception as e:
+            logger.error(f"Cover letter streaming error: {e}")
+            yield sse_event("error", {"error": str(e)}).encode("utf-8")
+            return
+        total_ms = round((time.perf_counter() - started) * 1000, 1)
+        logger.info(f"Cover letter stream finished in {total_ms}ms ({length} characters)")
+        yield sse_event("done", {"ttfb_ms": ttfb_ms, "total_ms": total_ms, "length": length}).encode("utf-8")
+
+    response = Response(events(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+    response.timeout = None  # generation can outlive Quart's default response timeout
+    return response
+
+@app.route("/profiles", methods=["POST"])
+async def upload_profile():
+    """Store a letter/profile once and return its profile ID (see app.upload_profile)."""
+    filename = None
+    if request.is_json:
+        text = ((await request.get_json()).get("cover_letter_text") or "")
+    else:
+        form = await request.form
+        files = await request.files
+        text = form.get("cover-letter-text", "")
+        file = files.get("file-upload")
+        if file and file.filename:
+            filename = secure_filename(file.filename)
+            try:
+                text = await asyncio.to_thread(extract_text_from_file, file)
+            except Exception as e:
+                return jsonify({"error": f"File processing error: {str(e)}", "success": False}), 400
+
+    try:
+        profile = await asyncio.to_thread(save_profile, text, filename)
+    except ValueError as e:
+        return jsonify({"error": str(e), "success": False}), 400
+    return jsonify({**profile_view(profile), "success": True}), 201
+
+@app.route("/profiles/<profile_id>", methods=["GET", "DELETE"])
+async def profile_detail(profile_id):
+    """Look up a stored profile's metadata and summary, or delete it."""
+    profile = await asyncio.to_thread(get_profile, profile_id)
+    if profile is None:
+        return jsonify({"error": "Profile not found", "success": False}), 404
+    if request.method == "DELETE":
+        await asyncio.to_thread(delete_profile, profile_id)
+        return jsonify({"profile_id": profile_id, "deleted": True, "success": True})
+    return jsonify({**profile_view(profile), "success": True})
+
+@app.route("/batch/extract-job-details", methods=["POST"])
+async def batch_extract_job_details():
+    """Scrape and interpret many job URLs, streaming one NDJSON result per line as each finishes."""
+    logger.info("Request received at /batch/extract-job-details (async)")
+
+    try:
+        if request.is_json:
+            job_urls = validate_job_urls((await request.get_json()).get("job_urls") or [])
+        else:
+            job_urls = validate_job_urls(parse_job_urls((await request.get_data(as_text=True)).splitlines()))
+    except (ValueError, AttributeError) as e:
+        return jsonify({"error": f"Invalid batch format: {e}"}), 400
+
+    if not job_urls:
+        return jsonify({"error": "No job URLs provided"}), 400
+    if len(job_urls) > BATCH_MAX_URLS:
+        return jsonify({"error": f"Too many job URLs (max {BATCH_MAX_URLS})"}), 400
+
+    async def lines():
+        async for result in async_iter_batch_results(job_urls):
+            yield (json.dumps(result) + "\n").encode("utf-8")
+
+    response = Response(lines(), mimetype="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
+    response.timeout = None
+    return response
+
+@app.route("/render-templates")
+async def render_templates():
+    """Letter templates and formats accepted by the render endpoints."""
+    return jsonify({"templates": list_templates(), "formats": list(FORMATS), "success": True})
+
+@app.route("/render-cover-letter", methods=["POST"])
+async def render_cover_letter_endpoint():
+    """Render a letter to DOCX or PDF and return it as a download (see app.render_cover_letter_endpoint)."""
+    data = await request.get_json(silent=True) or {}
+    try:
+        item = prepare_letter(data.get("cover_letter"), data.get("format", "docx"), data.get("template"),
+                              data.get("job_data"), data.get("name"))
+    except ValueError as e:
+        return jsonify({"error": str(e), "success": False}), 400
+
+    if request.if_none_match.contains(item["key"]):
+        return Response(b"", status=304, headers=download_headers(item))
+    try:
+        document = await async_render_letter(item)
+    except Exception as e:
+        return jsonify({"error": str(e), "success": False}), 500
+    return Response(document, mimetype=FORMATS[item["fmt"]], headers=download_headers(item))
+
+@app.route("/batch/render-cover-letters", methods=["POST"])
+async def batch_render_cover_letters():
+    """Render many letters and stream them back as one zip (see app.batch_render_cover_letters)."""
+    logger.info("Request received at /batch/render-cover-letters (async)")
+    data = await request.get_json(silent=True) or {}
+    try:
+        items = prepare_batch(data.get("letters"), data.get("format", "docx"), data.get("template"))
+    except ValueError as e:
+        return jsonify({"error": str(e), "success": False}), 400
+
+    response = Response(async_iter_zip_batch(items), mimetype="application/zip", headers={
+        "Content-Disposition": 'attachment; filename="cover_letters.zip"',
+        "X-Accel-Buffering": "no",
+    })
+    response.timeout = None
+    return response
+
+@app.route("/jobs", methods=["POST"])
+async def submit_job():
+    """Queue a background job and return its ID immediately (see app.submit_job)."""
+    data = await request.get_json(silent=True) or {}
+    job_type, payload, error = await asyncio.to_thread(job_payload, data)  # may read a stored profile
+    priority, priority_error = job_priority(data)
+    if error or priority_error:
+        return jsonify({"error": error or priority_error, "success": False}), 400
+
+    try:
+        queue = await asyncio.to_thread(get_job_queue)
+        job_id = await asyncio.to_thread(queue.submit, job_type, payload, priority)
+    except QueueFull as e:
+        return jsonify({"error": str(e), "success": False}), 503, {"Retry-After": "5"}
+
+    return jsonify({"job_id": job_id, "status": "queued", "success": True}), 202
+
+@app.route("/jobs/<job_id>")
+async def job_status(job_id):
+    """Poll a background job's status; includes the result once it has succeeded."""
+    queue = await asyncio.to_thread(get_job_queue)
+    job = await asyncio.to_thread(queue.get, job_id)
+    if job is None:
+        return jsonify({"error": "Job not found", "success": False}), 404
+    return jsonify(job_view(job))
+
+@app.route("/jobs/<job_id>/events")
+async def job_events(job_id):
+    """Subscribe to a job: SSE "status" events on each change, ending when it finishes."""
+    queue = await asyncio.to_thread(get_job_queue)
+    if queue.get(job_id) is None:
+        return jsonify({"error": "Job not found", "success": False}), 404
+
+    async def events():
+        last_status = None
+        while True:
+            job = await asyncio.to_thread(queue.get, job_id)
+            if job["status"] != last_status:
+                last_status = job["status"]
+                yield sse_event("status", job_view(job)).encode("utf-8")
+            if job["status"] in FINISHED_STATUSES:
+                return
+            await asyncio.sleep(JOB_WAIT_POLL)
+
+    response = Response(events(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+    response.timeout = None
+    return response
+
+@app.route("/jobs/<job_id>/wait")
+async def job_wait(job_id):
+    """Long-poll a job (see app.job_wait)."""
+    seen_status, timeout = job_wait_options(request.args)
+    queue = await asyncio.to_thread(get_job_queue)
+    deadline = time.time() + timeout
+    job = await asyncio.to_thread(queue.get, job_id)
+    if job is None:
+        return jsonify({"error": "Job not found", "success": False}), 404
+    while not job_changed(job, seen_status) and time.time() < deadline:
+        await asyncio.sleep(min(JOB_WAIT_POLL, max(0.0, deadline - time.time())))
+        job = await asyncio.to_thread(queue.get, job_id)
+    return jsonify(job_view(job))
+
+@app.route("/jobs/metrics")
+async def job_metrics():
+    """Queue depth, queue latency and run time for background jobs."""
+    queue = await asyncio.to_thread(get_job_queue)
+    return jsonify(await asyncio.to_thread(queue.metrics))
+
+@app.route("/process-cover-letter", methods=["POST"])
+async def process_cover_letter():
+    """Legacy endpoint - redirects to two-step process."""
+    return jsonify({
+        "error": "This endpoint has been deprecated. Please use the two-step process: /extract-job-details then /generate-cover-letter",
+        "success": False
+    }), 400
+
+@app.route("/metrics")
+async def metrics():
+    """Prometheus metrics (see app.metrics)."""
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+def cache_stats():
+    """Stats for each configured cache; SQLite-backed ones query the database, so callers run this in a thread."""
+    caches = {}
+    for name, cache in (("pages", get_page_cache()), ("job_data", get_job_data_cache()), ("profiles", get_profile_store()),
+                        ("renders", get_render_cache())):
+        if cache is not None:
+            caches[name] = cache.stats()
+    return caches
+
+@app.route("/health")
+async def health_check():
+    """Health check endpoint."""
+    caches = await asyncio.to_thread(cache_stats)
+    return jsonify({
+        "status": "healthy",
+        "mode": "async",
+        "caches": caches,
+        "scrape_routes": route_stats.stats(),
+        "open_breakers": {"direct": direct_breaker.open_keys(), "openai": openai_breaker.open_keys()},
+        "pools": pools.stats(),
+        "blocks": block_stats.stats(),
+        "tokens": usage_stats.stats(),
+    }), 200
+
+if __name__ == "__main__":
+    port = int(os.environ.get("PORT", 10000))
+    app.run(host="0.0.0.0", port=port)
@@ -0,0 +1,288 @@
+"""Offline end-to-end benchmark: the real app against stub job pages, proxy and OpenAI.
+
+Boots app.py under gunicorn (or async_app.py under hypercorn) with every
+network dependency pointed at stub_server.StubServer and runs each load
+scenario in turn. A scenario uses the recorded pages (normal, huge, blocked,
+direct-blocked with proxy fallback) and a fixed number of requests at a
+fixed concurrency.
+
+For each scenario it reports throughput, latency p50/p95/p99, status codes,
+stub traffic and the peak RSS of every worker process. Results are written
+as JSON; pass --compare with an earlier file to print the differences.
+
+    python benchmarks/e2e_bench.py --output benchmarks/results/baseline.json
+    python benchmarks/e2e_bench.py --scenarios extract_normal,generate --compare benchmarks/results/baseline.json
+
+Caches are disabled so every request does the full work (unless it coalesces
+with an identical one in flight), and each run gets fresh rate limiter,
+circuit breaker and single-flight state.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from stub_server import JOB_DATA, StubServer, free_port  # noqa: E402
+
+PROFILE = "Jane Doe - Mechanical Engineer\nExperience:\n- Acme: designing ground support equipment"
+
+
+def _page_url(page, host="127.0.0.1"):
+    return lambda stub, i: {"job_url": f"http://{host}:{stub.port}/pages/{page}?n={i}"}
+
+
+# name -> (path, request body factory, expected status codes, streamed).
+# Pages that need the proxy are served under "localhost" so the scraper's
+# per-domain route stats do not make the other scenarios go proxy-first.
+SCENARIOS = {
+    "extract_normal": ("/extract-job-details", _page_url("seek_job"), {200}, False),
+    "extract_jsonld": ("/extract-job-details", _page_url("jsonld_job"), {200}, False),
+    # One ad shared many times: only the tracking parameter differs, so requests coalesce
+    "extract_same_url": ("/extract-job-details",
+                         lambda stub, i: {"job_url": f"{stub.url}/pages/seek_job?ref=share{i}"}, {200}, False),
+    "extract_huge": ("/extract-job-details", _page_url("huge"), {200}, False),
+    "extract_fallback": ("/extract-job-details", _page_url("seek_job_direct_blocked", "localhost"), {200}, False),
+    "extract_blocked": ("/extract-job-details", _page_url("blocked", "localhost"), {500}, False),
+    "generate": ("/generate-cover-letter",
+                 lambda stub, i: {"job_data": JOB_DATA, "cover_letter_text": f"{PROFILE}\n#{i}"}, {200}, False),
+    "generate_stream": ("/generate-cover-letter/stream",
+                        lambda stub, i: {"job_data": JOB_DATA, "cover_letter_text": f"{PROFILE}\n#{i}"}, {200}, True),
+    "one_shot": ("/generate-cover-letter/one-shot",
+                 lambda stub, i: {"job_url": f"{stub.url}/pages/seek_job?n={i}", "cover_letter_text": PROFILE},
+                 {200}, False),
+}
+
+
+def start_app(mode, port, env, workers, threads):
+    if mode == "async":
+        cmd = [sys.executable, "-m", "hypercorn", "async_app:app", "--bind", f"127.0.0.1:{port}",
+               "--workers", str(workers)]
+    else:
+        cmd = [sys.executable, "-m", "gunicorn", "app:app", "--bind", f"127.0.0.1:{port}",
+               "--workers", str(workers), "--threads", str(threads), "--timeout", "300"]
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/health", timeout=1).ok:
+                return proc
+        except requests.RequestException:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError(f"{mode} app did not start")
+
+
+def process_tree(root_pid):
+    """root_pid and its descendants (Linux /proc only; just root_pid elsewhere)."""
+    if not os.path.isdir("/proc"):
+        return [root_pid]
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    parents[int(entry)] = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+    tree = [root_pid]
+    for pid in tree:
+        tree.extend(child for child, parent in parents.items() if parent == pid)
+    return tree
+
+
+def rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+class RssSampler:
+    """Polls the RSS of the app's processes during a scenario and keeps each one's peak."""
+
+    def __init__(self, root_pid, interval=0.25):
+        self.root_pid = root_pid
+        self.interval = interval
+        self.peaks = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            for pid in process_tree(self.root_pid):
+                rss = rss_mb(pid)
+                if rss is not None:
+                    self.peaks[pid] = max(rss, self.peaks.get(pid, 0))
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def one_request(base_url, path, body, streamed):
+    """(status, total seconds, seconds to first byte of the body)."""
+    started = time.perf_counter()
+    with requests.post(f"{base_url}{path}", json=body, timeout=300, stream=streamed) as response:
+        first_byte = None
+        for chunk in response.iter_content(chunk_size=None):
+            if first_byte is None and chunk:
+                first_byte = time.perf_counter() - started
+        return response.status_code, time.perf_counter() - started, first_byte
+
+
+def run_scenario(name, base_url, stub, proc, total, concurrency, warmup):
+    path, make_body, expected, streamed = SCENARIOS[name]
+    for i in range(warmup):
+        one_request(base_url, path, make_body(stub, f"warmup-{i}"), streamed)
+
+    stub_before = dict(stub.stats)
+    with RssSampler(proc.pid) as sampler:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(lambda i: one_request(base_url, path, make_body(stub, i), streamed), range(total)))
+        elapsed = time.perf_counter() - started
+
+    latencies = [latency for _, latency, _ in results]
+    statuses = {}
+    for status, _, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    result = {
+        "requests": total,
+        "concurrency": concurrency,
+        "errors": sum(1 for status, _, _ in results if status not in expected),
+        "statuses": statuses,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 1),
+        "max_ms": round(max(latencies) * 1000, 1),
+        "stub_requests": {role: stub.stats[role] - stub_before[role] for role in stub.stats},
+        "peak_rss_mb": {str(pid): rss for pid, rss in sorted(sampler.peaks.items())},
+    }
+    if streamed:
+        result["ttfb_p50_ms"] = round(percentile([ttfb or 0 for _, _, ttfb in results], 50) * 1000, 1)
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline):
+    """Print per-scenario changes in latency and throughput against an earlier results file."""
+    print(f"\nvs {baseline['meta'].get('commit')} ({baseline['meta'].get('timestamp')})")
+    for name, row in current["scenarios"].items():
+        base = baseline["scenarios"].get(name)
+        if not base:
+            print(f"  {name:<18} (not in baseline)")
+            continue
+        changes = []
+        for field in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps"):
+            delta = (row[field] - base[field]) / base[field] * 100 if base[field] else 0.0
+            changes.append(f"{field} {base[field]:>8} -> {row[field]:>8} ({delta:+.1f}%)")
+        print(f"  {name:<18} " + "  ".join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["sync", "async"], default="sync")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset of: " + ", ".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=16, help="gunicorn threads per worker (sync mode)")
+    parser.add_argument("--page-latency", type=float, default=0.05)
+    parser.add_argument("--proxy-latency", type=float, default=0.3)
+    parser.add_argument("--openai-latency", type=float, default=0.5)
+    parser.add_argument("--domain-rate", type=float, default=1000.0,
+                        help="direct fetches/s per domain; every stub page shares one host, so unlimited by default")
+    parser.add_argument("--output", help="write the JSON results to this file")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    stub = StubServer(page_latency=args.page_latency, proxy_latency=args.proxy_latency,
+                      openai_latency=args.openai_latency).start()
+    state_dir = tempfile.mkdtemp(prefix="e2e_bench_")
+    env = dict(os.environ, **stub.app_env(),
+               PAGE_CACHE_BACKEND="none", JOB_DATA_CACHE_BACKEND="none", PROFILE_STORE_BACKEND="memory",
+               RATE_LIMIT_PATH=os.path.join(state_dir, "rate_limit.sqlite3"),
+               SINGLE_FLIGHT_PATH=os.path.join(state_dir, "single_flight.sqlite3"),
+               SCRAPE_DOMAIN_RATE=str(args.domain_rate), SCRAPE_DOMAIN_BURST=str(max(5.0, args.domain_rate)))
+    port = free_port()
+    proc = start_app(args.mode, port, env, args.workers, args.threads)
+    scenarios = {}
+    try:
+        for name in names:
+            scenarios[name] = run_scenario(name, f"http://127.0.0.1:{port}", stub, proc,
+                                           args.requests, args.concurrency, args.warmup)
+            print(f"{name:<18} {scenarios[name]['throughput_rps']:>8} rps  p50 {scenarios[name]['p50_ms']:>8} ms  "
+                  f"p95 {scenarios[name]['p95_ms']:>8} ms  p99 {scenarios[name]['p99_ms']:>8} ms  "
+                  f"errors {scenarios[name]['errors']}", file=sys.stderr)
+    finally:
+        proc.terminate()
+        proc.wait()
+        stub.shutdown()
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "scenarios": scenarios,
+    }
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+    else:
+        print(json.dumps(results, indent=2))
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Micro-benchmark for HTML-to-text extraction engines.
+
+Runs every engine in utils.html_text over a corpus of saved pages (default
+benchmarks/fixtures/pages) plus a synthetic "huge" page built from the Seek
+fixture with ~1.5MB of inline JSON, reporting time and peak allocation.
+
+    python benchmarks/html_extract_bench.py [--pages DIR] [--repeat 20]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils import html_text  # noqa: E402
+
+ENGINES = {
+    "bs4 (original)": lambda html: html_text.extract_text_bs4(html),
+    "lxml": lambda html: html_text.extract_job_text(html, engine="lxml"),
+    "stream": lambda html: html_text.extract_job_text(html, engine="stream"),
+    "auto (structured first)": lambda html: html_text.extract_job_text(html, engine="auto"),
+}
+
+
+def make_huge(html, size=1_500_000):
+    """Pad a page with a large inline JSON blob, like Seek's search results state."""
+    blob = json.dumps({"results": [{"id": i, "teaser": "x" * 200} for i in range(size // 220)]})
+    return html.replace("</head>", f"<script>window.__EXTRA__ = {blob};</script></head>", 1)
+
+
+def load_corpus(pages_dir):
+    corpus = {}
+    for name in sorted(os.listdir(pages_dir)):
+        if name.endswith(".html"):
+            with open(os.path.join(pages_dir, name), encoding="utf-8") as f:
+                corpus[name] = f.read()
+    if "seek_job.html" in corpus:
+        corpus["seek_job_huge (synthetic)"] = make_huge(corpus["seek_job.html"])
+    return corpus
+
+
+def measure(fn, html, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        text = fn(html)
+        timings.append((time.perf_counter() - started) * 1000)
+    tracemalloc.start()
+    fn(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "median_ms": round(statistics.median(timings), 3),
+        "mean_ms": round(statistics.mean(timings), 3),
+        "peak_kib": round(peak / 1024, 1),
+        "text_chars": len(text),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", default=os.path.join(ROOT, "benchmarks", "fixtures", "pages"))
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results only")
+    args = parser.parse_args()
+
+    results = {}
+    for name, html in load_corpus(args.pages).items():
+        results[name] = {"bytes": len(html)}
+        for engine, fn in ENGINES.items():
+            results[name][engine] = measure(fn, html, args.repeat)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    for name, row in results.items():
+        print(f"\n{name} ({row['bytes']:,} bytes)")
+        baseline = row["bs4 (original)"]["median_ms"]
+        for engine in ENGINES:
+            r = row[engine]
+            print(f"  {engine:<24} {r['median_ms']:>9.2f} ms  x{baseline / r['median_ms']:>6.1f}"
+                  f"  peak {r['peak_kib']:>9.1f} KiB  {r['text_chars']:>6} chars")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Concurrency load test: sync Flask (gunicorn) vs async Quart (hypercorn).
+
+Starts the stub OpenAI chat completions server (stub_server.py) that answers
+after a fixed delay, boots one worker of the chosen app pointed at it, then fires
+concurrent /generate-cover-letter requests and reports throughput and
+latency percentiles.
+
+    python benchmarks/load_test.py --mode sync --requests 100 --concurrency 50
+    python benchmarks/load_test.py --mode async --requests 100 --concurrency 50
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from stub_server import JOB_DATA, StubServer, free_port  # noqa: E402
+
+
+def start_app(mode, port, openai_url):
+    env = dict(os.environ, OPENAI_BASE_URL=openai_url, OPENAI_API_KEY="stub", PORT=str(port))
+    if mode == "async":
+        cmd = [sys.executable, "-m", "hypercorn", "async_app:app", "--bind", f"127.0.0.1:{port}", "--workers", "1"]
+    else:
+        cmd = [sys.executable, "-m", "gunicorn", "app:app", "--bind", f"127.0.0.1:{port}", "--workers", "1", "--timeout", "300"]
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/health", timeout=1).ok:
+                return proc
+        except requests.RequestException:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError(f"{mode} app did not start")
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_load(base_url, total, concurrency):
+    def one(_):
+        started = time.perf_counter()
+        response = requests.post(f"{base_url}/generate-cover-letter", json={"job_data": JOB_DATA}, timeout=300)
+        return time.perf_counter() - started, response.status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency for latency, _ in results]
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "errors": sum(1 for _, status in results if status != 200),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["sync", "async"], default="async")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=1.0, help="stub OpenAI response delay in seconds")
+    args = parser.parse_args()
+
+    stub = StubServer(openai_latency=args.latency).start()
+    port = free_port()
+    proc = start_app(args.mode, port, f"{stub.url}/v1")
+    try:
+        result = run_load(f"http://127.0.0.1:{port}", args.requests, args.concurrency)
+    finally:
+        proc.terminate()
+        proc.wait()
+        stub.shutdown()
+
+    result["mode"] = args.mode
+    result["stub_latency_s"] = args.latency
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""Replay harness for prompt-prefix stability and cache-aware usage metrics.
+
+Starts a stub OpenAI chat completions server that records every request and
+reports usage the way OpenAI's automatic prompt caching does: the longest
+prefix shared with an earlier request counts as cached once it reaches 1024
+tokens, in 128-token steps. It then replays extraction, generation and
+one-shot calls for several jobs, profiles and dates through
+utils.openai_cover_letter.
+
+The harness checks two things. Each template's static system prefix must be
+byte-identical across every request. Each prefix must also match the hash
+recorded for its template version in benchmarks/fixtures/prompt_prefixes.json.
+It then prints the prefix sizes and the usage metrics (cache-hit ratio, cost
+per letter) as JSON. It exits non-zero if a prefix drifted.
+
+    python benchmarks/prompt_replay.py            # check
+    python benchmarks/prompt_replay.py --update   # record hashes after a deliberate change
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import datetime as dt
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_server import JOB_DATA, free_port  # noqa: E402
+
+PREFIXES_PATH = os.path.join(ROOT, "benchmarks", "fixtures", "prompt_prefixes.json")
+CACHE_MIN_TOKENS = 1024
+CACHE_STEP_TOKENS = 128
+
+JOB_TEXTS = [
+    "Mechanical Engineer\nAcme Engineering - Brisbane QLD\nAbout the role\nDesign ground support equipment.\n"
+    "Requirements\n3+ years with SolidWorks\nBachelor of Mechanical Engineering",
+    "Design Engineer\nBuzz Drones - Sydney NSW\nResponsibilities\nPrototype airframes and jigs.\n"
+    "Skills\nCAD, FEA, composite layup\nExperience\n2+ years in aerospace manufacturing",
+]
+PROFILES = [
+    "Jane Doe - Mechanical Engineer\n" + "\n".join(f"- Project {i}: designed and tested a gearbox rig" for i in range(150)),
+    "Sam Lee - Design Engineer\n- University of Glasgow: prototyping mechanical systems",
+]
+DATES = [dt.datetime(2024, 3, 1), dt.datetime(2024, 3, 2)]
+
+
+def serialize(messages):
+    return "".join(f"<|{message['role']}|>{message['content']}" for message in messages)
+
+
+def start_stub_openai(count_tokens):
+    """Stub chat completions server; returns (server, recorded request bodies)."""
+    recorded = []
+    recorded_prompts = []
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            prompt = serialize(body["messages"])
+            with lock:
+                shared = max((len(os.path.commonprefix([prompt, earlier])) for earlier in recorded_prompts), default=0)
+                recorded.append(body)
+                recorded_prompts.append(prompt)
+            cached = count_tokens(prompt[:shared])
+            cached = cached // CACHE_STEP_TOKENS * CACHE_STEP_TOKENS if cached >= CACHE_MIN_TOKENS else 0
+
+            if body.get("response_format", {}).get("type") == "json_object":
+                one_shot = '"cover_letter"' in body["messages"][0]["content"]
+                content = json.dumps({"job_data": JOB_DATA, "cover_letter": "Dear Hiring Manager, ..."} if one_shot else JOB_DATA)
+            else:
+                content = "Dear Hiring Manager, ..."
+            response = json.dumps({
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body["model"],
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {
+                    "prompt_tokens": count_tokens(prompt),
+                    "completion_tokens": count_tokens(content),
+                    "total_tokens": count_tokens(prompt) + count_tokens(content),
+                    "prompt_tokens_details": {"cached_tokens": cached},
+                },
+            }).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(response)))
+            self.end_headers()
+            self.wfile.write(response)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", free_port()), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, recorded
+
+
+def replay(openai_cover_letter):
+    """Run every call type over JOB_TEXTS x PROFILES x DATES."""
+    real_datetime = openai_cover_letter.datetime
+    for date in DATES:
+        class FixedDate(dt.datetime):
+            @classmethod
+            def today(cls):
+                return date
+
+        openai_cover_letter.datetime = FixedDate
+        try:
+            for job_text in JOB_TEXTS:
+                # Bypass the job data cache so extraction really runs for every date
+                openai_cover_letter.set_job_data_cache(None)
+                job_data = openai_cover_letter.interpret_job_details(job_text)
+                for profile in PROFILES:
+                    openai_cover_letter.generate_cover_letter(job_data, profile)
+                    openai_cover_letter.extract_and_generate(job_text, profile)
+        finally:
+            openai_cover_letter.datetime = real_datetime
+
+
+def prefix_hash(prefix):
+    return hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+
+
+def check_prefixes(recorded, templates, count_tokens, update=False):
+    """Compare each template's recorded system prefixes with each other and with the stored hashes."""
+    stored = {}
+    if os.path.exists(PREFIXES_PATH):
+        with open(PREFIXES_PATH, encoding="utf-8") as f:
+            stored = json.load(f)
+
+    report = {}
+    problems = []
+    for template in templates.values():
+        bodies = [body for body in recorded if body["messages"][0]["content"].startswith(template.system)]
+        prefixes = {body["messages"][0]["content"] for body in bodies}
+        digest = prefix_hash(template.prefix)
+        report[template.id] = {
+            "requests": len(bodies),
+            "distinct_prefixes": len(prefixes),
+            "prefix_bytes": len(template.prefix.encode("utf-8")),
+            "prefix_tokens": count_tokens(template.prefix),
+            "prefix_sha256": digest[:16],
+        }
+        if prefixes != {template.prefix}:
+            problems.append(f"{template.id}: system prefix varies between requests")
+        if update:
+            stored[template.id] = digest
+        elif template.id not in stored:
+            problems.append(f"{template.id}: no recorded prefix hash (run with --update)")
+        elif stored[template.id] != digest:
+            problems.append(f"{template.id}: prefix changed without a version bump")
+
+    if update:
+        with open(PREFIXES_PATH, "w", encoding="utf-8") as f:
+            json.dump(stored, f, indent=2, sort_keys=True)
+            f.write("\n")
+    return report, problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--update", action="store_true", help="record the current prefix hashes")
+    args = parser.parse_args()
+
+    from utils.job_text import count_tokens
+
+    stub, recorded = start_stub_openai(count_tokens)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{stub.server_address[1]}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+    from utils import openai_cover_letter
+    from utils.prompts import TEMPLATES
+
+    try:
+        replay(openai_cover_letter)
+    finally:
+        stub.shutdown()
+
+    report, problems = check_prefixes(recorded, TEMPLATES, count_tokens, update=args.update)
+    print(json.dumps({
+        "requests": len(recorded),
+        "templates": report,
+        "usage": openai_cover_letter.usage_stats.stats(),
+        "problems": problems,
+    }, indent=2))
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
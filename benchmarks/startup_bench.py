@@ -0,0 +1,208 @@
+"""Cold-start benchmark: import time, import RSS and gunicorn worker memory.
+
+Imports the app in a fresh interpreter under `python -X importtime` (best of
+--repeat runs) and reports the total import time, RSS after import, the
+packages that cost the most and which heavy libraries `import app` pulled in
+although only some requests need them. Then boots gunicorn with
+gunicorn.conf.py, with and without preload_app, and reports time until
+/health answers plus the RSS and PSS (RSS with shared pages split between the
+processes sharing them) of the master and each worker.
+
+    python benchmarks/startup_bench.py --output benchmarks/results/startup.json
+    python benchmarks/startup_bench.py --compare benchmarks/results/startup.json --max-import-ms 400
+
+--max-import-ms exits non-zero when the import is slower, for use as a CI gate.
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from e2e_bench import git_commit, process_tree, rss_mb  # noqa: E402
+from stub_server import free_port  # noqa: E402
+
+# Libraries only some code paths need; `import app` should leave them to first use (or the gunicorn preload)
+HEAVY_MODULES = ("docx", "bs4", "requests", "cloudscraper", "httpx", "openai", "tiktoken")
+
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+PROBE = """
+import json, sys
+import {module}
+rss = None
+with open("/proc/self/status") as f:
+    for line in f:
+        if line.startswith("VmRSS:"):
+            rss = int(line.split()[1]) / 1024
+print(json.dumps({{"rss_mb": rss, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def parse_importtime(stderr):
+    """[(module, self_us, cumulative_us, depth)] from `python -X importtime` output."""
+    rows = []
+    for line in stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((name, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return rows
+
+
+def profile_import(module, top):
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+                          cwd=ROOT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    rows = parse_importtime(proc.stderr)
+    total_us = next(cumulative for name, _, cumulative, depth in rows if name == module and depth == 0)
+    # Self time summed per top-level package, so e.g. all of werkzeug counts as one entry
+    packages = {}
+    for name, self_us, _, _ in rows:
+        root = name.split(".")[0]
+        packages[root] = packages.get(root, 0) + self_us
+    slowest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    probe = json.loads(proc.stdout.strip().splitlines()[-1])
+    return {
+        "import_ms": round(total_us / 1000, 1),
+        "modules": len(rows),
+        "rss_mb": round(probe["rss_mb"], 1) if probe["rss_mb"] is not None else None,
+        "heavy_loaded": probe["loaded"],
+        "slowest_packages_ms": {name: round(us / 1000, 1) for name, us in slowest},
+    }
+
+
+def pss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def profile_gunicorn(workers, preload, requests_per_worker=5):
+    state_dir = tempfile.mkdtemp(prefix="startup_bench_")
+    port = free_port()
+    env = dict(os.environ, GUNICORN_PRELOAD="1" if preload else "0", OPENAI_API_KEY="stub",
+               RATE_LIMIT_PATH=os.path.join(state_dir, "rate_limit.sqlite3"),
+               SINGLE_FLIGHT_PATH=os.path.join(state_dir, "single_flight.sqlite3"))
+    cmd = [sys.executable, "-m", "gunicorn", "app:app", "--config", "gunicorn.conf.py",
+           "--bind", f"127.0.0.1:{port}", "--workers", str(workers)]
+    started = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        ready_s = None
+        while time.perf_counter() - started < 60:
+            try:
+                if requests.get(f"http://127.0.0.1:{port}/health", timeout=1).ok:
+                    ready_s = time.perf_counter() - started
+                    break
+            except requests.RequestException:
+                time.sleep(0.05)
+        if ready_s is None:
+            raise RuntimeError("gunicorn did not start")
+        # Wait for every worker, then touch them so the numbers include a served request
+        deadline = time.time() + 30
+        while len(process_tree(proc.pid)) < workers + 1 and time.time() < deadline:
+            time.sleep(0.1)
+        for _ in range(workers * requests_per_worker):
+            requests.get(f"http://127.0.0.1:{port}/health", timeout=5)
+        pids = process_tree(proc.pid)
+        processes = {str(pid): {"rss_mb": rss_mb(pid), "pss_mb": pss_mb(pid)} for pid in pids}
+    finally:
+        proc.terminate()
+        proc.wait()
+    pss = [row["pss_mb"] for row in processes.values() if row["pss_mb"] is not None]
+    return {
+        "ready_s": round(ready_s, 3),
+        "processes": processes,
+        "total_rss_mb": round(sum(row["rss_mb"] or 0 for row in processes.values()), 1),
+        "total_pss_mb": round(sum(pss), 1) if pss else None,
+    }
+
+
+def compare(current, baseline):
+    """Print changes in import time and memory against an earlier results file."""
+    print(f"\nvs {baseline['meta'].get('commit')} ({baseline['meta'].get('timestamp')})")
+    fields = [("import", "import_ms"), ("import", "rss_mb")]
+    for name in current.get("gunicorn", {}):
+        fields += [(f"gunicorn.{name}", "ready_s"), (f"gunicorn.{name}", "total_rss_mb"),
+                   (f"gunicorn.{name}", "total_pss_mb")]
+    for section, field in fields:
+        row, base = current, baseline
+        for part in section.split("."):
+            row, base = row.get(part, {}), base.get(part, {})
+        if row.get(field) is None or base.get(field) is None:
+            continue
+        delta = (row[field] - base[field]) / base[field] * 100 if base[field] else 0.0
+        print(f"  {section + ' ' + field:<34} {base[field]:>8} -> {row[field]:>8} ({delta:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app", help="module to import (e.g. async_app)")
+    parser.add_argument("--repeat", type=int, default=5, help="import runs; the fastest is reported")
+    parser.add_argument("--top", type=int, default=15, help="slowest packages to list")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--skip-gunicorn", action="store_true", help="only measure the import")
+    parser.add_argument("--max-import-ms", type=float, help="exit with status 1 if the import takes longer")
+    parser.add_argument("--output", help="write the JSON results to this file")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    runs = [profile_import(args.module, args.top) for _ in range(args.repeat)]
+    best = min(runs, key=lambda run: run["import_ms"])
+    best["import_ms_runs"] = [run["import_ms"] for run in runs]
+    print(f"import {args.module}: {best['import_ms']} ms (best of {args.repeat}), RSS {best['rss_mb']} MB, "
+          f"heavy modules loaded: {', '.join(best['heavy_loaded']) or 'none'}", file=sys.stderr)
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "import": best,
+    }
+    if not args.skip_gunicorn and args.module == "app":
+        results["gunicorn"] = {}
+        for preload in (True, False):
+            name = "preload" if preload else "no_preload"
+            row = results["gunicorn"][name] = profile_gunicorn(args.workers, preload)
+            print(f"gunicorn {name:<10} ready {row['ready_s']:>6} s  RSS {row['total_rss_mb']:>7} MB  "
+                  f"PSS {row['total_pss_mb']} MB ({args.workers} workers + master)", file=sys.stderr)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+    else:
+        print(json.dumps(results, indent=2))
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(results, json.load(f))
+
+    if args.max_import_ms is not None and best["import_ms"] > args.max_import_ms:
+        print(f"import {args.module} took {best['import_ms']} ms, over the {args.max_import_ms} ms limit",
+              file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
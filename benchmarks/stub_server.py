@@ -0,0 +1,174 @@
+"""Local stand-in for every network dependency of the app, for offline benchmarks.
+
+One threaded HTTP server plays three roles:
+
+- job site: GET /pages/<name> serves a page from the corpus (direct fetches)
+- Bright Data: absolute-form requests (GET http://host/pages/<name>) are what
+  a forward proxy receives, and are answered as the proxy would
+- OpenAI: POST /v1/chat/completions returns canned job data, letters, one-shot
+  JSON, n-sampled choices or an SSE stream
+
+Each role has its own configurable latency. Page names ending in
+"_direct_blocked" serve the blocked page directly but the real page via the
+proxy, to exercise the fallback path.
+"""
+import os
+import json
+import time
+import socket
+import threading
+from urllib.parse import urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from html_extract_bench import make_huge
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES_DIR = os.path.join(ROOT, "benchmarks", "fixtures", "pages")
+
+JOB_DATA = {
+    "job_title": "Mechanical Engineer",
+    "company_name": "Acme Engineering",
+    "job_description": "Design and maintain ground support equipment.",
+    "skills": ["CAD", "FEA"],
+    "experience": ["3+ years"],
+    "software": ["SolidWorks"],
+    "additional_requirements": "",
+    "preferred_qualifications": [],
+    "other_notes": "Brisbane QLD, full time",
+}
+LETTER = "Dear Hiring Manager,\n\nI am writing to apply for the Mechanical Engineer role at Acme Engineering. " * 4
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def load_pages(pages_dir=PAGES_DIR):
+    """The recorded corpus keyed by name, plus a synthetic "huge" page built from the Seek fixture."""
+    pages = {}
+    for name in sorted(os.listdir(pages_dir)):
+        if name.endswith(".html"):
+            with open(os.path.join(pages_dir, name), encoding="utf-8") as f:
+                pages[name[:-5]] = f.read()
+    if "seek_job" in pages:
+        pages["huge"] = make_huge(pages["seek_job"])
+    return pages
+
+
+def _completion_content(body):
+    if body.get("response_format", {}).get("type") == "json_object":
+        if '"cover_letter"' in body["messages"][0]["content"]:
+            return json.dumps({"job_data": JOB_DATA, "cover_letter": LETTER})
+        return json.dumps(JOB_DATA)
+    return LETTER
+
+
+class StubServer:
+    """Threaded stub; `stats` counts requests per role."""
+
+    def __init__(self, pages=None, page_latency=0.05, proxy_latency=0.3, openai_latency=0.5, port=None):
+        self.pages = load_pages() if pages is None else pages
+        self.page_latency = page_latency
+        self.proxy_latency = proxy_latency
+        self.openai_latency = openai_latency
+        self.stats = {"direct": 0, "proxy": 0, "openai": 0}
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                via_proxy = self.path.startswith("http://")
+                path = urlsplit(self.path).path
+                stub._count("proxy" if via_proxy else "direct")
+                time.sleep(stub.proxy_latency if via_proxy else stub.page_latency)
+                name = path.rsplit("/", 1)[-1]
+                if name.endswith("_direct_blocked"):
+                    name = name[:-len("_direct_blocked")] if via_proxy else "blocked"
+                page = stub.pages.get(name)
+                if page is None:
+                    return self._send(404, "text/plain", b"not found")
+                self._send(200, "text/html; charset=utf-8", page.encode("utf-8"))
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                stub._count("openai")
+                time.sleep(stub.openai_latency)
+                content = _completion_content(body)
+                if body.get("stream"):
+                    return self._stream(body, content)
+                response = {
+                    "id": "chatcmpl-stub",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "gpt-4-turbo"),
+                    "choices": [
+                        {"index": i, "message": {"role": "assistant", "content": f"{content} ({i})" if i else content},
+                         "finish_reason": "stop"}
+                        for i in range(body.get("n") or 1)
+                    ],
+                    "usage": {"prompt_tokens": 900, "completion_tokens": 300, "total_tokens": 1200,
+                              "prompt_tokens_details": {"cached_tokens": 0}},
+                }
+                self._send(200, "application/json", json.dumps(response).encode("utf-8"))
+
+            def _stream(self, body, content):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                words = content.split(" ")
+                for i, word in enumerate(words):
+                    delta = {"content": word + (" " if i < len(words) - 1 else "")}
+                    self._chunk({"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": 0,
+                                 "model": body.get("model"), "choices": [{"index": 0, "delta": delta}]})
+                self._chunk({"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": 0,
+                             "model": body.get("model"), "choices": [],
+                             "usage": {"prompt_tokens": 900, "completion_tokens": len(words), "total_tokens": 900 + len(words)}})
+                self._write_chunk(b"data: [DONE]\n\n")
+                self._write_chunk(b"")
+
+            def _chunk(self, payload):
+                self._write_chunk(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+
+            def _write_chunk(self, data):
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+
+            def _send(self, status, content_type, payload):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port or free_port()), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.url = f"http://127.0.0.1:{self.port}"
+
+    def _count(self, role):
+        with self._lock:
+            self.stats[role] += 1
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def shutdown(self):
+        self.server.shutdown()
+
+    def app_env(self):
+        """Environment that points the app's proxy and OpenAI clients at this stub."""
+        return {
+            "OPENAI_BASE_URL": f"{self.url}/v1",
+            "OPENAI_API_KEY": "stub",
+            "BRIGHT_DATA_HOST": "127.0.0.1",
+            "BRIGHT_DATA_PORT": str(self.port),
+            "SCRAPE_PROXY_FIRST_DOMAINS": "",
+        }
@@ -0,0 +1,21 @@
+import pytest
+
+from utils import job_scraper, openai_cover_letter, rate_limit, single_flight
+from utils.cache import MemoryCache
+
+
+@pytest.fixture(autouse=True)
+def shared_state():
+    """Give each test fresh in-memory rate limit state, job data cache and per-process coalescing instead of the shared SQLite files.
+
+    Hedged fetches still running when a test ends are waited for, so they cannot
+    change the breaker or limiter state of the next test.
+    """
+    rate_limit.set_rate_limit_store(rate_limit.MemoryStateStore())
+    single_flight.set_shared_flights(None)
+    openai_cover_letter.set_job_data_cache(MemoryCache())
+    yield
+    with job_scraper._hedge_executor_lock:
+        executor, job_scraper._hedge_executor = job_scraper._hedge_executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
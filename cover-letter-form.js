@@ -1,12 +1,13 @@
 // Cover Letter Generator Form Handler
+
+// Replace with your actual API URL
+const API_BASE_URL = 'https://cover-letter-generator-2.onrender.com';  // Update this to your Render URL
+// For local testing: const API_BASE_URL = 'http://localhost:5000';
+
 document.addEventListener('DOMContentLoaded', function() {
     const form = document.getElementById('cover-letter-form');
     const resultDiv = document.getElementById('result');
     
-    // Replace with your actual API URL
-    const API_BASE_URL = 'https://cover-letter-generator-2.onrender.com';  // Update this to your Render URL
-    // For local testing: const API_BASE_URL = 'http://localhost:5000';
-    
     form.addEventListener('submit', async function(e) {
         e.preventDefault();
         
@@ -15,62 +16,87 @@ document.addEventListener('DOMContentLoaded', function() {
         
         // Get form data
         const formData = new FormData(form);
+        const startedAt = performance.now();
         
         try {
-            // Send request to Flask API
-            const response = await fetch(`${API_BASE_URL}/process-cover-letter`, {
+            // Step 1: extract job details
+            const extractResponse = await fetch(`${API_BASE_URL}/extract-job-details`, {
                 method: 'POST',
                 body: formData
             });
             
-            const result = await response.json();
+            const extracted = await extractResponse.json();
+            
+            if (!extracted.success) {
+                showError(extracted.error);
+                return;
+            }
             
-            if (result.success) {
-                // Success - display the generated cover letter
-                resultDiv.innerHTML = `
-                    <div style="color: green; margin-bottom: 20px;">
-                        ✅ <strong>Cover Letter Generated Successfully!</strong>
-                    </div>
-                    
-                    <div style="border: 1px solid #ddd; padding: 15px; background-color: #f9f9f9; margin-bottom: 20px;">
-                        <h3>Job Details Extracted:</h3>
-                        <p><strong>Title:</strong> ${result.job_data.job_title || 'Not specified'}</p>
-                        <p><strong>Company:</strong> ${result.job_data.company_name || 'Not specified'}</p>
-                        <p><strong>Skills Required:</strong> ${Array.isArray(result.job_data.skills) ? result.job_data.skills.join(', ') : 'Not specified'}</p>
-                    </div>
-                    
-                    <div style="border: 1px solid #ddd; padding: 15px; background-color: #f0f8ff;">
-                        <h3>Your Personalized Cover Letter:</h3>
-                        <div style="white-space: pre-wrap; font-family: 'Times New Roman', serif; line-height: 1.6;">
-                            ${result.cover_letter}
-                        </div>
-                    </div>
-                    
-                    <div style="margin-top: 15px;">
-                        <button onclick="copyToClipboard()" style="background-color: #4CAF50; color: white; padding: 10px 20px; border: none; cursor: pointer;">
-                            📋 Copy Cover Letter
-                        </button>
-                        <button onclick="downloadAsText()" style="background-color: #008CBA; color: white; padding: 10px 20px; border: none; cursor: pointer; margin-left: 10px;">
-                            💾 Download as TXT
-                        </button>
-                    </div>
-                `;
+            const jobData = extracted.job_data;
+            resultDiv.innerHTML = `
+                <div id="status" style="color: blue; margin-bottom: 20px;">
+                    ✍️ <strong>Writing your cover letter...</strong>
+                </div>
+                
+                <div style="border: 1px solid #ddd; padding: 15px; background-color: #f9f9f9; margin-bottom: 20px;">
+                    <h3>Job Details Extracted:</h3>
+                    <p><strong>Title:</strong> ${jobData.job_title || 'Not specified'}</p>
+                    <p><strong>Company:</strong> ${jobData.company_name || 'Not specified'}</p>
+                    <p><strong>Skills Required:</strong> ${Array.isArray(jobData.skills) ? jobData.skills.join(', ') : 'Not specified'}</p>
+                </div>
                 
-                // Store the cover letter for copy/download functions
-                window.generatedCoverLetter = result.cover_letter;
+                <div style="border: 1px solid #ddd; padding: 15px; background-color: #f0f8ff;">
+                    <h3>Your Personalized Cover Letter:</h3>
+                    <div id="cover-letter-output" style="white-space: pre-wrap; font-family: 'Times New Roman', serif; line-height: 1.6;"></div>
+                </div>
                 
-            } else {
-                // Error from API
-                resultDiv.innerHTML = `
-                    <div style="color: red;">
-                        ❌ <strong>Error:</strong> ${result.error}
-                    </div>
-                `;
-            }
+                <div id="letter-actions" style="margin-top: 15px; display: none;">
+                    <button onclick="copyToClipboard()" style="background-color: #4CAF50; color: white; padding: 10px 20px; border: none; cursor: pointer;">
+                        📋 Copy Cover Letter
+                    </button>
+                    <button onclick="downloadAsText()" style="background-color: #008CBA; color: white; padding: 10px 20px; border: none; cursor: pointer; margin-left: 10px;">
+                        💾 Download as TXT
+                    </button>
+                    <button onclick="downloadRendered('docx')" style="background-color: #2B579A; color: white; padding: 10px 20px; border: none; cursor: pointer; margin-left: 10px;">
+                        📄 Download as DOCX
+                    </button>
+                    <button onclick="downloadRendered('pdf')" style="background-color: #B30B00; color: white; padding: 10px 20px; border: none; cursor: pointer; margin-left: 10px;">
+                        📕 Download as PDF
+                    </button>
+                </div>
+            `;
+            
+            // Step 2: stream the cover letter into the page as it is generated
+            formData.append('job_data', JSON.stringify(jobData));
+            window.generatedJobData = jobData;
+            const output = document.getElementById('cover-letter-output');
+            const generationStartedAt = performance.now();
+            let firstTokenAt = null;
+            window.generatedCoverLetter = '';
+            
+            const summary = await streamCoverLetter(formData, function(text) {
+                if (firstTokenAt === null) {
+                    firstTokenAt = performance.now();
+                    console.log(`Cover letter TTFB: ${Math.round(firstTokenAt - generationStartedAt)}ms`);
+                }
+                window.generatedCoverLetter += text;
+                output.textContent = window.generatedCoverLetter;
+            });
+            
+            const totalMs = Math.round(performance.now() - startedAt);
+            console.log('Cover letter stream finished', summary, `total ${totalMs}ms`);
+            document.getElementById('status').innerHTML = '✅ <strong>Cover Letter Generated Successfully!</strong>';
+            document.getElementById('status').style.color = 'green';
+            document.getElementById('letter-actions').style.display = 'block';
             
         } catch (error) {
             // Network or other errors
             console.error('Error:', error);
+            if (!(error instanceof TypeError)) {
+                // Errors reported by the server while streaming
+                showError(error.message);
+                return;
+            }
             resultDiv.innerHTML = `
                 <div style="color: red;">
                     ❌ <strong>Network Error:</strong> Unable to connect to the server. 
@@ -79,8 +105,62 @@ document.addEventListener('DOMContentLoaded', function() {
             `;
         }
     });
+    
+    function showError(message) {
+        resultDiv.innerHTML = `
+            <div style="color: red;">
+                ❌ <strong>Error:</strong> ${message}
+            </div>
+        `;
+    }
 });
 
+// POST to the streaming endpoint and call onToken for each chunk of the letter.
+// Resolves with the server's "done" payload (ttfb_ms, total_ms, length).
+async function streamCoverLetter(formData, onToken) {
+    const response = await fetch(`${API_BASE_URL}/generate-cover-letter/stream`, {
+        method: 'POST',
+        body: formData
+    });
+    
+    if (!response.ok) {
+        const result = await response.json();
+        throw new Error(result.error || `HTTP ${response.status}`);
+    }
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let summary = null;
+    
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        
+        // Server-sent events are separated by a blank line
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            
+            let eventName = 'message';
+            let data = '';
+            rawEvent.split('\n').forEach(function(line) {
+                if (line.startsWith('event: ')) eventName = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            });
+            
+            const payload = data ? JSON.parse(data) : {};
+            if (eventName === 'token') onToken(payload.text);
+            else if (eventName === 'done') summary = payload;
+            else if (eventName === 'error') throw new Error(payload.error);
+        }
+    }
+    
+    return summary;
+}
+
 // Helper function to copy cover letter to clipboard
 function copyToClipboard() {
     if (window.generatedCoverLetter) {
@@ -113,4 +193,38 @@ function downloadAsText() {
         window.URL.revokeObjectURL(url);
         document.body.removeChild(a);
     }
-} 
\ No newline at end of file
+} 
+
+// Download the cover letter rendered by the server as a formatted DOCX or PDF file
+async function downloadRendered(format) {
+    if (!window.generatedCoverLetter) return;
+    try {
+        const response = await fetch(`${API_BASE_URL}/render-cover-letter`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                cover_letter: window.generatedCoverLetter,
+                job_data: window.generatedJobData || {},
+                format: format
+            })
+        });
+        if (!response.ok) {
+            const result = await response.json();
+            throw new Error(result.error || `HTTP ${response.status}`);
+        }
+        const disposition = response.headers.get('Content-Disposition') || '';
+        const match = disposition.match(/filename="([^"]+)"/);
+        const blob = await response.blob();
+        const url = window.URL.createObjectURL(blob);
+        const a = document.createElement('a');
+        a.href = url;
+        a.download = match ? match[1] : `cover_letter.${format}`;
+        document.body.appendChild(a);
+        a.click();
+        window.URL.revokeObjectURL(url);
+        document.body.removeChild(a);
+    } catch (error) {
+        console.error('Could not download cover letter: ', error);
+        alert(`Could not create the ${format.toUpperCase()} file: ${error.message}`);
+    }
+}
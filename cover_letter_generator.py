@@ -1,10 +1,16 @@
 import os
-import openai
 import json
 from datetime import datetime
 
-# Initialize OpenAI client using API key
-client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+_client = None
+
+def get_client():
+    """OpenAI client, created on first use so importing this module needs no API key or SDK import."""
+    global _client
+    if _client is None:
+        import openai
+        _client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _client
 
 def interpret_job_details(raw_text):
     """Use OpenAI API to interpret job posting and extract key details."""
@@ -27,7 +33,7 @@ def interpret_job_details(raw_text):
     """
     try:
         # ✅ Correct method for openai>=1.0.0
-        response = client.chat.completions.create(
+        response = get_client().chat.completions.create(
             model="gpt-4-turbo",  # Using GPT-4 Turbo
             messages=[
                 {"role": "system", "content": "You are an expert at extracting structured data from job descriptions."},
@@ -69,7 +75,7 @@ def generate_cover_letter(job_details, user_letter):
 
     try:
         # ✅ Correct method for openai>=1.0.0
-        response = client.chat.completions.create(
+        response = get_client().chat.completions.create(
             model="gpt-4-turbo",  # Using GPT-4 Turbo
             messages=[
                 {"role": "system", "content": "You are a professional cover letter writer."},
@@ -82,7 +88,51 @@ def generate_cover_letter(job_details, user_letter):
     except Exception as e:
         return f"Error generating cover letter: {e}"
 
+def run_batch(args):
+    """Scrape and interpret every URL in args.batch, writing NDJSON results as they finish."""
+    import sys
+    import logging
+    from utils.batch import iter_batch_results, parse_job_urls, validate_job_urls
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    try:
+        with open(args.batch, encoding="utf-8") as f:
+            job_urls = validate_job_urls(parse_job_urls(f))
+    except ValueError as e:
+        print(f"Invalid batch file {args.batch}: {e}", file=sys.stderr)
+        return 2
+
+    out = open(args.output, "a", encoding="utf-8") if args.output else sys.stdout
+    failures = 0
+    try:
+        for result in iter_batch_results(
+            job_urls, workers=args.workers, per_domain=args.per_domain, checkpoint_path=args.checkpoint
+        ):
+            failures += not result["success"]
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 1 if failures else 0
+
 if __name__ == "__main__":
+    import argparse
+    from utils.batch import BATCH_PER_DOMAIN, BATCH_WORKERS
+
+    parser = argparse.ArgumentParser(description="Cover letter generator")
+    parser.add_argument("--batch", help="JSONL or text file of job URLs to scrape and interpret")
+    parser.add_argument("--output", help="append NDJSON results here instead of stdout")
+    parser.add_argument("--checkpoint", help="JSONL checkpoint; URLs that already succeeded are skipped on re-run")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS,
+                        help=f"parallel jobs (default BATCH_WORKERS, {BATCH_WORKERS})")
+    parser.add_argument("--per-domain", type=int, default=BATCH_PER_DOMAIN,
+                        help=f"max concurrent scrapes per site (default BATCH_PER_DOMAIN, {BATCH_PER_DOMAIN})")
+    args = parser.parse_args()
+
+    if args.batch:
+        raise SystemExit(run_batch(args))
+
     # Sample usage (for local testing)
     sample_job_text = "We are hiring an Aerospace Engineer with experience in jet engine design and testing."
     sample_user_letter = "Dear Hiring Manager, I am writing to express my interest in your engineering position."
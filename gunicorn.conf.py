@@ -0,0 +1,26 @@
+"""gunicorn settings for app.py (used by the Procfile).
+
+preload_app imports the app and the heavy libraries once in the master so
+workers share those pages copy-on-write and start without re-importing
+anything; each worker then builds its own HTTP/OpenAI clients in post_fork.
+Set GUNICORN_PRELOAD=0 to load the app in every worker instead (needed for
+--reload during development). Worker count comes from WEB_CONCURRENCY.
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+preload_app = os.getenv("GUNICORN_PRELOAD", "1").lower() not in ("0", "false", "no")
+# Sync workers silent for this long are restarted; /jobs/<id>/wait blocks one for up to JOB_WAIT_MAX
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+
+
+def when_ready(server):
+    # Runs in the master after the app is loaded and before any worker forks
+    if preload_app:
+        from utils.startup import preload
+        preload()
+
+
+def post_fork(server, worker):
+    from utils.startup import warm_worker
+    warm_worker()
@@ -0,0 +1,88 @@
+import os
+import sys
+import json
+import subprocess
+
+import pytest
+
+import app as app_module
+
+JOB_DATA = {"job_title": "Mechanical Engineer", "company_name": "Acme", "skills": ["CAD"]}
+
+
+@pytest.fixture
+def client():
+    app_module.app.config["TESTING"] = True
+    return app_module.app.test_client()
+
+
+def parse_events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_stream_endpoint_sends_tokens_then_done(client, monkeypatch):
+    monkeypatch.setattr(app_module, "stream_cover_letter", lambda job, letter: iter(["Dear ", "Acme"]))
+    response = client.post("/generate-cover-letter/stream", json={"job_data": JOB_DATA})
+    assert response.mimetype == "text/event-stream"
+    events = parse_events(response.get_data(as_text=True))
+    assert [e for e, _ in events] == ["token", "token", "done"]
+    assert "".join(d["text"] for e, d in events if e == "token") == "Dear Acme"
+    assert events[-1][1]["length"] == 9 and events[-1][1]["ttfb_ms"] is not None
+
+
+def test_stream_endpoint_reports_errors_as_events(client, monkeypatch):
+    def failing(job, letter):
+        yield "Dear "
+        raise Exception("rate limited")
+
+    monkeypatch.setattr(app_module, "stream_cover_letter", failing)
+    response = client.post("/generate-cover-letter/stream", json={"job_data": JOB_DATA})
+    events = parse_events(response.get_data(as_text=True))
+    assert events[-1] == ("error", {"error": "rate limited"})
+
+
+def test_stream_endpoint_validates_input(client):
+    response = client.post("/generate-cover-letter/stream", json={})
+    assert response.status_code == 400
+
+
+def test_one_shot_endpoint_returns_job_data_and_letter(client, monkeypatch):
+    monkeypatch.setattr(app_module, "scrape_job_details", lambda url: "Mechanical Engineer at Acme")
+    monkeypatch.setattr(app_module, "extract_and_generate", lambda text, letter: (JOB_DATA, f"Dear Acme, {letter}"))
+    response = client.post("/generate-cover-letter/one-shot", json={"job_url": "https://example.com/1", "cover_letter_text": "Hi"})
+    assert response.get_json() == {"job_data": JOB_DATA, "cover_letter": "Dear Acme, Hi", "success": True}
+
+    response = client.post("/generate-cover-letter/one-shot", json={})
+    assert response.status_code == 400
+
+
+def test_generate_endpoint_variants_mode(client, monkeypatch):
+    calls = []
+
+    def variants(job, letter, count, tones):
+        calls.append((count, tones))
+        return {"variants": [{"cover_letter": "Dear Acme", "tone": "warm"}], "calls": 1}
+
+    monkeypatch.setattr(app_module, "generate_cover_letter_variants", variants)
+    response = client.post("/generate-cover-letter", json={"job_data": JOB_DATA, "tones": "warm, formal"})
+    body = response.get_json()
+    assert calls == [(2, ["warm", "formal"])]
+    assert body["cover_letter"] == "Dear Acme" and body["variants"][0]["tone"] == "warm"
+
+    for count in ("many", [1, 2], {"n": 2}, True, 0, -1, 99):
+        response = client.post("/generate-cover-letter", json={"job_data": JOB_DATA, "variants": count})
+        assert response.status_code == 400 and "variants" in response.get_json()["error"]
+    response = client.post("/generate-cover-letter", json={"job_data": JOB_DATA, "tones": {"warm": 1}})
+    assert response.status_code == 400
+    assert len(calls) == 1
+
+
+def test_importing_app_leaves_heavy_libraries_to_first_use():
+    code = "import sys, app; print(','.join(m for m in ('docx', 'bs4', 'httpx', 'openai') if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ""
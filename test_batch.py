@@ -0,0 +1,153 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+
+import pytest
+
+from utils import batch
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    state = {"active": {}, "peak": {}, "scraped": []}
+    lock = threading.Lock()
+
+    def scrape(job_url):
+        domain = batch.url_domain(job_url)
+        with lock:
+            state["scraped"].append(job_url)
+            state["active"][domain] = state["active"].get(domain, 0) + 1
+            state["peak"][domain] = max(state["peak"].get(domain, 0), state["active"][domain])
+        time.sleep(0.05)
+        with lock:
+            state["active"][domain] -= 1
+        if "bad" in job_url:
+            raise Exception("blocked")
+        return f"text for {job_url}"
+
+    monkeypatch.setattr(batch, "scrape_job_details", scrape)
+    monkeypatch.setattr(batch, "interpret_job_details", lambda raw_text: {"job_title": raw_text})
+    return state
+
+
+def test_parse_job_urls_accepts_jsonl_and_plain_lines():
+    lines = ['{"job_url": "https://a.example.com/1"}', '"https://a.example.com/2"', "", "# comment", "https://b.example.com/3"]
+    assert batch.parse_job_urls(lines) == ["https://a.example.com/1", "https://a.example.com/2", "https://b.example.com/3"]
+
+
+def test_batch_limits_per_domain_and_isolates_failures(pipeline):
+    urls = [f"https://a.example.com/{i}" for i in range(6)] + ["https://b.example.com/bad"]
+    results = list(batch.iter_batch_results(urls, workers=6, per_domain=2))
+    assert len(results) == 7
+    assert pipeline["peak"]["a.example.com"] <= 2
+    failed = [r for r in results if not r["success"]]
+    assert [r["job_url"] for r in failed] == ["https://b.example.com/bad"]
+
+
+
+def test_busy_domain_does_not_hold_worker_slots(pipeline):
+    urls = [f"https://a.example.com/{i}" for i in range(3)] + ["https://b.example.com/1"]
+    list(batch.iter_batch_results(urls, workers=2, per_domain=1))
+    # b starts alongside the first a URL instead of waiting for a worker stuck on a.example.com
+    assert "https://b.example.com/1" in pipeline["scraped"][:2]
+
+
+def test_async_busy_domain_does_not_hold_worker_slots(pipeline, monkeypatch):
+    async def scrape(job_url):
+        pipeline["scraped"].append(job_url)
+        await asyncio.sleep(0.05)
+        return f"text for {job_url}"
+
+    async def interpret(raw_text):
+        return {"job_title": raw_text}
+
+    monkeypatch.setattr(batch, "async_scrape_job_details", scrape)
+    monkeypatch.setattr(batch, "async_interpret_job_details", interpret)
+    urls = [f"https://a.example.com/{i}" for i in range(3)] + ["https://b.example.com/1"]
+
+    async def run():
+        return [result async for result in batch.async_iter_batch_results(urls, workers=2, per_domain=1)]
+
+    assert len(asyncio.run(run())) == 4
+    # b starts alongside the first a URL instead of waiting for a worker stuck on a.example.com
+    assert "https://b.example.com/1" in pipeline["scraped"][:2]
+
+
+def test_async_batch_cancels_outstanding_urls_when_closed(pipeline, monkeypatch):
+    async def scrape(job_url):
+        pipeline["scraped"].append(job_url)
+        await asyncio.sleep(0.05)
+        return f"text for {job_url}"
+
+    async def interpret(raw_text):
+        return {"job_title": raw_text}
+
+    monkeypatch.setattr(batch, "async_scrape_job_details", scrape)
+    monkeypatch.setattr(batch, "async_interpret_job_details", interpret)
+    urls = [f"https://d{i % 10}.example.com/{i}" for i in range(40)]
+
+    async def run():
+        results = batch.async_iter_batch_results(urls, workers=4, per_domain=1)
+        await results.__anext__()
+        await results.aclose()
+        await asyncio.sleep(0.2)
+
+    asyncio.run(run())
+    assert len(pipeline["scraped"]) < 20  # without cancelling, all 40 start
+
+def test_batch_resumes_from_checkpoint(pipeline):
+    with tempfile.TemporaryDirectory() as tmp:
+        checkpoint = os.path.join(tmp, "checkpoint.jsonl")
+        urls = ["https://a.example.com/1", "https://a.example.com/bad"]
+        list(batch.iter_batch_results(urls, checkpoint_path=checkpoint))
+        pipeline["scraped"].clear()
+        list(batch.iter_batch_results(urls + ["https://a.example.com/1?ref=x"], checkpoint_path=checkpoint))
+        assert pipeline["scraped"] == ["https://a.example.com/bad"]
+
+
+def test_batch_endpoint_streams_ndjson(pipeline, monkeypatch):
+    import app as app_module
+
+    client = app_module.app.test_client()
+    response = client.post("/batch/extract-job-details", data="https://a.example.com/1\nhttps://a.example.com/2\n")
+    assert response.mimetype == "application/x-ndjson"
+    results = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert sorted(r["job_url"] for r in results) == ["https://a.example.com/1", "https://a.example.com/2"]
+    assert client.post("/batch/extract-job-details", json={"job_urls": []}).status_code == 400
+
+
+@pytest.mark.parametrize("body", [
+    {"job_urls": "https://a.example.com/1"},
+    {"job_urls": ["https://a.example.com/1", 42]},
+    {"job_urls": ["https://a.example.com/1", "  "]},
+    {"job_urls": ["https://a.example.com/" + "x" * batch.BATCH_MAX_URL_LENGTH]},
+    ["https://a.example.com/1"],
+])
+def test_batch_endpoint_rejects_malformed_url_lists(pipeline, body):
+    import app as app_module
+
+    response = app_module.app.test_client().post("/batch/extract-job-details", json=body)
+    assert response.status_code == 400 and "Invalid batch format" in response.json["error"]
+    assert pipeline["scraped"] == []
+
+
+def test_batch_endpoint_rejects_non_string_ndjson_url(pipeline):
+    import app as app_module
+
+    response = app_module.app.test_client().post("/batch/extract-job-details", data='{"job_url": 7}\n')
+    assert response.status_code == 400
+
+
+def test_cli_rejects_bad_batch_file_before_scraping(pipeline, tmp_path):
+    from types import SimpleNamespace
+
+    import cover_letter_generator
+
+    path = tmp_path / "urls.jsonl"
+    path.write_text('https://a.example.com/1\n{"job_url": ["https://a.example.com/2"]}\n')
+    args = SimpleNamespace(batch=str(path), output=None, checkpoint=None, workers=2, per_domain=1)
+    assert cover_letter_generator.run_batch(args) == 2
+    assert pipeline["scraped"] == []
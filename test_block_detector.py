@@ -0,0 +1,30 @@
+from utils import block_detector
+from utils.block_detector import BlockStats, block_signature
+
+JOB_BODY = "<body><h1>Mechanical Engineer</h1>" + "<p>Design and test systems.</p>" * 50 + "</body>"
+
+
+def test_reports_matching_signature():
+    assert block_signature("<title>Access Denied</title>") == "access_denied"
+    assert block_signature("<p>Help us keep SEEK secure, confirm you are human.</p>") == "seek_secure"
+    assert block_signature("") == "empty"
+    assert block_signature("<html>" + JOB_BODY + "</html>") is None
+
+
+def test_large_documents_only_scan_title_and_early_body():
+    head = "<head><title>Just a moment</title><script>" + "x" * 500_000 + "</script></head>"
+    blocked = "<html>" + head + "<body><p>Please confirm you are human</p></body></html>"
+    assert block_signature(blocked) == "confirm_human"
+    # "captcha" deep inside a large legitimate page is not a block page
+    legit = "<html>" + head + JOB_BODY.replace("</body>", "<p>" + "y" * 100_000 + "captcha</p></body>") + "</html>"
+    assert block_signature(legit) is None
+
+
+def test_block_stats_count_signatures(monkeypatch):
+    monkeypatch.setattr(block_detector, "block_stats", BlockStats())
+    block_signature("<p>Forbidden</p>")
+    block_signature("<p>Forbidden</p>")
+    block_signature("<html>" + JOB_BODY + "</html>")
+    stats = block_detector.block_stats.stats()
+    assert stats["checked"] == 3 and stats["signatures"] == {"forbidden": 2}
+    assert stats["block_rate"] == round(2 / 3, 4)
@@ -0,0 +1,73 @@
+import os
+
+import pytest
+
+from utils import html_text
+
+PAGES = os.path.join(os.path.dirname(__file__), "benchmarks", "fixtures", "pages")
+
+
+def page(name):
+    with open(os.path.join(PAGES, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def test_seek_state_is_preferred():
+    text = html_text.extract_job_text(page("seek_job.html"), engine="auto")
+    assert text.startswith("Mechanical Engineer\nCompany: Mincham Aviation")
+    assert "Salary: $95,000" in text
+    assert "Related job" not in text
+
+
+def test_json_ld_job_posting_is_used():
+    text = html_text.extract_job_text(page("jsonld_job.html"), engine="auto")
+    assert "Company: Buzz Drones" in text and "Location: Melbourne" in text
+
+
+def test_json_ld_type_list_is_recognised():
+    html = page("jsonld_job.html").replace('"@type": "JobPosting"', '"@type": ["JobPosting", "Thing"]')
+    assert "Company: Buzz Drones" in html_text.job_posting_text(html)
+
+
+def test_lxml_is_optional(monkeypatch):
+    monkeypatch.setattr(html_text, "optional_import", lambda name: None)
+    html = page("plain_job.html")
+    assert html_text.extract_job_text(html, engine="lxml") == html_text.extract_text_stream(html)
+    assert "Company: Buzz Drones" in html_text.extract_job_text(page("jsonld_job.html"), engine="auto")
+
+
+@pytest.mark.parametrize("engine", ["lxml", "stream"])
+def test_engines_drop_scripts_and_navigation(engine):
+    text = html_text.extract_job_text(page("plain_job.html"), engine=engine)
+    assert "Design Engineer" in text and "SolidWorks" in text
+    assert "analytics" not in text and "Career advice" not in text and "Privacy policy" not in text
+
+
+def test_lxml_and_stream_agree():
+    html = page("plain_job.html")
+    assert html_text.extract_text_lxml(html) == html_text.extract_text_stream(html)
+
+
+ARTICLE_HEADER_PAGE = """<html><body>
+<header><a href="/">JobBoard</a> Sign in</header>
+<main><article>
+<header><h1>Senior Mechanical Engineer</h1><p>Acme Aerospace</p></header>
+<p>Design and test propulsion systems.</p>
+<footer>Posted 3 days ago</footer>
+</article></main>
+<div role="contentinfo">Terms of use</div>
+<footer>Copyright JobBoard</footer>
+</body></html>"""
+
+
+@pytest.mark.parametrize("engine", ["lxml", "stream"])
+def test_article_header_is_kept_but_page_chrome_dropped(engine):
+    text = html_text.extract_job_text(ARTICLE_HEADER_PAGE, engine=engine)
+    assert text.splitlines() == [
+        "Senior Mechanical Engineer", "Acme Aerospace", "Design and test propulsion systems.", "Posted 3 days ago",
+    ]
+
+
+def test_falls_back_when_structured_data_is_malformed():
+    html = "<script>window.SEEK_REDUX_DATA = {broken</script><main><p>" + "Job text " * 40 + "</p></main>"
+    assert html_text.extract_job_text(html, engine="auto").startswith("Job text")
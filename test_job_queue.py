@@ -0,0 +1,136 @@
+import os
+import tempfile
+import time
+
+import pytest
+
+from utils.job_queue import JobQueue, QueueFull, QueueWorkers
+
+
+@pytest.fixture
+def queue():
+    with tempfile.TemporaryDirectory() as tmp:
+        yield JobQueue(os.path.join(tmp, "jobs.sqlite3"), max_depth=3, max_attempts=2, backoff_base=0.01)
+
+
+def test_claims_by_priority_then_age(queue):
+    low = queue.submit("extract", {"n": 1})
+    high = queue.submit("extract", {"n": 2}, priority=5)
+    assert queue.claim()["id"] == high
+    assert queue.claim()["id"] == low
+    assert queue.claim() is None
+
+
+def test_depth_limit(queue):
+    for i in range(3):
+        queue.submit("extract", {"n": i})
+    with pytest.raises(QueueFull):
+        queue.submit("extract", {"n": 4})
+
+
+def test_retries_with_backoff_then_fails(queue):
+    attempts = []
+
+    def flaky(payload):
+        attempts.append(payload)
+        raise Exception("proxy timeout")
+
+    workers = QueueWorkers(queue, {"extract": flaky})
+    job_id = queue.submit("extract", {"job_url": "https://a.example.com/1"})
+    workers.run_once()
+    assert queue.get(job_id)["status"] == "queued"
+    time.sleep(0.05)
+    workers.run_once()
+    job = queue.get(job_id)
+    assert job["status"] == "failed" and job["attempts"] == 2 and "proxy timeout" in job["error"]
+    assert len(attempts) == 2
+
+
+def test_success_records_result_and_metrics(queue):
+    workers = QueueWorkers(queue, {"extract": lambda payload: {"job_data": payload}})
+    job_id = queue.submit("extract", {"job_url": "https://a.example.com/1"})
+    workers.run_once()
+    job = queue.get(job_id)
+    assert job["status"] == "succeeded" and job["result"] == {"job_data": {"job_url": "https://a.example.com/1"}}
+    metrics = queue.metrics()
+    assert metrics["depth"] == 0 and metrics["queue_latency_s"]["count"] == 1
+
+
+def test_expired_lease_is_requeued_and_stale_worker_cannot_finish(queue):
+    queue.lease_seconds = 0.05
+    queue.backoff_base = 0  # retry the expired attempt without delay
+    job_id = queue.submit("extract", {"n": 1})
+    stale = queue.claim()
+    time.sleep(0.1)
+    current = queue.claim()
+    assert current["id"] == job_id and current["lease_id"] != stale["lease_id"]
+    assert not queue.renew(job_id, stale["lease_id"])
+    assert not queue.complete(job_id, stale["lease_id"], {"from": "stale"})
+    assert not queue.fail(job_id, stale["lease_id"], stale["attempts"], Exception("late"))
+    assert queue.get(job_id)["status"] == "running"
+    assert queue.complete(job_id, current["lease_id"], {"from": "current"})
+    assert queue.get(job_id)["result"] == {"from": "current"}
+
+
+
+def test_expired_leases_count_as_attempts(queue):
+    queue.lease_seconds = 0.01
+    queue.backoff_base = 0
+    job_id = queue.submit("extract", {"n": 1})
+    for attempt in (1, 2):
+        assert queue.claim()["attempts"] == attempt  # the worker then dies without reporting back
+        time.sleep(0.05)
+    assert queue.claim() is None
+    job = queue.get(job_id)
+    assert job["status"] == "failed" and "Lease expired" in job["error"]
+
+def test_worker_renews_lease_while_handler_runs(queue):
+    queue.lease_seconds = 0.15
+
+    def slow(payload):
+        time.sleep(0.5)  # several lease lengths
+        assert queue.claim() is None  # not re-queued for another worker
+        return "done"
+
+    workers = QueueWorkers(queue, {"extract": slow})
+    job_id = queue.submit("extract", {"n": 1})
+    workers.run_once()
+    job = queue.get(job_id)
+    assert job["status"] == "succeeded" and job["attempts"] == 1 and job["result"] == "done"
+
+
+def test_jobs_endpoint_round_trip(monkeypatch, queue):
+    import app as app_module
+
+    monkeypatch.setattr(app_module, "get_job_queue", lambda: queue)
+    client = app_module.app.test_client()
+    response = client.post("/jobs", json={"type": "generate", "job_data": {"job_title": "Engineer"}})
+    assert response.status_code == 202
+    job_id = response.json["job_id"]
+    assert client.get(f"/jobs/{job_id}").json["status"] == "queued"
+    assert client.get("/jobs/metrics").json["depth"] == 1
+    assert client.post("/jobs", json={"type": "extract"}).status_code == 400
+    for priority in ("high", 1.5, True, 10 ** 20):
+        response = client.post("/jobs", json={"type": "generate", "job_data": {}, "priority": priority})
+        assert response.status_code == 400 and "Priority" in response.json["error"]
+    assert client.post("/jobs", json={"type": "generate", "job_data": {"a": 1}, "priority": "5"}).status_code == 202
+    assert client.get("/jobs/missing").status_code == 404
+
+
+def test_wait_endpoint_is_a_bounded_long_poll(monkeypatch, queue):
+    import app as app_module
+
+    monkeypatch.setattr(app_module, "get_job_queue", lambda: queue)
+    client = app_module.app.test_client()
+    job_id = client.post("/jobs", json={"type": "generate", "job_data": {}}).json["job_id"]
+    # Status differs from what the client saw: answers at once
+    assert client.get(f"/jobs/{job_id}/wait").json["status"] == "queued"
+    started = time.time()
+    response = client.get(f"/jobs/{job_id}/wait?status=queued&timeout=0.3")
+    assert response.json["status"] == "queued" and 0.25 <= time.time() - started < 2
+    monkeypatch.setattr(app_module, "JOB_WAIT_MAX", 0.1)
+    started = time.time()
+    client.get(f"/jobs/{job_id}/wait?status=queued&timeout=60")
+    assert time.time() - started < 1
+    assert client.get(f"/jobs/{job_id}/events").status_code == 404
+    assert client.get("/jobs/missing/wait").status_code == 404
@@ -0,0 +1,124 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from utils import job_scraper, rate_limit
+
+JOB_HTML = "<html><body><h1>Mechanical Engineer</h1><p>" + ("Design and test systems. " * 20) + "</p></body></html>"
+BLOCK_HTML = "<html><body>Help us keep SEEK secure, confirm you are human.</body></html>"
+
+
+@pytest.fixture(autouse=True)
+def isolated(monkeypatch):
+    job_scraper.set_page_cache(None)
+    monkeypatch.setattr(job_scraper, "route_stats", job_scraper.DomainRouteStats())
+    monkeypatch.setattr(job_scraper, "PROXY_FIRST_DOMAINS", ["seek.com.au"])
+    monkeypatch.setattr(job_scraper, "SCRAPE_HEDGE_DELAY", 0.2)
+
+
+def fake_fetch(html, delay, calls, name):
+    def fetch(job_url, headers, timeout=20):
+        calls.append(name)
+        time.sleep(delay)
+        return html
+    return fetch
+
+
+def test_proxy_starts_after_hedge_delay_and_wins(monkeypatch):
+    calls = []
+    monkeypatch.setattr(job_scraper, "_fetch_direct", fake_fetch(JOB_HTML, 2.0, calls, "direct"))
+    monkeypatch.setattr(job_scraper, "_fetch_brightdata", fake_fetch(JOB_HTML.replace("Engineer", "Proxy"), 0.0, calls, "proxy"))
+    started = time.perf_counter()
+    text = job_scraper.scrape_job_details("https://jobs.example.com/1")
+    assert "Proxy" in text
+    assert time.perf_counter() - started < 1.0
+    assert calls == ["direct", "proxy"]
+
+
+def test_fast_direct_fetch_never_starts_proxy(monkeypatch):
+    calls = []
+    monkeypatch.setattr(job_scraper, "_fetch_direct", fake_fetch(JOB_HTML, 0.0, calls, "direct"))
+    monkeypatch.setattr(job_scraper, "_fetch_brightdata", fake_fetch(JOB_HTML, 0.0, calls, "proxy"))
+    job_scraper.scrape_job_details("https://jobs.example.com/2")
+    assert calls == ["direct"]
+
+
+def test_known_blocking_domain_starts_proxy_immediately(monkeypatch):
+    proxy_called = threading.Event()
+    monkeypatch.setattr(job_scraper, "_fetch_direct", fake_fetch(BLOCK_HTML, 0.5, [], "direct"))
+
+    def proxy(job_url, headers, timeout=20):
+        proxy_called.set()
+        return JOB_HTML
+
+    monkeypatch.setattr(job_scraper, "_fetch_brightdata", proxy)
+    assert job_scraper.hedge_delay("https://www.seek.com.au/job/1") == 0.0
+    job_scraper.scrape_job_details("https://www.seek.com.au/job/1")
+    assert proxy_called.is_set()
+
+
+def test_losing_direct_fetch_does_not_touch_breaker(monkeypatch):
+    monkeypatch.setattr(job_scraper, "_fetch_direct", fake_fetch(BLOCK_HTML, 0.3, [], "direct"))
+    monkeypatch.setattr(job_scraper, "_fetch_brightdata", fake_fetch(JOB_HTML, 0.0, [], "proxy"))
+    job_scraper.scrape_job_details("https://www.seek.com.au/job/2")
+    time.sleep(0.5)  # let the direct fetch finish with its block page
+    assert job_scraper.direct_breaker.retry_after("seek.com.au") == 0.0
+    assert rate_limit.get_rate_limit_store().get("breaker:direct:seek.com.au") is None
+
+
+def test_domain_learns_to_prefer_proxy(monkeypatch):
+    monkeypatch.setattr(job_scraper, "_fetch_direct", fake_fetch(BLOCK_HTML, 0.0, [], "direct"))
+    monkeypatch.setattr(job_scraper, "_fetch_brightdata", fake_fetch(JOB_HTML, 0.0, [], "proxy"))
+    url = "https://jobs.example.com/3"
+    assert job_scraper.hedge_delay(url) == 0.2
+    for _ in range(3):
+        job_scraper.scrape_job_details(url)
+    assert job_scraper.hedge_delay(url) == 0.0
+    assert job_scraper.route_stats.stats() == {"jobs.example.com": {"direct": 0, "proxy": 3}}
+
+
+def test_both_paths_blocked_raises_friendly_error(monkeypatch):
+    monkeypatch.setattr(job_scraper, "_fetch_direct", fake_fetch(BLOCK_HTML, 0.0, [], "direct"))
+    monkeypatch.setattr(job_scraper, "_fetch_brightdata", fake_fetch(BLOCK_HTML, 0.0, [], "proxy"))
+    with pytest.raises(Exception, match="site restrictions"):
+        job_scraper.scrape_job_details("https://jobs.example.com/4")
+
+
+def test_async_hedge_cancels_loser(monkeypatch):
+    cancelled = []
+
+    async def slow_direct(job_url, headers, timeout=20):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append("direct")
+            raise
+
+    async def proxy(job_url, headers, timeout=20):
+        return JOB_HTML
+
+    monkeypatch.setattr(job_scraper, "_afetch_direct", slow_direct)
+    monkeypatch.setattr(job_scraper, "_afetch_brightdata", proxy)
+    text = asyncio.run(job_scraper.async_scrape_job_details("https://jobs.example.com/5"))
+    assert "Mechanical Engineer" in text
+    assert cancelled == ["direct"]
+
+
+def test_pool_reuses_sessions_per_domain_and_bounds_them():
+    from utils.http_pools import PoolManager
+
+    pools = PoolManager(maxsize=2, max_domains=2)
+    first = pools.direct_session("a.example.com")
+    assert pools.direct_session("a.example.com") is first
+    closed = []
+    first.close = lambda: closed.append("a.example.com")
+    pools.direct_session("b.example.com")
+    pools.direct_session("c.example.com")
+    stats = pools.stats()
+    assert stats["direct_domains"] == ["b.example.com", "c.example.com"]
+    assert stats["evicted_domains"] == 1
+    # Another thread may still be using the evicted session, so it is dropped, not closed
+    assert closed == []
+    assert pools.proxy_session("http://proxy:1") is pools.proxy_session("http://proxy:1")
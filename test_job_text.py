@@ -0,0 +1,36 @@
+from utils import job_text
+
+NAV = "\n".join(["Home", "Job search", "Profile", "Career advice", "Sign in"] * 3)
+AD = """Mechanical Engineer
+Mincham Aviation - Brisbane QLD
+About the role
+You will design and maintain ground support equipment for our hangar.
+Requirements
+Bachelor of Mechanical Engineering
+3+ years experience with SolidWorks and AutoCAD
+Similar jobs
+""" + "\n".join(f"Related job {i} - Brisbane - Quick apply" for i in range(60)) + """
+Cookie settings
+Privacy policy"""
+
+
+def test_dedupes_and_prefers_job_blocks_within_budget(monkeypatch):
+    monkeypatch.setattr(job_text, "_get_encoding", lambda: None)
+    text, stats = job_text.prepare_job_text(NAV + "\n" + AD, budget_tokens=120)
+    assert text.splitlines()[0] == "Home"  # first block kept, in original order
+    assert "Bachelor of Mechanical Engineering" in text
+    assert "3+ years experience with SolidWorks and AutoCAD" in text
+    assert "Related job 59" not in text
+    assert text.count("Job search") == 1
+    assert stats["prepared_tokens"] <= 120 < stats["raw_tokens"]
+
+
+def test_oversized_block_is_cut_to_budget(monkeypatch):
+    monkeypatch.setattr(job_text, "_get_encoding", lambda: None)
+    text, stats = job_text.prepare_job_text("\n".join(f"Line {i} of a very long ad" for i in range(500)), budget_tokens=50)
+    assert text.startswith("Line 0") and stats["prepared_tokens"] <= 50
+
+
+def test_count_tokens_falls_back_without_tiktoken(monkeypatch):
+    monkeypatch.setattr(job_text, "_get_encoding", lambda: None)
+    assert job_text.count_tokens("x" * 40) == 10
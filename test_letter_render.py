@@ -0,0 +1,142 @@
+import io
+import re
+import zlib
+import zipfile
+
+import docx
+import pytest
+
+import app as app_module
+from utils import letter_render
+from utils.cache import MemoryCache
+
+LETTER = "Dear Hiring Manager,\n\nI would like to apply (in person).\n- Designed ramjets\n- Built drones\n\nKind regards,\nJane"
+JOB_DATA = {"job_title": "Engineer", "company_name": "TAE Aerospace"}
+
+
+@pytest.fixture(autouse=True)
+def inline_rendering(monkeypatch):
+    monkeypatch.setattr(letter_render, "RENDER_WORKERS", 0)
+    letter_render.set_render_cache(MemoryCache())
+
+
+@pytest.fixture
+def client():
+    app_module.app.config["TESTING"] = True
+    return app_module.app.test_client()
+
+
+def pdf_text(data):
+    streams = re.findall(rb"stream\n(.*?)\nendstream", data, re.S)
+    return b"\n".join(zlib.decompress(stream) for stream in streams).decode("cp1252")
+
+
+def test_classic_template_fills_placeholders():
+    item = letter_render.prepare_letter(LETTER, "docx", "classic", JOB_DATA)
+    assert item["filename"] == "TAE_Aerospace_Engineer.docx"
+    assert "TAE Aerospace\nRE: Engineer Position\n\nDear Hiring Manager," in item["text"]
+    assert "[" not in item["text"]
+    with pytest.raises(ValueError, match="Unknown template"):
+        letter_render.prepare_letter(LETTER, "docx", "fancy")
+    with pytest.raises(ValueError, match="Invalid template"):
+        letter_render.prepare_letter(LETTER, "docx", "../requests")
+
+
+def test_name_fills_template_and_letter_placeholders():
+    letter = LETTER.replace("Jane", "[Your Name]") + "\nRe: [Job Title] at [Company Name], [Reference]"
+    item = letter_render.prepare_letter(letter, "docx", "classic", JOB_DATA, "Jane Doe")
+    assert item["text"].startswith("\t\tJane Doe\n\t\t")
+    assert "Kind regards,\nJane Doe\nRe: Engineer at TAE Aerospace, [Reference]" in item["text"]
+    unnamed = letter_render.prepare_letter(letter, "docx", "classic", JOB_DATA)["text"]
+    assert not unnamed.startswith("\t\t\n") and "Kind regards,\n[Your Name]" in unnamed
+
+
+def test_docx_keeps_layout():
+    item = letter_render.prepare_letter(LETTER, "docx", "classic", JOB_DATA)
+    document = docx.Document(io.BytesIO(letter_render.render_letter(item)))
+    paragraphs = document.paragraphs
+    assert paragraphs[0].alignment == docx.enum.text.WD_ALIGN_PARAGRAPH.RIGHT
+    assert [p.text for p in paragraphs if p.style.name == "List Bullet"] == ["Designed ramjets", "Built drones"]
+
+
+def test_pdf_is_well_formed_and_wraps_onto_pages():
+    data = letter_render.render_pdf(LETTER + "\n" + "A long paragraph of text. " * 400)
+    assert data.startswith(b"%PDF-1.4")
+    xref = int(data.rsplit(b"startxref", 1)[1].split()[0])
+    assert data[xref:xref + 4] == b"xref"
+    offsets = [int(line[:10]) for line in data[xref:].split(b"\n")[3:] if line.endswith(b" n ")]
+    assert all(data[offset:].startswith(b"%d 0 obj" % number) for number, offset in enumerate(offsets, start=1))
+    assert int(re.search(rb"/Count (\d+)", data).group(1)) > 1
+    assert "(I would like to apply \\(in person\\).)" in pdf_text(data)
+
+
+def test_pdf_hard_splits_words_wider_than_the_line():
+    url = "https://example.com/" + "very-long-path-segment/" * 20
+    data = letter_render.render_pdf("See " + url + " for details\n- " + url)
+    lines = re.findall(r"\((.*?)\) Tj", pdf_text(data))
+    text_width = letter_render.PDF_PAGE_WIDTH - 2 * letter_render.PDF_MARGIN
+    size = letter_render.RENDER_FONT_SIZE
+    assert len(lines) > 4
+    assert all(letter_render._pdf_width(line.encode("cp1252"), size) <= text_width for line in lines)
+    assert url not in lines and "".join(lines).count(url) == 2
+
+
+def test_rendered_files_are_cached_by_content():
+    item = letter_render.prepare_letter(LETTER, "pdf", job_data=JOB_DATA)
+    first = letter_render.render_letter(item)
+    cached = letter_render.RENDERS.value(format="pdf", outcome="cache")
+    assert letter_render.render_letter(letter_render.prepare_letter(LETTER, "pdf", job_data=JOB_DATA)) == first
+    assert letter_render.RENDERS.value(format="pdf", outcome="cache") == cached + 1
+    assert letter_render.prepare_letter(LETTER + "!", "pdf")["key"] != item["key"]
+
+
+def test_render_endpoint_returns_download_and_304(client):
+    body = {"cover_letter": LETTER, "format": "pdf", "job_data": JOB_DATA}
+    response = client.post("/render-cover-letter", json=body)
+    assert response.status_code == 200
+    assert response.mimetype == "application/pdf"
+    assert 'filename="TAE_Aerospace_Engineer.pdf"' in response.headers["Content-Disposition"]
+    again = client.post("/render-cover-letter", json=body, headers={"If-None-Match": response.headers["ETag"]})
+    assert again.status_code == 304
+    assert client.post("/render-cover-letter", json={"cover_letter": LETTER, "format": "odt"}).status_code == 400
+
+
+def test_batch_endpoint_streams_zip_and_lists_failures(client, monkeypatch):
+    render_document = letter_render.render_document
+
+    def flaky(fmt, text):
+        if "broken" in text:
+            raise RuntimeError("bad letter")
+        return render_document(fmt, text)
+
+    monkeypatch.setattr(letter_render, "render_document", flaky)
+    letters = [
+        {"cover_letter": LETTER, "job_data": JOB_DATA},
+        {"cover_letter": LETTER + "\nP.S.", "job_data": JOB_DATA},
+        {"cover_letter": "broken", "job_data": {"company_name": "Acme"}},
+    ]
+    response = client.post("/batch/render-cover-letters", json={"letters": letters, "format": "docx"})
+    assert response.mimetype == "application/zip"
+    archive = zipfile.ZipFile(io.BytesIO(response.get_data()))
+    assert sorted(archive.namelist()) == ["TAE_Aerospace_Engineer.docx", "TAE_Aerospace_Engineer_2.docx", "errors.txt"]
+    assert archive.read("errors.txt").decode().startswith("Acme.docx:")
+    assert client.post("/batch/render-cover-letters", json={"letters": []}).status_code == 400
+
+
+def test_process_pool_renders(monkeypatch):
+    monkeypatch.setattr(letter_render, "RENDER_WORKERS", 1)
+    item = letter_render.prepare_letter(LETTER, "docx", job_data=JOB_DATA)
+    assert letter_render.render_letter(item).startswith(b"PK")
+
+
+def test_non_string_fields_are_converted_or_rejected(client):
+    item = letter_render.prepare_letter(LETTER, "docx", "classic", {"company_name": 3, "job_title": "Engineer"})
+    assert item["filename"] == "3_Engineer.docx" and "\n3\nRE: Engineer Position" in item["text"]
+    for job_data, name in (({"company_name": ["Acme"]}, None), ({"job_title": {"a": 1}}, None), (JOB_DATA, True)):
+        with pytest.raises(ValueError, match="must be a string"):
+            letter_render.prepare_letter(LETTER, "docx", "classic", job_data, name)
+    response = client.post("/render-cover-letter", json={"cover_letter": LETTER, "job_data": {"company_name": ["Acme"]}})
+    assert response.status_code == 400 and "company_name" in response.get_json()["error"]
+    assert client.post("/render-cover-letter", json={"cover_letter": LETTER, "template": 7}).status_code == 400
+    response = client.post("/batch/render-cover-letters", json={"letters": [{"cover_letter": LETTER, "name": {"x": 1}}]})
+    assert response.status_code == 400
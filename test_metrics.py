@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+import app as app_module
+from utils import job_scraper, metrics
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = metrics.Histogram("demo_seconds", "Demo", ["stage"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, stage="fetch")
+    lines = histogram.render()
+    assert 'demo_seconds_bucket{stage="fetch",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{stage="fetch",le="1.0"} 2' in lines
+    assert 'demo_seconds_bucket{stage="fetch",le="+Inf"} 3' in lines
+    assert 'demo_seconds_count{stage="fetch"} 3' in lines
+
+
+def test_timed_supports_sync_and_async_functions():
+    @metrics.timed("test_sync")
+    def work():
+        return 1
+
+    @metrics.timed("test_async")
+    async def async_work():
+        return 2
+
+    assert work() == 1 and asyncio.run(async_work()) == 2
+    assert metrics.STAGE_SECONDS.count(stage="test_sync") == 1
+    assert metrics.STAGE_SECONDS.count(stage="test_async") == 1
+
+
+def test_metrics_endpoint_exposes_stages_and_requests():
+    job_scraper._extract_visible_text("<html><body><p>Mechanical Engineer</p></body></html>")
+    client = app_module.app.test_client()
+    client.get("/health")
+    body = client.get("/metrics").get_data(as_text=True)
+    assert 'cover_letter_stage_seconds_count{stage="extract_text"}' in body
+    assert 'cover_letter_http_request_seconds_count{endpoint="/health",method="GET",status="200"}' in body
+    assert "# TYPE cover_letter_block_checks_total counter" in body
+
+
+def test_profile_header_saves_profile_when_enabled(monkeypatch, tmp_path):
+    monkeypatch.setattr(metrics, "PROFILE_REQUESTS", True)
+    monkeypatch.setattr(metrics, "PROFILE_DIR", str(tmp_path))
+    client = app_module.app.test_client()
+    assert "X-Profile-File" not in client.get("/health").headers
+    path = client.get("/health", headers={"X-Profile": "1"}).headers["X-Profile-File"]
+    assert path.startswith(str(tmp_path)) and path.endswith(".prof")
+
+
+def test_concurrent_profile_requests_are_skipped_not_failed(monkeypatch, tmp_path):
+    monkeypatch.setattr(metrics, "PROFILE_REQUESTS", True)
+    monkeypatch.setattr(metrics, "PROFILE_DIR", str(tmp_path))
+    headers = {"X-Profile": "1"}
+    first = metrics.start_profile(headers)
+    assert first is not None and metrics.start_profile(headers) is None
+    metrics.finish_profile(first, "/health")
+    second = metrics.start_profile(headers)
+    assert second is not None
+    metrics.finish_profile(second, "/health")
+
+
+def test_profile_skipped_when_another_profiler_is_active(monkeypatch):
+    class BusyProfile:
+        def enable(self):
+            raise ValueError("Another profiling tool is already active")
+
+    monkeypatch.setattr(metrics, "PROFILE_REQUESTS", True)
+    monkeypatch.setattr(metrics.cProfile, "Profile", BusyProfile)
+    assert metrics.start_profile({"X-Profile": "1"}) is None
+    assert not metrics._profile_lock.locked()
+
+
+def test_failed_request_releases_profiler(monkeypatch, tmp_path):
+    monkeypatch.setattr(metrics, "PROFILE_REQUESTS", True)
+    monkeypatch.setattr(metrics, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(app_module, "get_job_queue", lambda: 1 / 0)
+    monkeypatch.setitem(app_module.app.config, "PROPAGATE_EXCEPTIONS", True)  # after_request does not run
+    client = app_module.app.test_client()
+    with pytest.raises(ZeroDivisionError):
+        client.get("/jobs/metrics", headers={"X-Profile": "1"})
+    assert not metrics._profile_lock.locked()
@@ -0,0 +1,139 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from utils import openai_cover_letter
+from utils.cache import MemoryCache
+
+JOB_DATA = {"job_title": "Mechanical Engineer", "company_name": "Acme", "skills": ["CAD"]}
+
+
+class FakeClient:
+    def __init__(self, content):
+        self.calls = 0
+        self.content = content
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.calls += 1
+        message = SimpleNamespace(content=self.content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = FakeClient(json.dumps(JOB_DATA))
+    monkeypatch.setattr(openai_cover_letter, "get_openai_client", lambda: client)
+    openai_cover_letter.set_job_data_cache(MemoryCache(max_entries=10, ttl=60))
+    yield client
+    openai_cover_letter.set_job_data_cache(None)
+
+
+def test_interpret_job_details_is_memoized(client):
+    first = openai_cover_letter.interpret_job_details("Mechanical Engineer\nAcme\nSign in\n")
+    second = openai_cover_letter.interpret_job_details("  Mechanical   Engineer\n\nAcme\nCookie settings\n")
+    assert first == second == JOB_DATA
+    assert client.calls == 1
+    stats = openai_cover_letter.get_job_data_cache().stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+
+
+def test_lines_mentioning_boilerplate_words_are_kept():
+    normalize = openai_cover_letter.normalize_job_text
+    assert normalize("Pastry Chef\nAccept all cookies\nSign in\n© 2024 Seek") == "Pastry Chef"
+    bakery = normalize("Pastry Chef\nBake cookies and bread daily")
+    assert bakery == "Pastry Chef\nBake cookies and bread daily"
+    assert openai_cover_letter.job_data_cache_key(bakery) != openai_cover_letter.job_data_cache_key(
+        "Pastry Chef\nBake bread daily")
+    privacy = "Privacy Officer\nOwn our privacy policy and terms and conditions review"
+    assert normalize(privacy) == privacy
+
+def test_placeholder_results_are_not_cached(client):
+    client.content = "not json"
+    openai_cover_letter.interpret_job_details("Some job")
+    openai_cover_letter.interpret_job_details("Some job")
+    assert client.calls == 2
+
+
+def test_prompt_version_is_part_of_key(monkeypatch):
+    key = openai_cover_letter.job_data_cache_key("Some job")
+    monkeypatch.setattr(openai_cover_letter, "INTERPRET_PROMPT_VERSION", "changed")
+    assert openai_cover_letter.job_data_cache_key("Some job") != key
+
+
+def test_stream_cover_letter_yields_deltas(monkeypatch):
+    chunks = [
+        SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+        for text in ["Dear ", None, "Acme"]
+    ] + [SimpleNamespace(choices=[])]
+    client = FakeClient(None)
+    client.create = lambda **kwargs: iter(chunks) if kwargs.get("stream") else None
+    client.chat = SimpleNamespace(completions=SimpleNamespace(create=client.create))
+    monkeypatch.setattr(openai_cover_letter, "get_openai_client", lambda: client)
+    assert list(openai_cover_letter.stream_cover_letter(JOB_DATA, "My profile")) == ["Dear ", "Acme"]
+
+
+def test_extract_and_generate_uses_one_json_mode_call(client):
+    client.content = json.dumps({"job_data": JOB_DATA, "cover_letter": " Dear Acme "})
+    requests = []
+    create = client.chat.completions.create
+    client.chat.completions.create = lambda **kwargs: requests.append(kwargs) or create(**kwargs)
+
+    job_data, letter = openai_cover_letter.extract_and_generate("Mechanical Engineer\nAcme", "My profile")
+    assert letter == "Dear Acme"
+    assert job_data["company_name"] == "Acme" and job_data["software"] == []  # missing fields filled
+    assert client.calls == 1 and requests[0]["response_format"] == {"type": "json_object"}
+
+    # The job data is cached, so the two-step extract now skips OpenAI
+    assert openai_cover_letter.interpret_job_details("Mechanical Engineer\nAcme") == job_data
+    assert client.calls == 1
+
+
+def test_extract_and_generate_rejects_malformed_reply(client):
+    client.content = json.dumps({"job_data": JOB_DATA})
+    with pytest.raises(Exception, match="missing job_data or cover_letter"):
+        openai_cover_letter.extract_and_generate("Some job", "My profile")
+    assert openai_cover_letter.get_job_data_cache().get(openai_cover_letter.job_data_cache_key("Some job")) is None
+
+
+def test_variant_plan_splits_count_across_tones():
+    assert openai_cover_letter._variant_plan(3, None) == [(None, 3)]
+    assert openai_cover_letter._variant_plan(3, ["formal", "warm"]) == [("formal", 2), ("warm", 1)]
+    assert openai_cover_letter._variant_plan(1, ["formal", "warm"]) == [("formal", 1)]
+    with pytest.raises(ValueError):
+        openai_cover_letter._variant_plan(2, ["sarcastic"])
+    with pytest.raises(ValueError):
+        openai_cover_letter._variant_plan(openai_cover_letter.COVER_LETTER_VARIANTS_MAX + 1, None)
+
+
+def test_variants_use_n_sampling_and_drop_duplicates(monkeypatch):
+    requests = []
+
+    def create(**kwargs):
+        requests.append(kwargs)
+        texts = ["Dear Acme, I design jigs.", "Dear  Acme, I design jigs. ", "Hello Acme team, I build drones."]
+        choices = [SimpleNamespace(message=SimpleNamespace(content=text)) for text in texts[:kwargs["n"]]]
+        return SimpleNamespace(choices=choices, usage=SimpleNamespace(prompt_tokens=400, completion_tokens=30))
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(openai_cover_letter, "get_openai_client", lambda: client)
+
+    report = openai_cover_letter.generate_cover_letter_variants(JOB_DATA, "My profile", count=3)
+    assert len(requests) == 1 and requests[0]["n"] == 3
+    assert [v["cover_letter"] for v in report["variants"]] == ["Dear Acme, I design jigs.", "Hello Acme team, I build drones."]
+    assert report["duplicates_dropped"] == 1 and report["prompt_tokens"] == 400
+    assert report["requested"] == 3 and report["returned_by_model"] == 3
+    assert all(v["latency_ms"] is not None and v["completion_tokens"] > 0 for v in report["variants"])
+
+    requests.clear()
+    report = openai_cover_letter.generate_cover_letter_variants(JOB_DATA, "My profile", count=5)
+    # The stub returns at most 3 choices per call, so fewer letters come back than were requested
+    assert report["requested"] == 5 and report["returned_by_model"] == 3
+    requests.clear()
+    report = openai_cover_letter.generate_cover_letter_variants(JOB_DATA, "My profile", count=2, tones=["formal", "warm"])
+    assert sorted(r["messages"][-1]["content"].split(" tone")[0] for r in requests) == [
+        "Write this version in a formal", "Write this version in a warm"
+    ]
+    assert requests[0]["messages"][:2] == requests[1]["messages"][:2]  # shared prompt prefix
+    assert report["calls"] == 2 and report["prompt_tokens"] == 800
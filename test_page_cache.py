@@ -0,0 +1,102 @@
+import os
+import tempfile
+import time
+
+import pytest
+
+from utils import job_scraper
+from utils.cache import MemoryCache, SQLiteCache
+
+JOB_HTML = "<html><body><h1>Mechanical Engineer</h1><p>" + ("Design and test systems. " * 20) + "</p></body></html>"
+BLOCK_HTML = "<html><body>Help us keep SEEK secure, confirm you are human.</body></html>"
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = {"direct": 0, "proxy": 0}
+
+    def fake_direct(job_url, headers, timeout=20):
+        calls["direct"] += 1
+        return calls["direct_html"]
+
+    def fake_proxy(job_url, headers, timeout=20):
+        calls["proxy"] += 1
+        return calls["proxy_html"]
+
+    monkeypatch.setattr(job_scraper, "_fetch_direct", fake_direct)
+    monkeypatch.setattr(job_scraper, "_fetch_brightdata", fake_proxy)
+    monkeypatch.setattr(job_scraper, "PROXY_FIRST_DOMAINS", [])
+    job_scraper.set_page_cache(MemoryCache(max_entries=10, ttl=60))
+    yield calls
+    job_scraper.set_page_cache(None)
+
+
+def test_normalize_job_url_drops_tracking():
+    a = job_scraper.normalize_job_url("https://WWW.Seek.com.au/job/84825118/?type=standard&ref=search#sol=abc")
+    b = job_scraper.normalize_job_url("https://www.seek.com.au/job/84825118?utm_source=x")
+    assert a == b == "https://www.seek.com.au/job/84825118"
+
+
+def test_repeat_lookup_skips_network(calls):
+    calls["direct_html"] = JOB_HTML
+    first = job_scraper.scrape_job_details("https://www.seek.com.au/job/1?ref=a")
+    second = job_scraper.scrape_job_details("https://www.seek.com.au/job/1")
+    assert first == second
+    assert calls == {"direct": 1, "proxy": 0, "direct_html": JOB_HTML}
+
+
+def test_block_pages_are_negatively_cached(calls):
+    calls["direct_html"] = BLOCK_HTML
+    calls["proxy_html"] = BLOCK_HTML
+    for _ in range(2):
+        with pytest.raises(Exception, match="site restrictions"):
+            job_scraper.scrape_job_details("https://www.seek.com.au/job/2")
+    assert calls["direct"] == 1 and calls["proxy"] == 1
+
+
+
+def test_zero_negative_ttl_does_not_cache_block_pages(calls, monkeypatch):
+    monkeypatch.setattr(job_scraper, "PAGE_CACHE_NEGATIVE_TTL", 0)
+    calls["direct_html"] = BLOCK_HTML
+    calls["proxy_html"] = BLOCK_HTML
+    for _ in range(2):
+        with pytest.raises(Exception, match="site restrictions"):
+            job_scraper.scrape_job_details("https://www.seek.com.au/job/3")
+    assert calls["direct"] == 2 and calls["proxy"] == 2
+
+
+@pytest.mark.parametrize("make_cache", [
+    lambda tmp: MemoryCache(ttl=60),
+    lambda tmp: SQLiteCache(os.path.join(tmp, "cache.sqlite3"), ttl=60),
+])
+def test_non_positive_ttl_stores_nothing(make_cache):
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = make_cache(tmp)
+        cache.set("k", 1)
+        cache.set("k", 2, ttl=0)
+        cache.set("j", 3, ttl=-5)
+        assert cache.get("k") is None and cache.get("j") is None
+        assert cache.stats()["entries"] == 0
+
+def test_memory_cache_lru_and_ttl():
+    cache = MemoryCache(max_entries=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1
+    cache.set("d", 4, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("d") is None
+    assert cache.stats()["evictions"] >= 1
+
+
+def test_sqlite_cache_persists_across_instances():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "pages.sqlite3")
+        SQLiteCache(path, namespace="pages", max_entries=2).set("k", {"text": "hello"})
+        cache = SQLiteCache(path, namespace="pages", max_entries=2)
+        assert cache.get("k") == {"text": "hello"}
+        cache.set("k2", 2)
+        cache.set("k3", 3)
+        assert cache.stats()["entries"] == 2
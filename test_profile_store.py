@@ -0,0 +1,90 @@
+import pytest
+
+import app as app_module
+from utils import profile_store
+from utils.cache import MemoryCache, SQLiteCache
+
+PROFILE = "Jane Doe\nMechanical Engineer\n\nExperience:\n- Acme: designing jigs\n- Acme: designing jigs\n"
+
+
+@pytest.fixture
+def store():
+    store = MemoryCache(max_entries=2, ttl=60)
+    profile_store.set_profile_store(store)
+    yield store
+    profile_store.set_profile_store(None)
+
+
+def test_save_profile_dedupes_by_content_hash(store):
+    first = profile_store.save_profile(PROFILE, filename="cv.txt")
+    again = profile_store.save_profile("  Jane Doe\nMechanical   Engineer\nExperience:\n- Acme: designing jigs\n- Acme: designing jigs")
+    assert first["profile_id"] == again["profile_id"] and again["filename"] == "cv.txt"
+    assert first["summary"] == "Jane Doe\nMechanical Engineer\nExperience:\n- Acme: designing jigs"
+
+
+def test_summary_is_cut_to_token_budget(monkeypatch):
+    monkeypatch.setattr(profile_store, "count_tokens", lambda text: len(text) // 4)
+    summary = profile_store.summarize_profile("\n".join(f"Project {i}: built a gearbox test rig" for i in range(100)), 50)
+    assert summary.startswith("Project 0") and len(summary) // 4 <= 50
+
+
+def test_over_budget_summary_keeps_every_section(monkeypatch):
+    monkeypatch.setattr(profile_store, "count_tokens", lambda text: len(text.split()))
+    text = "\n".join(
+        ["Jane Doe", "Experience:"] + [f"- Project {i}: built a gearbox test rig" for i in range(50)]
+        + ["Skills:", "- SolidWorks, FEA", "Education:", "- BEng Mechanical Engineering"]
+    )
+    summary = profile_store.summarize_profile(text, 60).splitlines()
+    assert summary[:3] == ["Jane Doe", "Experience:", "- Project 0: built a gearbox test rig"]
+    assert "- SolidWorks, FEA" in summary and "- BEng Mechanical Engineering" in summary
+    assert "- Project 49: built a gearbox test rig" not in summary
+    assert sum(len(line.split()) + 1 for line in summary) <= 60
+
+
+def test_truncated_summary_is_reported_in_api_response(store, monkeypatch):
+    monkeypatch.setattr(profile_store, "PROFILE_SUMMARY_TOKEN_BUDGET", 20)
+    client = app_module.app.test_client()
+    long_profile = "\n".join(f"Project {i}: built a gearbox test rig" for i in range(30))
+    body = client.post("/profiles", json={"cover_letter_text": long_profile}).get_json()
+    assert body["summary_truncated"] and body["summary_omitted_lines"] > 0
+    assert "20-token summary budget" in body["warning"]
+    body = client.post("/profiles", json={"cover_letter_text": PROFILE}).get_json()
+    assert not body["summary_truncated"] and "warning" not in body
+
+def test_store_is_size_bounded(store):
+    ids = [profile_store.save_profile(f"Profile {i}")["profile_id"] for i in range(3)]
+    assert profile_store.get_profile(ids[0]) is None
+    assert profile_store.get_profile(ids[2])["text"] == "Profile 2"
+
+
+def test_rejects_oversized_profile(store, monkeypatch):
+    monkeypatch.setattr(profile_store, "PROFILE_MAX_CHARS", 10)
+    with pytest.raises(ValueError):
+        profile_store.save_profile("x" * 11)
+
+
+def test_sqlite_backend_persists_profiles(tmp_path):
+    profile_store.set_profile_store(SQLiteCache(str(tmp_path / "profiles.sqlite3"), namespace="profiles"))
+    try:
+        profile_id = profile_store.save_profile(PROFILE)["profile_id"]
+        profile_store.set_profile_store(SQLiteCache(str(tmp_path / "profiles.sqlite3"), namespace="profiles"))
+        assert profile_store.get_profile(profile_id)["content_hash"].startswith(profile_id)
+    finally:
+        profile_store.set_profile_store(None)
+
+
+def test_generate_with_profile_id_uses_stored_summary(store, monkeypatch):
+    client = app_module.app.test_client()
+    uploaded = client.post("/profiles", json={"cover_letter_text": PROFILE})
+    assert uploaded.status_code == 201 and "text" not in uploaded.get_json()
+    profile_id = uploaded.get_json()["profile_id"]
+
+    letters = []
+    monkeypatch.setattr(app_module, "generate_cover_letter", lambda job, letter: letters.append(letter) or "Dear Acme")
+    response = client.post("/generate-cover-letter", json={"job_data": {"job_title": "Engineer"}, "profile_id": profile_id})
+    assert response.get_json()["cover_letter"] == "Dear Acme"
+    assert letters == [uploaded.get_json()["summary"]]
+
+    assert client.post("/generate-cover-letter", json={"job_data": {}, "profile_id": "missing"}).status_code == 404
+    assert client.delete(f"/profiles/{profile_id}").get_json()["deleted"] is True
+    assert client.get(f"/profiles/{profile_id}").status_code == 404
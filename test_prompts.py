@@ -0,0 +1,45 @@
+import json
+import hashlib
+from types import SimpleNamespace
+
+from utils import openai_cover_letter
+from utils.prompts import TEMPLATES
+
+JOB_DATA = {"job_title": "Mechanical Engineer", "company_name": "Acme", "skills": ["CAD"]}
+
+
+def test_static_prefix_comes_first_and_is_shared():
+    first = openai_cover_letter._cover_letter_messages(JOB_DATA, "Profile A")
+    second = openai_cover_letter._cover_letter_messages({"job_title": "Welder"}, "Profile B", tone="warm")
+    assert first[0] == second[0] and first[0]["role"] == "system"
+    assert "Profile A" not in first[0]["content"] and "Mechanical Engineer" not in first[0]["content"]
+    # The date changes daily, so it goes last in the user message
+    assert first[1]["content"].rstrip().splitlines()[-1].startswith("Today's date:")
+
+
+def test_prefixes_match_recorded_versions():
+    # Update with `python benchmarks/prompt_replay.py --update` after a deliberate prompt change
+    with open("benchmarks/fixtures/prompt_prefixes.json", encoding="utf-8") as f:
+        recorded = json.load(f)
+    for template in TEMPLATES.values():
+        assert recorded.get(template.id) == hashlib.sha256(template.prefix.encode("utf-8")).hexdigest(), template.id
+
+
+def test_usage_stats_report_cache_hits_and_cost_per_letter():
+    stats = openai_cover_letter.UsageStats()
+    usage = SimpleNamespace(prompt_tokens=2000, completion_tokens=400,
+                            prompt_tokens_details=SimpleNamespace(cached_tokens=1024))
+    stats.record("interpret", SimpleNamespace(prompt_tokens=1000, completion_tokens=100), model="gpt-4o")
+    stats.record("generate", usage, model="gpt-4o", letters=1)
+    stats.record("generate", None, model="gpt-4o", letters=1)
+    total = stats.stats()["total"]
+    assert total["cached_tokens"] == 1024 and total["cache_hit_ratio"] == round(1024 / 3000, 4)
+    expected = (1000 * 2.5 + 100 * 10 + 976 * 2.5 + 1024 * 1.25 + 400 * 10) / 1_000_000
+    assert total["cost_usd"] == round(expected, 6)
+    assert total["cost_per_letter_usd"] == round(expected / 2, 6)
+
+
+def test_cached_tokens_only_discount_models_with_prompt_caching():
+    cost = openai_cover_letter.usage_cost
+    assert cost("gpt-4-turbo", 2000, 1024, 0) == cost("gpt-4-turbo", 2000, 0, 0)
+    assert cost("gpt-4o", 2000, 1024, 0) < cost("gpt-4o", 2000, 0, 0)
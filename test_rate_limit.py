@@ -0,0 +1,160 @@
+import time
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+import requests
+
+import app as app_module
+from utils import job_scraper, openai_cover_letter, rate_limit
+from utils.rate_limit import CircuitBreaker, RateLimited, SQLiteStateStore, TokenBucket
+
+JOB_HTML = "<html><body><h1>Mechanical Engineer</h1><p>" + ("Design and test systems. " * 20) + "</p></body></html>"
+BLOCK_HTML = "<html><body>Help us keep SEEK secure, confirm you are human.</body></html>"
+JOB_DATA = {"job_title": "Mechanical Engineer", "company_name": "Acme", "skills": ["CAD"]}
+
+
+def rate_limit_error(code="rate_limit_exceeded"):
+    response = httpx.Response(429, request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+    return openai.RateLimitError("Rate limit reached", response=response, body={"code": code})
+
+
+def test_bucket_allows_burst_then_queues_callers():
+    bucket = TokenBucket("test", rate=10, burst=3)
+    waits = [bucket.reserve("example.com", max_wait=1)[1] for _ in range(5)]
+    assert waits[:3] == [0.0, 0.0, 0.0]
+    assert waits[3] == pytest.approx(0.1, abs=0.02)
+    assert waits[4] == pytest.approx(0.2, abs=0.02)
+    granted, wait = bucket.reserve("example.com", max_wait=0.1)
+    assert not granted and wait > 0.1
+    with pytest.raises(RateLimited):
+        bucket.acquire("example.com", max_wait=0.1)
+    # Keys are independent
+    assert bucket.reserve("other.com", max_wait=0) == (True, 0.0)
+
+
+def test_penalize_halves_rate_which_then_recovers():
+    bucket = TokenBucket("test", rate=4, burst=4, recovery=40)
+    assert bucket.penalize("example.com") == 2
+    assert bucket.reserve("example.com", max_wait=0)[0] is False
+    time.sleep(0.1)
+    assert bucket.current_rate("example.com") == pytest.approx(4, abs=0.01)
+
+
+def test_breaker_opens_after_threshold_and_lets_one_probe_through():
+    breaker = CircuitBreaker("test", threshold=2, cooldown=0.1, probe_timeout=5)
+    assert breaker.allow("example.com")
+    assert breaker.record_failure("example.com") is False
+    assert breaker.record_failure("example.com") is True
+    assert not breaker.allow("example.com")
+    assert "example.com" in breaker.open_keys()
+    time.sleep(0.15)
+    assert breaker.allow("example.com")
+    assert not breaker.allow("example.com")  # probe in flight
+    breaker.record_success("example.com")
+    assert breaker.allow("example.com")
+    assert breaker.open_keys() == {}
+
+
+def test_sqlite_state_is_shared_between_stores(tmp_path):
+    path = str(tmp_path / "rate_limit.sqlite3")
+    bucket = TokenBucket("test", rate=1, burst=1)
+    rate_limit.set_rate_limit_store(SQLiteStateStore(path))
+    assert bucket.reserve("example.com", max_wait=0) == (True, 0.0)
+    # A second worker opening the same file sees the bucket already drained
+    rate_limit.set_rate_limit_store(SQLiteStateStore(path))
+    assert bucket.reserve("example.com", max_wait=0)[0] is False
+
+
+@pytest.fixture
+def scraper(monkeypatch):
+    calls = {"direct": 0, "proxy": 0, "direct_html": BLOCK_HTML}
+
+    def direct(job_url, headers, timeout=20):
+        calls["direct"] += 1
+        return calls["direct_html"]
+
+    def proxy(job_url, headers, timeout=20):
+        calls["proxy"] += 1
+        return JOB_HTML
+
+    monkeypatch.setattr(job_scraper, "_fetch_direct", direct)
+    monkeypatch.setattr(job_scraper, "_fetch_brightdata", proxy)
+    monkeypatch.setattr(job_scraper, "route_stats", job_scraper.DomainRouteStats(min_samples=100))
+    monkeypatch.setattr(job_scraper, "PROXY_FIRST_DOMAINS", [])
+    monkeypatch.setattr(job_scraper, "direct_limiter", TokenBucket("direct", rate=1000, burst=10))
+    job_scraper.set_page_cache(None)
+    return calls
+
+
+def test_open_breaker_skips_direct_fetch(scraper):
+    # A domain no other test scrapes, so nothing else can move its breaker
+    for i in range(job_scraper.SCRAPE_BREAKER_THRESHOLD):
+        job_scraper.scrape_job_details(f"https://breaker.example.com/{i}")
+    assert scraper["direct"] == job_scraper.SCRAPE_BREAKER_THRESHOLD
+    assert job_scraper.direct_limiter.current_rate("breaker.example.com") < 1000
+
+    text = job_scraper.scrape_job_details("https://breaker.example.com/next")
+    assert "Mechanical Engineer" in text
+    assert scraper["direct"] == job_scraper.SCRAPE_BREAKER_THRESHOLD
+    assert "breaker.example.com" in job_scraper.direct_breaker.open_keys()
+
+
+def test_not_found_does_not_count_against_domain(scraper, monkeypatch):
+    def not_found(job_url, headers, timeout=20):
+        raise requests.HTTPError("404 Client Error", response=SimpleNamespace(status_code=404))
+
+    monkeypatch.setattr(job_scraper, "_fetch_direct", not_found)
+    for i in range(job_scraper.SCRAPE_BREAKER_THRESHOLD + 1):
+        job_scraper.scrape_job_details(f"https://jobs.example.com/{i}")
+    assert job_scraper.direct_breaker.open_keys() == {}
+
+
+class FlakyClient:
+    """Fake OpenAI client raising the given errors before answering."""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="Dear Hiring Manager"))])
+
+
+@pytest.fixture
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(openai_cover_letter, "OPENAI_BACKOFF_BASE", 0.0)
+    monkeypatch.setattr(openai_cover_letter, "openai_limiter", TokenBucket("openai", rate=1000, burst=10))
+
+
+def test_openai_429_is_retried_with_backoff(monkeypatch, fast_retries):
+    client = FlakyClient([rate_limit_error(), rate_limit_error()])
+    monkeypatch.setattr(openai_cover_letter, "get_openai_client", lambda: client)
+    assert openai_cover_letter.generate_cover_letter(JOB_DATA, "My profile") == "Dear Hiring Manager"
+    assert client.calls == 3
+    assert openai_cover_letter.openai_limiter.current_rate("api") < 1000
+
+
+def test_openai_exhausted_quota_is_not_retried(monkeypatch, fast_retries):
+    client = FlakyClient([rate_limit_error("insufficient_quota")])
+    monkeypatch.setattr(openai_cover_letter, "get_openai_client", lambda: client)
+    with pytest.raises(Exception, match="Error interpreting job details"):
+        openai_cover_letter.interpret_job_details("Mechanical Engineer at Acme")
+    assert client.calls == 1
+
+
+def test_persistent_429_returns_503_with_retry_after(monkeypatch, fast_retries):
+    client = FlakyClient([rate_limit_error()] * (openai_cover_letter.OPENAI_MAX_RETRIES + 1))
+    monkeypatch.setattr(openai_cover_letter, "get_openai_client", lambda: client)
+    app_module.app.config["TESTING"] = True
+    response = app_module.app.test_client().post(
+        "/generate-cover-letter", json={"job_data": JOB_DATA, "cover_letter_text": "My profile"}
+    )
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
+    assert client.calls == openai_cover_letter.OPENAI_MAX_RETRIES + 1
@@ -0,0 +1,192 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+from utils import job_scraper, openai_cover_letter, single_flight
+from utils.cache import SQLiteCache
+from utils.metrics import COALESCED_REQUESTS
+from utils.rate_limit import SQLiteStateStore
+from utils.single_flight import SingleFlight
+
+JOB_HTML = "<html><body><h1>Mechanical Engineer</h1><p>" + ("Design and test systems. " * 20) + "</p></body></html>"
+
+
+def slow_call(calls, value="result", delay=0.2, error=None):
+    def func():
+        calls.append(threading.get_ident())
+        time.sleep(delay)
+        if error:
+            raise error
+        return value
+    return func
+
+
+def test_concurrent_calls_share_one_computation():
+    flight = SingleFlight("test_share")
+    calls = []
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        results = list(pool.map(lambda _: flight.do("key", slow_call(calls)), range(5)))
+    assert results == ["result"] * 5
+    assert len(calls) == 1
+    assert COALESCED_REQUESTS.value(flight="test_share", scope="worker") == 4
+    # Once the flight has landed the next call runs again
+    assert flight.do("key", slow_call(calls, delay=0)) == "result"
+    assert len(calls) == 2
+
+
+def test_exception_is_shared_within_a_process():
+    flight = SingleFlight("test_error")
+    calls = []
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        futures = [pool.submit(flight.do, "key", slow_call(calls, error=ValueError("boom"))) for _ in range(3)]
+    for future in futures:
+        with pytest.raises(ValueError, match="boom"):
+            future.result()
+    assert len(calls) == 1
+
+
+@pytest.fixture
+def shared(tmp_path):
+    path = str(tmp_path / "single_flight.sqlite3")
+    single_flight.set_shared_flights((SQLiteStateStore(path), SQLiteCache(path, namespace="single_flight")))
+    yield
+    single_flight.set_shared_flights(None)
+
+
+def test_second_worker_waits_for_the_first(shared):
+    # Two instances stand in for the same flight in two gunicorn workers
+    worker_a, worker_b = SingleFlight("test_host"), SingleFlight("test_host")
+    calls = []
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        first = pool.submit(worker_a.do, "key", slow_call(calls, value={"job_title": "Engineer"}, delay=0.3))
+        time.sleep(0.05)
+        second = pool.submit(worker_b.do, "key", slow_call(calls, value="not used"))
+    assert first.result() == second.result() == {"job_title": "Engineer"}
+    assert len(calls) == 1
+    assert COALESCED_REQUESTS.value(flight="test_host", scope="host") == 1
+
+
+def test_failed_leader_shares_its_error_with_waiting_worker(shared):
+    worker_a, worker_b = SingleFlight("test_host_error"), SingleFlight("test_host_error")
+    calls = []
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        first = pool.submit(worker_a.do, "key", slow_call(calls, error=ValueError("boom")))
+        time.sleep(0.05)
+        second = pool.submit(worker_b.do, "key", slow_call(calls, value="not used", delay=0))
+    for future in (first, second):
+        with pytest.raises(ValueError, match="boom"):
+            future.result()
+    assert len(calls) == 1
+    # The failure is not cached for calls that arrive afterwards
+    assert worker_b.do("key", slow_call(calls, value="retried", delay=0)) == "retried"
+
+
+def test_interrupted_leader_lets_waiting_worker_run(shared):
+    worker_a, worker_b = SingleFlight("test_host_interrupted"), SingleFlight("test_host_interrupted")
+    calls = []
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        first = pool.submit(worker_a.do, "key", slow_call(calls, error=KeyboardInterrupt()))
+        time.sleep(0.05)
+        second = pool.submit(worker_b.do, "key", slow_call(calls, value="retried", delay=0))
+    with pytest.raises(KeyboardInterrupt):
+        first.result()
+    assert second.result() == "retried"
+    assert len(calls) == 2
+
+
+def test_interrupted_leader_fails_followers_in_process():
+    flight = SingleFlight("test_interrupted")
+    calls = []
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        leader = pool.submit(flight.do, "key", slow_call(calls, error=KeyboardInterrupt()))
+        time.sleep(0.05)
+        followers = [pool.submit(flight.do, "key", slow_call(calls)) for _ in range(2)]
+    with pytest.raises(KeyboardInterrupt):
+        leader.result()
+    for future in followers:
+        with pytest.raises(Exception, match="interrupted"):
+            future.result()
+    assert len(calls) == 1
+
+
+def test_async_calls_share_one_computation():
+    flight = SingleFlight("test_async")
+    calls = []
+
+    async def func():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return "result"
+
+    async def main():
+        return await asyncio.gather(*(flight.async_do("key", func) for _ in range(4)))
+
+    assert asyncio.run(main()) == ["result"] * 4
+    assert len(calls) == 1
+
+
+def test_same_url_with_tracking_params_is_scraped_once(monkeypatch):
+    fetches = []
+
+    def direct(job_url, headers, timeout=20):
+        fetches.append(job_url)
+        time.sleep(0.2)
+        return JOB_HTML
+
+    monkeypatch.setattr(job_scraper, "_fetch_direct", direct)
+    monkeypatch.setattr(job_scraper, "PROXY_FIRST_DOMAINS", [])
+    job_scraper.set_page_cache(None)
+    urls = [f"https://jobs.example.com/job/1?ref=share{i}" for i in range(4)]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        texts = list(pool.map(job_scraper.scrape_job_details, urls))
+    assert len(set(texts)) == 1 and "Mechanical Engineer" in texts[0]
+    assert len(fetches) == 1
+
+
+def test_same_job_and_profile_generate_one_letter(monkeypatch):
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        time.sleep(0.2)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="Dear Hiring Manager"))])
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(openai_cover_letter, "get_openai_client", lambda: client)
+    job_data = {"job_title": "Mechanical Engineer", "company_name": "Acme", "skills": ["CAD"]}
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        letters = list(pool.map(lambda profile: openai_cover_letter.generate_cover_letter(dict(job_data), profile),
+                                ["My profile", "My profile  ", "Another profile"]))
+    assert letters == ["Dear Hiring Manager"] * 3
+    # Whitespace around the profile does not matter; a different profile is its own call
+    assert len(calls) == 2
+
+
+def test_failed_generation_is_raised_to_every_waiter_and_not_shared_later(monkeypatch):
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        time.sleep(0.2)
+        if len(calls) == 1:
+            raise RuntimeError("upstream 500")
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="Dear Hiring Manager"))])
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(openai_cover_letter, "get_openai_client", lambda: client)
+    job_data = {"job_title": "Mechanical Engineer", "company_name": "Acme"}
+
+    def generate():
+        try:
+            return openai_cover_letter.generate_cover_letter(dict(job_data), "My profile")
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        outcomes = list(pool.map(lambda _: generate(), range(2)))
+    assert all(isinstance(outcome, Exception) and "upstream 500" in str(outcome) for outcome in outcomes)
+    assert openai_cover_letter.generate_cover_letter(dict(job_data), "My profile") == "Dear Hiring Manager"
@@ -0,0 +1,60 @@
+import os
+import logging
+import threading
+
+from utils.job_queue import JobQueue, QueueWorkers
+from utils.job_scraper import scrape_job_details
+from utils.openai_cover_letter import interpret_job_details, generate_cover_letter, extract_and_generate
+
+logger = logging.getLogger(__name__)
+
+JOB_TYPES = ("extract", "generate", "pipeline")
+# Accepted range for a job's priority (higher runs first)
+JOB_PRIORITY_MAX = 1000
+# Longest a GET /jobs/<id>/wait long-poll holds its request worker (a whole sync worker under
+# gunicorn); keep it well below the gunicorn worker timeout (GUNICORN_TIMEOUT, 30s by default)
+JOB_WAIT_MAX = float(os.getenv("JOB_WAIT_MAX", 5))
+JOB_WAIT_POLL = 0.5
+FINISHED_STATUSES = ("succeeded", "failed")
+
+
+def _extract(payload):
+    raw_text = scrape_job_details(payload["job_url"])
+    return {"job_data": interpret_job_details(raw_text), "raw_text": raw_text[:2000]}
+
+
+def _generate(payload):
+    cover_letter = generate_cover_letter(payload["job_data"], payload["cover_letter_text"])
+    return {"job_data": payload["job_data"], "cover_letter": cover_letter}
+
+
+def _pipeline(payload):
+    # One OpenAI call for both the job data and the letter
+    raw_text = scrape_job_details(payload["job_url"])
+    job_data, cover_letter = extract_and_generate(raw_text, payload["cover_letter_text"])
+    return {"job_data": job_data, "raw_text": raw_text[:2000], "cover_letter": cover_letter}
+
+
+HANDLERS = {"extract": _extract, "generate": _generate, "pipeline": _pipeline}
+
+_queue = None
+_workers = None
+_pid = None
+_lock = threading.Lock()
+
+
+def get_job_queue():
+    """Return this process's JobQueue, starting its worker threads on first use.
+
+    Workers start lazily (and again after a fork) so each gunicorn worker runs
+    its own pool against the shared SQLite queue.
+    """
+    global _queue, _workers, _pid
+    with _lock:
+        if _pid != os.getpid():
+            _queue = JobQueue()
+            _workers = QueueWorkers(_queue, HANDLERS)
+            _workers.start()
+            _pid = os.getpid()
+            logger.info(f"Started {_workers.threads} background job workers")
+        return _queue
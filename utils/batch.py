@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from utils.job_scraper import scrape_job_details, async_scrape_job_details, normalize_job_url, url_domain
+from utils.openai_cover_letter import interpret_job_details, async_interpret_job_details
+
+logger = logging.getLogger(__name__)
+
+BATCH_MAX_URLS = int(os.getenv("BATCH_MAX_URLS", 500))
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", 8))
+BATCH_PER_DOMAIN = int(os.getenv("BATCH_PER_DOMAIN", 2))
+BATCH_MAX_URL_LENGTH = int(os.getenv("BATCH_MAX_URL_LENGTH", 2048))
+
+
+def parse_job_urls(lines):
+    """Read job URLs from JSONL ({"job_url": ...} or a JSON string) or plain one-per-line text."""
+    urls = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line[0] in "{\"":
+            item = json.loads(line)
+            url = item.get("job_url") if isinstance(item, dict) else item
+        else:
+            url = line
+        if url:
+            urls.append(url)
+    return urls
+
+
+def validate_job_urls(job_urls):
+    """Check a batch is a list of non-empty URL strings, so bad input is a 400 rather than a failure mid-stream."""
+    if not isinstance(job_urls, list):
+        raise ValueError("job_urls must be a list of URLs")
+    for i, url in enumerate(job_urls):
+        if not isinstance(url, str) or not url.strip():
+            raise ValueError(f"job_urls[{i}] must be a non-empty string")
+        if len(url) > BATCH_MAX_URL_LENGTH:
+            raise ValueError(f"job_urls[{i}] is longer than {BATCH_MAX_URL_LENGTH} characters")
+    return [url.strip() for url in job_urls]
+
+
+def load_checkpoint(path):
+    """Normalized URLs that already succeeded in an earlier run (failures are retried)."""
+    done = set()
+    if not path or not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # partial line from an interrupted run
+            if result.get("success"):
+                done.add(normalize_job_url(result["job_url"]))
+    return done
+
+
+def _pending_urls(job_urls, checkpoint_path):
+    """De-duplicate the input and drop URLs recorded as done in the checkpoint."""
+    done = load_checkpoint(checkpoint_path)
+    pending = []
+    seen = set()
+    for url in job_urls:
+        key = normalize_job_url(url)
+        if key in seen or key in done:
+            continue
+        seen.add(key)
+        pending.append(url)
+    skipped = len(job_urls) - len(pending)
+    if skipped:
+        logger.info(f"Batch: skipping {skipped} duplicate or already-completed URLs")
+    return pending
+
+
+class _Checkpoint:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def write(self, result):
+        if not self.path:
+            return
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result) + "\n")
+
+
+def _result(job_url, started, job_data=None, error=None):
+    result = {
+        "job_url": job_url,
+        "success": error is None,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+    if error is None:
+        result["job_data"] = job_data
+    else:
+        result["error"] = str(error)
+    return result
+
+
+def _by_domain(job_urls):
+    queues = {}
+    for url in job_urls:
+        queues.setdefault(url_domain(url), deque()).append(url)
+    return queues
+
+
+def iter_batch_results(job_urls, workers=BATCH_WORKERS, per_domain=BATCH_PER_DOMAIN, checkpoint_path=None):
+    """Scrape and interpret job_urls in a bounded thread pool, yielding each result as it finishes.
+
+    At most `per_domain` scrapes hit the same site at once. A URL only reaches
+    the pool once it holds one of its domain's slots, so threads never sit
+    waiting on a busy site while other sites could be scraped. A failing URL
+    yields {"success": False, "error": ...} and does not stop the batch.
+    """
+    pending = _by_domain(_pending_urls(job_urls, checkpoint_path))
+    checkpoint = _Checkpoint(checkpoint_path)
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch")
+    # future -> (job_url, started, domain); domain is None once the scrape is done and only interpret is left
+    running = {}
+
+    def start_scrape(domain):
+        if pending[domain]:
+            job_url = pending[domain].popleft()
+            running[executor.submit(scrape_job_details, job_url)] = (job_url, time.perf_counter(), domain)
+
+    try:
+        for domain in pending:
+            for _ in range(per_domain):
+                start_scrape(domain)
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                job_url, started, domain = running.pop(future)
+                result = None
+                try:
+                    value = future.result()
+                except Exception as e:
+                    logger.warning(f"Batch item failed for {job_url}: {e}")
+                    result = _result(job_url, started, error=e)
+                else:
+                    if domain is None:
+                        result = _result(job_url, started, job_data=value)
+                    else:
+                        running[executor.submit(interpret_job_details, value)] = (job_url, started, None)
+                if domain is not None:
+                    start_scrape(domain)  # this URL's domain slot is free again
+                if result is not None:
+                    checkpoint.write(result)
+                    yield result
+    finally:
+        # If the consumer stops early (e.g. client disconnected), drop queued URLs
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def async_iter_batch_results(job_urls, workers=BATCH_WORKERS, per_domain=BATCH_PER_DOMAIN):
+    """Async counterpart of iter_batch_results for the async app (no checkpoint file).
+
+    A URL takes its domain slot before a worker slot, so URLs queued on a busy
+    site do not hold worker slots other sites could use.
+    """
+    pending = _pending_urls(job_urls, None)
+    slots = asyncio.Semaphore(workers)
+    domain_limits = {}
+
+    async def process(job_url):
+        started = time.perf_counter()
+        try:
+            async with domain_limits.setdefault(url_domain(job_url), asyncio.Semaphore(per_domain)):
+                async with slots:
+                    raw_text = await async_scrape_job_details(job_url)
+            async with slots:
+                job_data = await async_interpret_job_details(raw_text)
+            return _result(job_url, started, job_data=job_data)
+        except Exception as e:
+            logger.warning(f"Batch item failed for {job_url}: {e}")
+            return _result(job_url, started, error=e)
+
+    tasks = [asyncio.ensure_future(process(url)) for url in pending]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # If the consumer stops early (e.g. client disconnected), drop the URLs not yet done
+        for task in tasks:
+            task.cancel()
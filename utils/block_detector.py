@@ -0,0 +1,100 @@
+import re
+import threading
+from collections import Counter
+
+from utils.metrics import registry
+
+# Signature name -> pattern. Matching is case-insensitive.
+BLOCK_SIGNATURES = {
+    "residential_failed": r"residential\s*failed",
+    "site_not_available": r"requested\s*site\s*is\s*not\s*available",
+    "robots_txt": r"robots\.txt",
+    "access_denied": r"access\s*denied",
+    "forbidden": r"forbidden",
+    "webpage_not_available": r"webpage\s*not\s*available",
+    "seek_secure": r"help\s*us\s*keep\s*seek\s*secure",
+    "confirm_human": r"confirm\s*you\s*are\s*human",
+    "bright_data": r"bright\s*data",
+    "captcha": r"captcha",
+}
+
+# Block pages are small; documents up to this size are scanned in full
+SHORT_DOCUMENT_CHARS = 64 * 1024
+# For larger documents only the <title> and the start of <body> are scanned
+EARLY_BODY_CHARS = 16 * 1024
+
+# Compiled once and run over an already-lowercased region. Separate patterns beat a
+# single alternation here: CPython's re only uses its fast literal-prefix scan when
+# a pattern starts with a literal, which an alternation of ten signatures does not.
+_BLOCK_RES = [(name, re.compile(pattern)) for name, pattern in BLOCK_SIGNATURES.items()]
+_TITLE_RE = re.compile(r"<title[^>]*>(.*?)</title>", re.IGNORECASE | re.DOTALL)
+
+
+class BlockStats:
+    """Counts pages checked and how often each block signature matched."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.matches = Counter()
+
+    def record(self, signature):
+        with self._lock:
+            self.checked += 1
+            if signature:
+                self.matches[signature] += 1
+
+    def stats(self):
+        with self._lock:
+            blocked = sum(self.matches.values())
+            return {
+                "checked": self.checked,
+                "blocked": blocked,
+                "block_rate": round(blocked / self.checked, 4) if self.checked else 0.0,
+                "signatures": dict(self.matches),
+            }
+
+
+block_stats = BlockStats()
+
+
+def _block_metrics():
+    stats = block_stats.stats()
+    yield ("cover_letter_block_checks_total", "counter", "Fetched pages checked for block signatures", [({}, stats["checked"])])
+    yield ("cover_letter_block_matches_total", "counter", "Pages identified as block pages, by signature",
+           [({"signature": name}, count) for name, count in stats["signatures"].items()])
+
+
+registry.register_collector(_block_metrics)
+
+
+def _regions(html_text):
+    """(start, end) spans of html_text where block text can appear."""
+    if len(html_text) <= SHORT_DOCUMENT_CHARS:
+        return [(0, len(html_text))]
+    regions = []
+    title = _TITLE_RE.search(html_text, 0, EARLY_BODY_CHARS * 4)
+    if title:
+        regions.append(title.span(1))
+    regions.append((0, EARLY_BODY_CHARS))
+    # <head> may hold megabytes of inline JSON, so look for the body separately
+    body = html_text.find("<body")
+    if body == -1:
+        body = html_text.find("<BODY")
+    if body > EARLY_BODY_CHARS:
+        regions.append((body, body + EARLY_BODY_CHARS))
+    return regions
+
+
+def block_signature(html_text):
+    """Name of the first block signature found in html_text, "empty" for no content, else None."""
+    signature = "empty" if not html_text else None
+    if html_text:
+        # Lowercase only the bounded regions, never a copy of the whole document
+        text = "\n".join(html_text[start:end] for start, end in _regions(html_text)).lower()
+        for name, pattern in _BLOCK_RES:
+            if pattern.search(text):
+                signature = name
+                break
+    block_stats.record(signature)
+    return signature
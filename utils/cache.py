@@ -0,0 +1,232 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryCache:
+    """In-process TTL cache with LRU eviction once max_entries is reached.
+
+    Values must be JSON-serializable so the same callers can switch to the
+    SQLite backend without changes.
+    """
+
+    def __init__(self, max_entries=512, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= now:
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return json.loads(value)
+
+    def set(self, key, value, ttl=None):
+        """Store value for ttl seconds (the cache default if None); a ttl of 0 or less stores nothing."""
+        ttl = self.ttl if ttl is None else ttl
+        if ttl is not None and ttl <= 0:
+            self.delete(key)
+            return
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (expires_at, json.dumps(value))
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": "memory",
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class SQLiteCache:
+    """On-disk TTL/LRU cache shared by every worker process on the host.
+
+    Each instance owns one namespace inside the database file, so several
+    caches can live side by side in a single file.
+    """
+
+    def __init__(self, path, namespace="default", max_entries=5000, ttl=3600):
+        self.path = path
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " namespace TEXT NOT NULL,"
+                " key TEXT NOT NULL,"
+                " value TEXT NOT NULL,"
+                " expires_at REAL,"
+                " accessed_at REAL NOT NULL,"
+                " PRIMARY KEY (namespace, key))"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS cache_lru ON cache (namespace, accessed_at)"
+            )
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def get(self, key):
+        now = time.time()
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                conn.execute(
+                    "DELETE FROM cache WHERE namespace = ? AND key = ?",
+                    (self.namespace, key),
+                )
+                self.misses += 1
+                return None
+            conn.execute(
+                "UPDATE cache SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (now, self.namespace, key),
+            )
+            self.hits += 1
+            return json.loads(value)
+        finally:
+            conn.close()
+
+    def set(self, key, value, ttl=None):
+        """Store value for ttl seconds (the cache default if None); a ttl of 0 or less stores nothing."""
+        ttl = self.ttl if ttl is None else ttl
+        if ttl is not None and ttl <= 0:
+            self.delete(key)
+            return
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value), expires_at, now),
+            )
+            self._evict(conn, now)
+        finally:
+            conn.close()
+
+    def _evict(self, conn, now):
+        conn.execute(
+            "DELETE FROM cache WHERE namespace = ? AND expires_at IS NOT NULL AND expires_at <= ?",
+            (self.namespace, now),
+        )
+        (count,) = conn.execute(
+            "SELECT COUNT(*) FROM cache WHERE namespace = ?", (self.namespace,)
+        ).fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM cache WHERE rowid IN ("
+                " SELECT rowid FROM cache WHERE namespace = ?"
+                " ORDER BY accessed_at ASC LIMIT ?)",
+                (self.namespace, overflow),
+            )
+            self.evictions += overflow
+
+    def delete(self, key):
+        conn = self._connect()
+        try:
+            conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key)
+            )
+        finally:
+            conn.close()
+
+    def clear(self):
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+        finally:
+            conn.close()
+
+    def stats(self):
+        conn = self._connect()
+        try:
+            (count,) = conn.execute(
+                "SELECT COUNT(*) FROM cache WHERE namespace = ?", (self.namespace,)
+            ).fetchone()
+        finally:
+            conn.close()
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "entries": count,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+def build_cache(prefix, namespace, default_max_entries, default_ttl, default_backend="memory"):
+    """Build a cache from <PREFIX>_BACKEND / _PATH / _MAX_ENTRIES / _TTL env vars.
+
+    Backends: "memory" (the usual default), "sqlite" or "none" (returns None).
+    """
+    backend = os.getenv(f"{prefix}_BACKEND", default_backend).lower()
+    max_entries = int(os.getenv(f"{prefix}_MAX_ENTRIES", default_max_entries))
+    ttl = int(os.getenv(f"{prefix}_TTL", default_ttl))
+
+    if backend == "none":
+        return None
+    if backend == "sqlite":
+        path = os.getenv(f"{prefix}_PATH", os.path.join("cache", "cache.sqlite3"))
+        return SQLiteCache(path, namespace=namespace, max_entries=max_entries, ttl=ttl)
+    if backend != "memory":
+        logger.warning(f"Unknown {prefix}_BACKEND '{backend}', using in-memory cache")
+    return MemoryCache(max_entries=max_entries, ttl=ttl)
@@ -0,0 +1,211 @@
+import os
+import re
+import json
+import logging
+from html.parser import HTMLParser
+
+from utils.http_pools import optional_import
+
+logger = logging.getLogger(__name__)
+
+# "auto" prefers structured data, then lxml, then the streaming tokenizer
+HTML_TEXT_ENGINE = os.getenv("HTML_TEXT_ENGINE", "auto").lower()
+
+# Elements whose content is never part of the job ad
+SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "nav", "iframe"}
+# header/footer are only page chrome outside a sectioning element: an
+# <article><header> usually holds the job title and company
+PAGE_CHROME_TAGS = {"header", "footer"}
+SECTIONING_TAGS = {"article", "aside", "main", "nav", "section"}
+PAGE_CHROME_ROLES = {"banner", "contentinfo"}
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+_PAGE_CHROME_XPATH = (
+    "//header[not(ancestor::article or ancestor::aside or ancestor::main or ancestor::nav or ancestor::section)]"
+    " | //footer[not(ancestor::article or ancestor::aside or ancestor::main or ancestor::nav or ancestor::section)]"
+    " | //*[@role='banner' or @role='contentinfo']"
+)
+
+# Structured data shorter than this is treated as incomplete and ignored
+MIN_STRUCTURED_LENGTH = 200
+
+_JSON_LD_RE = re.compile(
+    r"<script[^>]+type=[\"']application/ld\+json[\"'][^>]*>(.*?)</script>", re.IGNORECASE | re.DOTALL
+)
+_SEEK_STATE_RE = re.compile(r"window\.SEEK_REDUX_DATA\s*=\s*")
+
+
+def extract_text_bs4(html_text):
+    """Original implementation: full BeautifulSoup tree, every text node."""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html_text, "html.parser")
+    return soup.get_text(separator="\n").strip()
+
+
+def _lxml_html():
+    """lxml.html, imported on first use; None if lxml is not installed (the streaming tokenizer is used)."""
+    return optional_import("lxml.html")
+
+
+def extract_text_lxml(html_text):
+    """Parse with lxml, drop non-content elements, return one line per text node."""
+    lxml_html = _lxml_html()
+    etree = lxml_html.etree
+    tree = lxml_html.fromstring(html_text)
+    etree.strip_elements(tree, *SKIP_TAGS, etree.Comment, with_tail=False)
+    for element in tree.xpath(_PAGE_CHROME_XPATH):
+        if element.getparent() is not None:
+            element.drop_tree()
+    return "\n".join(text.strip() for text in tree.itertext() if text.strip())
+
+
+class _VisibleTextParser(HTMLParser):
+    """Streaming tokenizer that keeps text outside SKIP_TAGS and page chrome without building a tree."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._sections = 0
+        self._skip_tag = None  # tag of the element being skipped
+        self._skip_depth = 0  # open elements of that tag inside it, itself included
+
+    def _starts_skip(self, tag, attrs):
+        if tag in SKIP_TAGS or (tag in PAGE_CHROME_TAGS and not self._sections):
+            return True
+        return tag not in VOID_TAGS and dict(attrs).get("role") in PAGE_CHROME_ROLES
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SECTIONING_TAGS:
+            self._sections += 1
+        if self._skip_tag is not None:
+            if tag == self._skip_tag:
+                self._skip_depth += 1
+        elif self._starts_skip(tag, attrs):
+            self._skip_tag, self._skip_depth = tag, 1
+
+    def handle_endtag(self, tag):
+        if tag in SECTIONING_TAGS and self._sections:
+            self._sections -= 1
+        if tag == self._skip_tag:
+            self._skip_depth -= 1
+            if not self._skip_depth:
+                self._skip_tag = None
+
+    def handle_data(self, data):
+        if self._skip_tag is None:
+            data = data.strip()
+            if data:
+                self.parts.append(data)
+
+
+def extract_text_stream(html_text):
+    parser = _VisibleTextParser()
+    parser.feed(html_text)
+    parser.close()
+    return "\n".join(parser.parts)
+
+
+def _html_fragment_text(fragment):
+    return extract_text_lxml(f"<div>{fragment}</div>") if _lxml_html() is not None else extract_text_stream(fragment)
+
+
+def _join_fields(fields):
+    lines = []
+    for label, value in fields:
+        if isinstance(value, list):
+            value = ", ".join(str(item) for item in value if item)
+        if value:
+            lines.append(f"{label}: {value}" if label else str(value))
+    return "\n".join(lines)
+
+
+def _json_ld_postings(html_text):
+    for match in _JSON_LD_RE.finditer(html_text):
+        try:
+            data = json.loads(match.group(1))
+        except json.JSONDecodeError:
+            continue
+        items = data if isinstance(data, list) else data.get("@graph", [data])
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            types = item.get("@type")
+            if types == "JobPosting" or (isinstance(types, list) and "JobPosting" in types):
+                yield item
+
+
+def job_posting_text(html_text):
+    """Text built from a JSON-LD JobPosting, or None if the page has none."""
+    for posting in _json_ld_postings(html_text):
+        organization = posting.get("hiringOrganization") or {}
+        locations = posting.get("jobLocation") or []
+        if isinstance(locations, dict):
+            locations = [locations]
+        location_names = [
+            (loc.get("address") or {}).get("addressLocality") for loc in locations if isinstance(loc, dict)
+        ]
+        text = _join_fields([
+            ("", posting.get("title")),
+            ("Company", organization.get("name") if isinstance(organization, dict) else organization),
+            ("Location", location_names),
+            ("Work type", posting.get("employmentType")),
+            ("Skills", posting.get("skills")),
+            ("Qualifications", posting.get("qualifications")),
+            ("Experience", posting.get("experienceRequirements")),
+            ("", _html_fragment_text(posting.get("description") or "")),
+        ])
+        if len(text) >= MIN_STRUCTURED_LENGTH:
+            return text
+    return None
+
+
+def seek_state_text(html_text):
+    """Text built from Seek's embedded window.SEEK_REDUX_DATA state, or None."""
+    match = _SEEK_STATE_RE.search(html_text)
+    if not match:
+        return None
+    try:
+        state, _ = json.JSONDecoder().raw_decode(html_text, match.end())
+        job = state["jobdetails"]["result"]["job"]
+    except (ValueError, KeyError, TypeError):
+        return None
+    if not isinstance(job, dict):
+        return None
+
+    def label(value):
+        return (value.get("label") or value.get("name")) if isinstance(value, dict) else value
+
+    text = _join_fields([
+        ("", job.get("title")),
+        ("Company", label(job.get("advertiser"))),
+        ("Location", label(job.get("location"))),
+        ("Work type", label(job.get("workTypes"))),
+        ("Salary", label(job.get("salary"))),
+        ("", _html_fragment_text(job.get("content") or "")),
+    ])
+    return text if len(text) >= MIN_STRUCTURED_LENGTH else None
+
+
+def extract_job_text(html_text, engine=None):
+    """Visible job text from a page, preferring structured job data when present."""
+    engine = engine or HTML_TEXT_ENGINE
+    if engine == "bs4":
+        return extract_text_bs4(html_text)
+
+    if engine == "auto":
+        for structured in (job_posting_text, seek_state_text):
+            try:
+                text = structured(html_text)
+            except Exception as e:  # malformed structured data must not break scraping
+                logger.warning(f"Structured job data extraction failed: {e}")
+                text = None
+            if text:
+                return text
+
+    lxml_html = _lxml_html() if engine in ("auto", "lxml") else None
+    if lxml_html is not None:
+        try:
+            return extract_text_lxml(html_text)
+        except (lxml_html.etree.ParserError, ValueError) as e:
+            logger.warning(f"lxml could not parse page, using streaming tokenizer: {e}")
+    return extract_text_stream(html_text)
@@ -0,0 +1,165 @@
+import os
+import asyncio
+import logging
+import importlib
+import threading
+import weakref
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Keep-alive connections per host and number of per-domain direct sessions kept per worker
+POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", 10))
+POOL_MAX_DOMAINS = int(os.getenv("HTTP_POOL_MAX_DOMAINS", 32))
+
+_optional_modules = {}
+
+
+def optional_import(name):
+    """Import a library on first use; None if it is not installed.
+
+    requests, cloudscraper and httpx are imported here rather than at module
+    level so `import app` stays cheap; with gunicorn's preload_app the master
+    imports them once before forking (see utils/startup.py).
+    """
+    if name not in _optional_modules:
+        try:
+            _optional_modules[name] = importlib.import_module(name)
+        except Exception:  # cloudscraper is optional but recommended, httpx is only needed for the async app
+            _optional_modules[name] = None
+    return _optional_modules[name]
+
+
+class PoolManager:
+    """Per-worker keep-alive sessions for direct scraping, the proxy and OpenAI.
+
+    Direct sessions are kept per domain so cloudscraper challenge cookies are
+    reused; the least recently used domain is dropped once POOL_MAX_DOMAINS is
+    reached. Dropped sessions are not closed, since another thread may still be
+    mid-request on one; their sockets close when the session is garbage
+    collected after that request. Everything is rebuilt after a fork so gunicorn workers never share
+    sockets with the master process.
+    """
+
+    def __init__(self, maxsize=POOL_MAXSIZE, max_domains=POOL_MAX_DOMAINS):
+        self.maxsize = maxsize
+        self.max_domains = max_domains
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._direct = OrderedDict()
+        self._proxy = None
+        self._openai = None
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._requests = {"direct": 0, "proxy": 0}
+        self._created = {"direct": 0, "proxy": 0, "openai": 0, "async": 0}
+        self._evicted = 0
+
+    def _check_fork(self):
+        if self._pid != os.getpid():
+            self._reset()
+
+    def _mount(self, session):
+        from requests.adapters import HTTPAdapter
+        adapter = HTTPAdapter(pool_connections=self.maxsize, pool_maxsize=self.maxsize)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def direct_session(self, domain):
+        with self._lock:
+            self._check_fork()
+            session = self._direct.get(domain)
+            if session is None:
+                cloudscraper = optional_import("cloudscraper")
+                if cloudscraper is not None:
+                    session = cloudscraper.create_scraper(
+                        browser={"browser": "chrome", "platform": "windows", "mobile": False}
+                    )
+                else:
+                    session = optional_import("requests").Session()
+                self._direct[domain] = self._mount(session)
+                self._created["direct"] += 1
+                while len(self._direct) > self.max_domains:
+                    self._direct.popitem(last=False)
+                    self._evicted += 1
+            self._direct.move_to_end(domain)
+            self._requests["direct"] += 1
+            return session
+
+    def proxy_session(self, proxy_url):
+        with self._lock:
+            self._check_fork()
+            if self._proxy is None:
+                session = self._mount(optional_import("requests").Session())
+                session.proxies = {"http": proxy_url, "https": proxy_url}
+                self._proxy = session
+                self._created["proxy"] += 1
+            self._requests["proxy"] += 1
+            return self._proxy
+
+    def openai_client(self):
+        with self._lock:
+            self._check_fork()
+            if self._openai is None:
+                from openai import OpenAI
+                # Retries go through call_openai so they respect the shared rate limit
+                self._openai = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+                self._created["openai"] += 1
+            return self._openai
+
+    def warm(self):
+        """Build this worker's OpenAI client up front so its first request does not pay for it."""
+        try:
+            self.openai_client()
+        except Exception as e:  # e.g. no API key configured; the request path reports it properly
+            logger.warning(f"Could not warm the OpenAI client: {e}")
+
+    def _loop_clients(self):
+        # httpx/AsyncOpenAI clients are bound to the event loop they were first used on
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._check_fork()
+            clients = self._async_clients.get(loop)
+            if clients is None:
+                clients = {}
+                self._async_clients[loop] = clients
+            return clients
+
+    def async_openai_client(self):
+        clients = self._loop_clients()
+        if "openai" not in clients:
+            from openai import AsyncOpenAI
+            clients["openai"] = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+            self._created["async"] += 1
+        return clients["openai"]
+
+    def async_http_client(self, proxy_url=None):
+        clients = self._loop_clients()
+        name = "proxy" if proxy_url else "direct"
+        if name not in clients:
+            httpx = optional_import("httpx")
+            limits = httpx.Limits(max_connections=self.maxsize * self.max_domains, max_keepalive_connections=self.maxsize)
+            clients[name] = httpx.AsyncClient(proxy=proxy_url, follow_redirects=True, limits=limits, verify=True)
+            self._created["async"] += 1
+        self._requests[name] += 1
+        return clients[name]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pid": self._pid,
+                "pool_maxsize": self.maxsize,
+                "max_domains": self.max_domains,
+                "direct_domains": list(self._direct.keys()),
+                "proxy_session": self._proxy is not None,
+                "openai_client": self._openai is not None,
+                "requests": dict(self._requests),
+                "created": dict(self._created),
+                "evicted_domains": self._evicted,
+            }
+
+
+pools = PoolManager()
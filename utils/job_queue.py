@@ -0,0 +1,344 @@
+import os
+import json
+import time
+import uuid
+import random
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", os.path.join("cache", "jobs.sqlite3"))
+JOB_QUEUE_MAX_DEPTH = int(os.getenv("JOB_QUEUE_MAX_DEPTH", 100))
+JOB_QUEUE_WORKERS = int(os.getenv("JOB_QUEUE_WORKERS", 4))
+JOB_QUEUE_MAX_ATTEMPTS = int(os.getenv("JOB_QUEUE_MAX_ATTEMPTS", 3))
+# A running job whose lease has not been renewed for this long is assumed dead and re-queued;
+# workers renew their leases every third of this while the handler runs
+JOB_QUEUE_LEASE_SECONDS = int(os.getenv("JOB_QUEUE_LEASE_SECONDS", 300))
+
+
+class QueueFull(Exception):
+    """Raised by JobQueue.submit when the queue is at its depth limit."""
+
+
+class JobQueue:
+    """Durable priority queue in SQLite, shared by every worker process on the host.
+
+    Jobs move queued -> running -> succeeded/failed. Failed attempts are
+    re-queued with exponential backoff until max_attempts is reached.
+
+    claim() hands out a lease ID with each job. The lease lasts lease_seconds
+    unless renewed, and complete()/fail() only take effect while the caller
+    still holds it, so a worker whose job was re-queued after its lease
+    expired cannot overwrite the outcome of the attempt that took over.
+    """
+
+    def __init__(self, path=JOB_QUEUE_PATH, max_depth=JOB_QUEUE_MAX_DEPTH,
+                 max_attempts=JOB_QUEUE_MAX_ATTEMPTS, lease_seconds=JOB_QUEUE_LEASE_SECONDS,
+                 backoff_base=2.0):
+        self.path = path
+        self.max_depth = max_depth
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.backoff_base = backoff_base
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY,"
+                " kind TEXT NOT NULL,"
+                " payload TEXT NOT NULL,"
+                " status TEXT NOT NULL,"
+                " priority INTEGER NOT NULL DEFAULT 0,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " available_at REAL NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " started_at REAL,"
+                " finished_at REAL,"
+                " result TEXT,"
+                " error TEXT,"
+                " lease_id TEXT,"
+                " lease_expires_at REAL)"
+            )
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, kind in (("lease_id", "TEXT"), ("lease_expires_at", "REAL")):
+                if column not in columns:  # queue files created before leases were renewable
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, priority DESC, created_at)"
+            )
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def depth(self, conn=None):
+        own = conn is None
+        conn = conn or self._connect()
+        try:
+            (count,) = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')"
+            ).fetchone()
+            return count
+        finally:
+            if own:
+                conn.close()
+
+    def submit(self, kind, payload, priority=0):
+        """Queue a job and return its ID; raise QueueFull when the depth limit is reached."""
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            if self.depth(conn) >= self.max_depth:
+                conn.execute("ROLLBACK")
+                raise QueueFull(f"Job queue is full ({self.max_depth} jobs); try again shortly")
+            conn.execute(
+                "INSERT INTO jobs (id, kind, payload, status, priority, available_at, created_at)"
+                " VALUES (?, ?, ?, 'queued', ?, ?, ?)",
+                (job_id, kind, json.dumps(payload), int(priority), now, now),
+            )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return job_id
+
+    def claim(self):
+        """Atomically take the highest-priority ready job, or return None.
+
+        The returned job carries the "lease_id" to pass to renew(), complete() and fail().
+        """
+        now = time.time()
+        lease_id = uuid.uuid4().hex
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            self._recover_expired(conn, now)
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' AND available_at <= ?"
+                " ORDER BY priority DESC, created_at ASC LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = ?,"
+                " lease_id = ?, lease_expires_at = ? WHERE id = ?",
+                (now, lease_id, now + self.lease_seconds, row["id"]),
+            )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        job = self._row_to_dict(row)
+        job["attempts"] += 1
+        job["started_at"] = now
+        job["lease_id"] = lease_id
+        job["lease_expires_at"] = now + self.lease_seconds
+        return job
+
+    def _retry_delay(self, attempts):
+        return self.backoff_base ** attempts * random.uniform(0.5, 1.5)
+
+    def _recover_expired(self, conn, now):
+        """Treat running jobs whose lease expired (the worker died, e.g. OOM-killed) as failed attempts.
+
+        Like fail(), they are retried with backoff until max_attempts, so a job
+        that keeps crashing its worker ends up failed instead of looping forever.
+        """
+        expired = conn.execute(
+            "SELECT id, attempts FROM jobs WHERE status = 'running' AND COALESCE(lease_expires_at, started_at + ?) < ?",
+            (self.lease_seconds, now),
+        ).fetchall()
+        for job_id, attempts in expired:
+            error = f"Lease expired on attempt {attempts}; the worker stopped responding"
+            if attempts < self.max_attempts:
+                conn.execute(
+                    "UPDATE jobs SET status = 'queued', available_at = ?, error = ?, lease_id = NULL WHERE id = ?",
+                    (now + self._retry_delay(attempts), error, job_id),
+                )
+                logger.warning(f"Job {job_id}: {error}; re-queued")
+            else:
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, finished_at = ?, lease_id = NULL WHERE id = ?",
+                    (error, now, job_id),
+                )
+                logger.error(f"Job {job_id} failed after {attempts} attempts: {error}")
+
+    def _update_leased(self, job_id, lease_id, assignments, params):
+        """Apply an UPDATE to a running job only while lease_id still holds it; returns whether it did."""
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ? AND status = 'running' AND lease_id = ?",
+                (*params, job_id, lease_id),
+            )
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def renew(self, job_id, lease_id):
+        """Extend a running job's lease; False if it has been lost (expired and re-queued)."""
+        return self._update_leased(job_id, lease_id, "lease_expires_at = ?", (time.time() + self.lease_seconds,))
+
+    def complete(self, job_id, lease_id, result):
+        """Record a job's result; False (and nothing written) if lease_id no longer holds the job."""
+        done = self._update_leased(
+            job_id, lease_id,
+            "status = 'succeeded', result = ?, error = NULL, finished_at = ?, lease_id = NULL",
+            (json.dumps(result), time.time()),
+        )
+        if not done:
+            logger.warning(f"Job {job_id} finished after its lease was lost; discarding the result")
+        return done
+
+    def fail(self, job_id, lease_id, attempts, error):
+        """Record a failed attempt: retry with jittered exponential backoff, or give up.
+
+        Like complete(), does nothing and returns False if lease_id no longer holds the job.
+        """
+        now = time.time()
+        if attempts < self.max_attempts:
+            delay = self._retry_delay(attempts)
+            done = self._update_leased(
+                job_id, lease_id, "status = 'queued', available_at = ?, error = ?, lease_id = NULL",
+                (now + delay, str(error)),
+            )
+            if done:
+                logger.warning(f"Job {job_id} attempt {attempts} failed, retrying in {delay:.1f}s: {error}")
+        else:
+            done = self._update_leased(
+                job_id, lease_id, "status = 'failed', error = ?, finished_at = ?, lease_id = NULL",
+                (str(error), now),
+            )
+            if done:
+                logger.error(f"Job {job_id} failed after {attempts} attempts: {error}")
+        if not done:
+            logger.warning(f"Job {job_id} attempt {attempts} failed after its lease was lost: {error}")
+        return done
+
+    def get(self, job_id):
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        return self._row_to_dict(row) if row else None
+
+    def _row_to_dict(self, row):
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def metrics(self, window=500):
+        """Queue depth by status plus wait (queue latency) and run time over recent jobs."""
+        conn = self._connect()
+        try:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            rows = conn.execute(
+                "SELECT started_at - created_at, finished_at - started_at FROM jobs"
+                " WHERE finished_at IS NOT NULL ORDER BY finished_at DESC LIMIT ?",
+                (window,),
+            ).fetchall()
+            (oldest,) = conn.execute(
+                "SELECT MIN(created_at) FROM jobs WHERE status = 'queued'"
+            ).fetchone()
+        finally:
+            conn.close()
+        waits = sorted(row[0] for row in rows)
+        runs = sorted(row[1] for row in rows)
+        return {
+            "depth": counts.get("queued", 0) + counts.get("running", 0),
+            "max_depth": self.max_depth,
+            "by_status": counts,
+            "oldest_queued_age_s": round(time.time() - oldest, 3) if oldest else 0,
+            "queue_latency_s": _summary(waits),
+            "run_time_s": _summary(runs),
+        }
+
+
+def _summary(values):
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 3),
+        "p50": round(values[len(values) // 2], 3),
+        "p95": round(values[min(len(values) - 1, int(len(values) * 0.95))], 3),
+        "max": round(values[-1], 3),
+    }
+
+
+class QueueWorkers:
+    """Background threads that claim jobs from a JobQueue and run the matching handler."""
+
+    def __init__(self, queue, handlers, threads=JOB_QUEUE_WORKERS, poll_interval=0.5):
+        self.queue = queue
+        self.handlers = handlers
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for i in range(self.threads):
+            thread = threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def run_once(self):
+        """Claim and run one job; return False if there was nothing to do."""
+        job = self.queue.claim()
+        if job is None:
+            return False
+        handler = self.handlers.get(job["kind"])
+        finished = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job, finished), name=f"job-lease-{job['id']}",
+                                     daemon=True)
+        heartbeat.start()
+        try:
+            if handler is None:
+                raise Exception(f"Unknown job type: {job['kind']}")
+            result = handler(job["payload"])
+        except Exception as e:
+            finished.set()
+            self.queue.fail(job["id"], job["lease_id"], job["attempts"], e)
+        else:
+            finished.set()
+            self.queue.complete(job["id"], job["lease_id"], result)
+        return True
+
+    def _heartbeat(self, job, finished):
+        """Renew the job's lease until the handler finishes, so long jobs are not re-queued mid-run."""
+        interval = self.queue.lease_seconds / 3
+        while not finished.wait(interval):
+            try:
+                if not self.queue.renew(job["id"], job["lease_id"]):
+                    logger.warning(f"Lost the lease on job {job['id']}; another worker may run it")
+                    return
+            except Exception as e:  # a locked database is retried on the next beat
+                logger.error(f"Could not renew the lease on job {job['id']}: {e}")
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if not self.run_once():
+                    self._stop.wait(self.poll_interval)
+            except Exception as e:  # keep the worker alive if SQLite is briefly locked
+                logger.error(f"Job worker error: {e}")
+                self._stop.wait(self.poll_interval)
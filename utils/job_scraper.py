@@ -1,119 +1,490 @@
-import requests
-from bs4 import BeautifulSoup
+import os
+import asyncio
+import threading
+import hashlib
 import logging
-import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
 
-try:
-    import cloudscraper
-except Exception:  # cloudscraper is optional but recommended
-    cloudscraper = None
+from utils.block_detector import block_signature
+from utils.cache import build_cache
+from utils.html_text import extract_job_text
+from utils.http_pools import optional_import, pools
+from utils.metrics import SCRAPES, SCRAPE_FALLBACKS, timed
+from utils.rate_limit import CircuitBreaker, RateLimited, TokenBucket
+from utils.single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
 # === Bright Data Proxy Credentials ===
-BRIGHT_DATA_HOST = "brd.superproxy.io"
-BRIGHT_DATA_PORT = 33335
-BRIGHT_DATA_USERNAME = "brd-customer-hl_9930b4f7-zone-residential_proxy1"
-BRIGHT_DATA_PASSWORD = "t2fismzy95x8"
-
-BLOCK_PATTERNS = [
-    r"residential\s*failed",
-    r"requested\s*site\s*is\s*not\s*available",
-    r"robots\.txt",
-    r"access\s*denied",
-    r"forbidden",
-    r"webpage\s*not\s*available",
-    r"help\s*us\s*keep\s*seek\s*secure",
-    r"confirm\s*you\s*are\s*human",
-    r"bright\s*data",
-    r"captcha",
+# Overridable so benchmarks can point the proxy at a local stub
+BRIGHT_DATA_HOST = os.getenv("BRIGHT_DATA_HOST", "brd.superproxy.io")
+BRIGHT_DATA_PORT = int(os.getenv("BRIGHT_DATA_PORT", 33335))
+BRIGHT_DATA_USERNAME = os.getenv("BRIGHT_DATA_USERNAME", "brd-customer-hl_9930b4f7-zone-residential_proxy1")
+BRIGHT_DATA_PASSWORD = os.getenv("BRIGHT_DATA_PASSWORD", "t2fismzy95x8")
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+    "Referer": "https://www.seek.com.au/",
+}
+
+# Query parameters that only track how the user reached the ad; dropping them
+# lets every share of the same job hit one cache entry.
+TRACKING_PARAMS = {"ref", "type", "origin", "sol", "searchrequesttoken", "cid", "gclid", "fbclid"}
+
+# Block pages are cached for a shorter period so a site that recovers is retried soon; 0 turns this off.
+PAGE_CACHE_NEGATIVE_TTL = int(os.getenv("PAGE_CACHE_NEGATIVE_TTL", 300))
+
+BLOCKED_MESSAGE = (
+    "The job page could not be fetched due to site restrictions (robots/proxy blocks). "
+    "Please open the job ad in your browser and copy/paste the text into the form, or upload a TXT/DOCX file."
+)
+
+# Hedged fetching: the proxy request starts if the direct fetch has not produced
+# a usable page within SCRAPE_HEDGE_DELAY seconds (immediately for domains that
+# have recently needed the proxy).
+SCRAPE_HEDGE_DELAY = float(os.getenv("SCRAPE_HEDGE_DELAY", 3.0))
+# Opt-in, comma-separated: domains whose proxy fetch starts alongside the direct
+# one. Every scrape of them pays for proxy bandwidth, even when direct would work.
+PROXY_FIRST_DOMAINS = [
+    domain.strip().lower()
+    for domain in os.getenv("SCRAPE_PROXY_FIRST_DOMAINS", "").split(",")
+    if domain.strip()
 ]
+SCRAPE_HEDGE_WORKERS = int(os.getenv("SCRAPE_HEDGE_WORKERS", 16))
+
+# Direct fetches per second (and burst) per domain, shared by all workers. A
+# fetch that would wait longer than SCRAPE_RATE_MAX_WAIT for its turn goes
+# straight to the proxy instead.
+SCRAPE_DOMAIN_RATE = float(os.getenv("SCRAPE_DOMAIN_RATE", 2.0))
+SCRAPE_DOMAIN_BURST = float(os.getenv("SCRAPE_DOMAIN_BURST", 5))
+SCRAPE_RATE_MAX_WAIT = float(os.getenv("SCRAPE_RATE_MAX_WAIT", 2.0))
+# Consecutive direct failures (block pages, 403/429/5xx, timeouts) after which
+# a domain's direct path is skipped for SCRAPE_BREAKER_COOLDOWN seconds
+SCRAPE_BREAKER_THRESHOLD = int(os.getenv("SCRAPE_BREAKER_THRESHOLD", 3))
+SCRAPE_BREAKER_COOLDOWN = float(os.getenv("SCRAPE_BREAKER_COOLDOWN", 120))
+# Responses that mean the site is pushing back, so the domain's rate is cut
+THROTTLE_STATUSES = {403, 429, 503}
+
+direct_limiter = TokenBucket("direct", SCRAPE_DOMAIN_RATE, SCRAPE_DOMAIN_BURST)
+direct_breaker = CircuitBreaker("direct", SCRAPE_BREAKER_THRESHOLD, SCRAPE_BREAKER_COOLDOWN)
+# Concurrent scrapes of the same normalized URL share one fetch
+scrape_flight = SingleFlight("scrape")
+
+class _BlockedPage(Exception):
+    """Raised when the proxy fetch came back as a block page."""
+
+
+class DomainRouteStats:
+    """Remembers which fetch path (direct or proxy) recently won for each domain."""
+
+    def __init__(self, window=20, min_samples=3):
+        self.window = window
+        self.min_samples = min_samples
+        self._wins = {}
+        self._lock = threading.Lock()
+
+    def record(self, domain, path):
+        with self._lock:
+            self._wins.setdefault(domain, deque(maxlen=self.window)).append(path)
+
+    def prefers_proxy(self, domain):
+        with self._lock:
+            wins = list(self._wins.get(domain, ()))
+        if len(wins) < self.min_samples:
+            return False
+        return wins.count("proxy") > len(wins) / 2
+
+    def stats(self):
+        with self._lock:
+            return {
+                domain: {"direct": wins.count("direct"), "proxy": wins.count("proxy")}
+                for domain, wins in self._wins.items()
+            }
+
+
+route_stats = DomainRouteStats()
+_hedge_executor = None
+_hedge_executor_lock = threading.Lock()
+
+
+def _get_hedge_executor():
+    # Created on first use so gunicorn workers never inherit pool threads from the master
+    global _hedge_executor
+    with _hedge_executor_lock:
+        if _hedge_executor is None:
+            _hedge_executor = ThreadPoolExecutor(max_workers=SCRAPE_HEDGE_WORKERS, thread_name_prefix="scrape")
+        return _hedge_executor
+
+
+def url_domain(job_url):
+    host = urlsplit(job_url).hostname or ""
+    return host.lower().removeprefix("www.")
+
+
+def hedge_delay(job_url):
+    """Seconds to wait for the direct fetch before also starting the proxy fetch."""
+    domain = url_domain(job_url)
+    if any(domain == known or domain.endswith("." + known) for known in PROXY_FIRST_DOMAINS):
+        return 0.0
+    if route_stats.prefers_proxy(domain):
+        return 0.0
+    return SCRAPE_HEDGE_DELAY
+
 
+_page_cache = None
+_page_cache_ready = False
 
+
+def get_page_cache():
+    """Return the configured page cache (built lazily from PAGE_CACHE_* env vars)."""
+    global _page_cache, _page_cache_ready
+    if not _page_cache_ready:
+        _page_cache = build_cache("PAGE_CACHE", "pages", default_max_entries=512, default_ttl=3600)
+        _page_cache_ready = True
+    return _page_cache
+
+
+def set_page_cache(cache):
+    """Swap in a different cache backend (or None to disable caching)."""
+    global _page_cache, _page_cache_ready
+    _page_cache = cache
+    _page_cache_ready = True
+
+
+def normalize_job_url(job_url: str) -> str:
+    """Canonical form of a job URL: lowercase host, no fragment, no tracking params."""
+    parts = urlsplit(job_url.strip())
+    scheme = (parts.scheme or "https").lower()
+    netloc = parts.netloc.lower()
+    path = parts.path.rstrip("/") or "/"
+    query = [
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+    ]
+    return urlunsplit((scheme, netloc, path, urlencode(sorted(query)), ""))
+
+
+def page_cache_key(job_url: str) -> str:
+    return hashlib.sha256(normalize_job_url(job_url).encode("utf-8")).hexdigest()
+
+
+@timed("block_check")
 def _looks_blocked(html_text: str) -> bool:
-    if not html_text:
-        return True
-    lowered = html_text.lower()
-    for pattern in BLOCK_PATTERNS:
-        if re.search(pattern, lowered):
-            return True
-    return False
+    signature = block_signature(html_text)
+    if signature:
+        logger.info(f"Block page detected (signature: {signature})")
+    return signature is not None
 
 
+@timed("extract_text")
 def _extract_visible_text(html_text: str) -> str:
-    soup = BeautifulSoup(html_text, "html.parser")
-    text = soup.get_text(separator="\n")
-    return text.strip()
+    # Structured job data when the page has it, otherwise a fast parse that skips scripts/nav/footer
+    return extract_job_text(html_text).strip()
 
 
+def _proxy_url() -> str:
+    return f"http://{BRIGHT_DATA_USERNAME}:{BRIGHT_DATA_PASSWORD}@{BRIGHT_DATA_HOST}:{BRIGHT_DATA_PORT}"
+
+
+@timed("fetch_direct")
 def _fetch_direct(job_url: str, headers: dict, timeout: int = 20) -> str:
-    # Try with cloudscraper first (handles Cloudflare and some bot checks)
-    if cloudscraper is not None:
-        scraper = cloudscraper.create_scraper(
-            browser={"browser": "chrome", "platform": "windows", "mobile": False}
-        )
-        response = scraper.get(job_url, headers=headers, timeout=timeout)
-        response.raise_for_status()
-        return response.text
-
-    # Fallback to plain requests
-    response = requests.get(job_url, headers=headers, timeout=timeout)
+    # Per-domain keep-alive session (cloudscraper if available, so Cloudflare
+    # challenge cookies carry over between requests)
+    session = pools.direct_session(url_domain(job_url))
+    response = session.get(job_url, headers=headers, timeout=timeout)
     response.raise_for_status()
     return response.text
 
 
+@timed("fetch_proxy")
 def _fetch_brightdata(job_url: str, headers: dict, timeout: int = 20) -> str:
-    proxies = {
-        "http": f"http://{BRIGHT_DATA_USERNAME}:{BRIGHT_DATA_PASSWORD}@{BRIGHT_DATA_HOST}:{BRIGHT_DATA_PORT}",
-        "https": f"http://{BRIGHT_DATA_USERNAME}:{BRIGHT_DATA_PASSWORD}@{BRIGHT_DATA_HOST}:{BRIGHT_DATA_PORT}",
-    }
+    session = pools.proxy_session(_proxy_url())
     # Use default certificate verification; the target may enforce TLS
-    response = requests.get(job_url, headers=headers, proxies=proxies, timeout=timeout, verify=True)
+    response = session.get(job_url, headers=headers, timeout=timeout, verify=True)
     response.raise_for_status()
     return response.text
 
 
+@timed("fetch_direct")
+async def _afetch_direct(job_url: str, headers: dict, timeout: int = 20) -> str:
+    # cloudscraper has no async API, so the async path is a plain browser-like GET
+    client = pools.async_http_client()
+    response = await client.get(job_url, headers=headers, timeout=timeout)
+    response.raise_for_status()
+    return response.text
+
+
+@timed("fetch_proxy")
+async def _afetch_brightdata(job_url: str, headers: dict, timeout: int = 20) -> str:
+    client = pools.async_http_client(proxy_url=_proxy_url())
+    response = await client.get(job_url, headers=headers, timeout=timeout)
+    response.raise_for_status()
+    return response.text
+
+
+def _lookup_cached_page(cache, key, job_url):
+    """Return cached text for key, None on a miss; raise if the URL is known to be blocked."""
+    if cache is None:
+        return None
+    cached = cache.get(key)
+    if cached is None:
+        return None
+    if cached.get("blocked"):
+        logger.info(f"Page cache hit (blocked) for {job_url}")
+        raise Exception(BLOCKED_MESSAGE)
+    logger.info(f"Page cache hit for {job_url}")
+    return cached["text"]
+
+
+def _direct_failed(domain, throttled):
+    """Count a failed direct fetch against the domain's breaker; throttling also cuts its rate."""
+    if throttled:
+        direct_limiter.penalize(domain)
+    direct_breaker.record_failure(domain)
+
+
+def _direct_error(domain, err):
+    status = getattr(getattr(err, "response", None), "status_code", None)
+    # Other 4xx responses are about the page (e.g. an expired ad), not the site's health
+    if status is not None and status < 500 and status not in THROTTLE_STATUSES:
+        return
+    _direct_failed(domain, throttled=status in THROTTLE_STATUSES)
+
+
+def _direct_result(domain, html):
+    """Visible text of a direct fetch, or raise if it is a block page or too short to be a job ad."""
+    if _looks_blocked(html):
+        _direct_failed(domain, throttled=True)
+        raise Exception("Direct fetch returned a block page")
+    direct_breaker.record_success(domain)
+    visible = _extract_visible_text(html)
+    if len(visible) <= 200:
+        raise Exception("Direct fetch is too short to be a job ad")
+    return visible
+
+
 def scrape_job_details(job_url):
     """Fetch job page content and return visible text.
 
     Strategy:
+    0) Serve from the page cache if this URL (normalized) was fetched recently,
+       or wait for a fetch of it that is already in flight.
     1) Try a direct fetch (with cloudscraper if available) without proxies.
-    2) If that appears blocked or fails, try Bright Data proxy as a fallback.
+    2) If that has not produced a usable page within the hedge delay, or fails,
+       race a Bright Data proxy fetch against it; the first usable page wins.
     3) If still blocked, raise a user-friendly error so the UI can guide the user.
     """
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
-        "Accept-Language": "en-US,en;q=0.9",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-        "Referer": "https://www.seek.com.au/",
-    }
-
-    # Attempt 1: direct
+    cache = get_page_cache()
+    key = page_cache_key(job_url)
+    cached = _lookup_cached_page(cache, key, job_url)
+    if cached is not None:
+        SCRAPES.inc(outcome="cache")
+        return cached
+    return scrape_flight.do(key, lambda: _scrape_and_cache(job_url, cache, key))
+
+
+def _scrape_and_cache(job_url, cache, key):
+    try:
+        visible = _scrape_uncached(job_url)
+    except _BlockedPage:
+        raise _blocked(cache, key)
+    if cache is not None:
+        cache.set(key, {"text": visible})
+    return visible
+
+
+def _blocked(cache, key):
+    """Negatively cache a blocked page; returns the user-facing error to raise."""
+    SCRAPES.inc(outcome="blocked")
+    if cache is not None:
+        cache.set(key, {"blocked": True}, ttl=PAGE_CACHE_NEGATIVE_TTL)
+    return Exception(BLOCKED_MESSAGE)
+
+
+async def async_scrape_job_details(job_url):
+    """Non-blocking variant of scrape_job_details for the async app.
+
+    Uses the same cache and fallback strategy; HTML parsing and page cache
+    reads and writes (SQLite with some backends) run in a thread so they do not
+    stall the event loop.
+    """
+    if optional_import("httpx") is None:
+        raise Exception("Async scraping requires the httpx package")
+
+    cache = get_page_cache()
+    key = page_cache_key(job_url)
+    cached = await asyncio.to_thread(_lookup_cached_page, cache, key, job_url)
+    if cached is not None:
+        SCRAPES.inc(outcome="cache")
+        return cached
+    return await scrape_flight.async_do(key, lambda: _async_scrape_and_cache(job_url, cache, key))
+
+
+async def _async_scrape_and_cache(job_url, cache, key):
+    try:
+        visible = await _async_scrape_uncached(job_url)
+    except _BlockedPage:
+        raise await asyncio.to_thread(_blocked, cache, key)
+    if cache is not None:
+        await asyncio.to_thread(cache.set, key, {"text": visible})
+    return visible
+
+
+def _direct_attempt(job_url, abandoned=None):
+    """Direct fetch; once `abandoned` is set (the proxy already won) its outcome is not recorded."""
+    domain = url_domain(job_url)
+    direct_limiter.acquire(domain, SCRAPE_RATE_MAX_WAIT)
+    try:
+        html = _fetch_direct(job_url, headers=DEFAULT_HEADERS, timeout=25)
+    except Exception as err:
+        if abandoned is None or not abandoned.is_set():
+            _direct_error(domain, err)
+        raise
+    if abandoned is not None and abandoned.is_set():
+        raise Exception("Direct fetch finished after the proxy won")
+    return _direct_result(domain, html)
+
+
+def _proxy_attempt(job_url):
+    html = _fetch_brightdata(job_url, headers=DEFAULT_HEADERS, timeout=25)
+    return _proxy_result(html)
+
+
+async def _async_direct_attempt(job_url):
+    domain = url_domain(job_url)
+    await direct_limiter.async_acquire(domain, SCRAPE_RATE_MAX_WAIT)
+    try:
+        html = await _afetch_direct(job_url, headers=DEFAULT_HEADERS, timeout=25)
+    except Exception as err:
+        await asyncio.to_thread(_direct_error, domain, err)
+        raise
+    return await asyncio.to_thread(_direct_result, domain, html)
+
+
+async def _async_proxy_attempt(job_url):
+    html = await _afetch_brightdata(job_url, headers=DEFAULT_HEADERS, timeout=25)
+    return await asyncio.to_thread(_proxy_result, html)
+
+
+def _fallback_reason(errors, delay):
+    if isinstance(errors.get("direct"), RateLimited):
+        return "rate_limited"
+    if "direct" in errors:
+        return "direct_failed"
+    return "proxy_preferred" if delay == 0 else "hedge_timeout"
+
+
+def _skip_direct(domain):
+    logger.info(f"Circuit breaker open for {domain}; skipping the direct fetch")
+    SCRAPE_FALLBACKS.inc(reason="breaker_open")
+
+
+def _scrape_failed(errors):
+    """Raise the right error once both the direct and proxy attempts have failed."""
+    proxy_err = errors.get("proxy")
+    if not isinstance(proxy_err, _BlockedPage):
+        SCRAPES.inc(outcome="failed")
+    logger.error(f"Seek scraping failed after proxy fallback: {proxy_err}")
+    if isinstance(proxy_err, _BlockedPage):
+        raise proxy_err
+    raise Exception(BLOCKED_MESSAGE)
+
+
+def _scrape_uncached(job_url):
+    """Hedged fetch: direct first, proxy after hedge_delay (or as soon as direct fails).
+
+    Whichever attempt returns a usable page first wins; the other is cancelled
+    if it has not started, otherwise its result is discarded and a direct
+    attempt still running no longer touches the domain's breaker or rate.
+    """
+    domain = url_domain(job_url)
+    delay = hedge_delay(job_url)
+    executor = _get_hedge_executor()
+    abandoned = threading.Event()
+    errors = {}
+    if direct_breaker.allow(domain):
+        futures = {executor.submit(_direct_attempt, job_url, abandoned): "direct"}
+        proxy_started = False
+    else:
+        _skip_direct(domain)
+        futures = {executor.submit(_proxy_attempt, job_url): "proxy"}
+        proxy_started = True
+
     try:
-        html = _fetch_direct(job_url, headers=headers, timeout=25)
-        if not _looks_blocked(html):
-            visible = _extract_visible_text(html)
-            if len(visible) > 200:
+        while futures:
+            done, _ = wait(futures, timeout=None if proxy_started else delay, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = futures.pop(future)
+                try:
+                    visible = future.result()
+                except Exception as err:
+                    errors[path] = err
+                    logger.warning(f"{path.capitalize()} fetch failed: {err}")
+                    continue
+                route_stats.record(domain, path)
+                SCRAPES.inc(outcome=path)
                 return visible
-            # Too short to be a real job ad; continue to proxy fallback
-            logger.warning("Direct fetch returned unusually short content; trying proxy fallback")
-        else:
-            logger.warning("Direct fetch appears blocked; trying proxy fallback")
-    except Exception as direct_err:
-        logger.warning(f"Direct fetch failed: {direct_err}; trying proxy fallback")
-
-    # Attempt 2: Bright Data proxy
+            if not proxy_started:
+                logger.info(f"Starting proxy fetch for {domain}")
+                SCRAPE_FALLBACKS.inc(reason=_fallback_reason(errors, delay))
+                futures[executor.submit(_proxy_attempt, job_url)] = "proxy"
+                proxy_started = True
+    finally:
+        abandoned.set()
+        for other in futures:
+            other.cancel()
+
+    _scrape_failed(errors)
+
+
+async def _async_scrape_uncached(job_url):
+    """Async counterpart of _scrape_uncached; the losing task is cancelled."""
+    domain = url_domain(job_url)
+    delay = hedge_delay(job_url)
+    errors = {}
+    if await asyncio.to_thread(direct_breaker.allow, domain):
+        tasks = {asyncio.create_task(_async_direct_attempt(job_url)): "direct"}
+        proxy_started = False
+    else:
+        _skip_direct(domain)
+        tasks = {asyncio.create_task(_async_proxy_attempt(job_url)): "proxy"}
+        proxy_started = True
+
     try:
-        html = _fetch_brightdata(job_url, headers=headers, timeout=25)
-        if _looks_blocked(html):
-            raise Exception("Target site returned a block page via proxy")
-        visible = _extract_visible_text(html)
-        if len(visible) > 200:
-            return visible
-        raise Exception("Fetched content is too short to extract job details")
-    except Exception as proxy_err:
-        logger.error(f"Seek scraping failed after proxy fallback: {proxy_err}")
-        raise Exception(
-            "The job page could not be fetched due to site restrictions (robots/proxy blocks). "
-            "Please open the job ad in your browser and copy/paste the text into the form, or upload a TXT/DOCX file."
-        )
+        while tasks:
+            done, _ = await asyncio.wait(tasks, timeout=None if proxy_started else delay, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                path = tasks.pop(task)
+                try:
+                    visible = task.result()
+                except Exception as err:
+                    errors[path] = err
+                    logger.warning(f"{path.capitalize()} fetch failed: {err}")
+                    continue
+                route_stats.record(domain, path)
+                SCRAPES.inc(outcome=path)
+                return visible
+            if not proxy_started:
+                logger.info(f"Starting proxy fetch for {domain}")
+                SCRAPE_FALLBACKS.inc(reason=_fallback_reason(errors, delay))
+                tasks[asyncio.create_task(_async_proxy_attempt(job_url))] = "proxy"
+                proxy_started = True
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    _scrape_failed(errors)
+
+
+def _proxy_result(html):
+    if _looks_blocked(html):
+        raise _BlockedPage("Target site returned a block page via proxy")
+    visible = _extract_visible_text(html)
+    if len(visible) > 200:
+        return visible
+    raise Exception("Fetched content is too short to extract job details")
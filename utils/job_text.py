@@ -0,0 +1,148 @@
+import os
+import re
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Token budget for the job text sent to interpret_job_details
+JOB_TEXT_TOKEN_BUDGET = int(os.getenv("JOB_TEXT_TOKEN_BUDGET", 700))
+TOKENIZER_MODEL = "gpt-4-turbo"
+
+# Headings that start the parts of an ad the extraction prompt actually needs
+RELEVANT_HEADINGS = re.compile(
+    r"\b(requirements?|responsibilities|duties|about (the|this) (role|position|job)|the role|"
+    r"what you('ll| will) (do|bring|need)|who (you are|we're looking for)|skills|experience|"
+    r"qualifications?|key (criteria|selection criteria)|essential|desirable|nice to have|"
+    r"about you|your (role|background)|benefits|salary|location|job (description|summary))\b",
+    re.IGNORECASE,
+)
+# Words that show up in requirement and responsibility bullets
+RELEVANT_TERMS = re.compile(
+    r"\b(years?|experience|degree|bachelor|master|certificat\w*|licen[cs]e|proficien\w*|knowledge|"
+    r"skills?|ability|design|develop\w*|manag\w*|maintain\w*|software|tools?|must|required|"
+    r"preferred|responsible|full[ -]time|part[ -]time|contract|salary|\$\d)",
+    re.IGNORECASE,
+)
+BOILERPLATE = re.compile(
+    r"(cookie|privacy|terms (of use|and conditions)|sign in|log in|register|"
+    r"similar jobs|related jobs|report this job|share|save job|quick apply|bright\s*data|©|all rights reserved)",
+    re.IGNORECASE,
+)
+
+_encoding = None
+_encoding_ready = False
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    """tiktoken encoding for TOKENIZER_MODEL, or None if tiktoken/its data is unavailable."""
+    global _encoding, _encoding_ready
+    with _encoding_lock:
+        if not _encoding_ready:
+            try:
+                import tiktoken
+                _encoding = tiktoken.encoding_for_model(TOKENIZER_MODEL)
+            except Exception as e:
+                logger.warning(f"tiktoken unavailable ({e}); estimating tokens as characters / 4")
+                _encoding = None
+            _encoding_ready = True
+        return _encoding
+
+
+def count_tokens(text):
+    encoding = _get_encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def _unique_lines(raw_text):
+    """Whitespace-collapsed, non-empty lines with repeats (nav, footers, widgets) removed."""
+    seen = set()
+    lines = []
+    for line in raw_text.splitlines():
+        line = " ".join(line.split())
+        key = line.lower()
+        if line and key not in seen:
+            seen.add(key)
+            lines.append(line)
+    return lines
+
+
+def _is_heading(line):
+    if len(line) > 60:
+        return False
+    if line.endswith(":"):
+        return True
+    # Short boilerplate lines ("Similar jobs", "Cookie settings") also start a block,
+    # so the link lists under them are scored on their own
+    return len(line.split()) <= 6 and bool(RELEVANT_HEADINGS.search(line) or BOILERPLATE.search(line))
+
+
+def _blocks(lines):
+    """Group lines into blocks, starting a new block at each heading or boilerplate line."""
+    blocks = []
+    for line in lines:
+        if not blocks or _is_heading(line):
+            blocks.append([line])
+        else:
+            blocks[-1].append(line)
+    return blocks
+
+
+def _score(block, index):
+    text = " ".join(block)
+    score = 0.0
+    if RELEVANT_HEADINGS.search(block[0]):
+        score += 5
+    score += min(len(RELEVANT_TERMS.findall(text)), 10)
+    score -= 3 * len(BOILERPLATE.findall(text))
+    # Blocks of very short lines are usually menus and link lists
+    average = sum(len(line) for line in block) / len(block)
+    if average < 20:
+        score -= 2
+    if index == 0:
+        score += 10  # the title and company are at the top
+    return score
+
+
+def prepare_job_text(raw_text, budget_tokens=None):
+    """Pick the most job-relevant blocks of raw_text that fit in budget_tokens.
+
+    Repeated lines are dropped, blocks are scored by headings and
+    requirement-like terms, the best are packed greedily into the budget and
+    returned in their original order. Returns (text, stats).
+    """
+    budget_tokens = JOB_TEXT_TOKEN_BUDGET if budget_tokens is None else budget_tokens
+    blocks = _blocks(_unique_lines(raw_text))
+    ranked = sorted(range(len(blocks)), key=lambda i: _score(blocks[i], i), reverse=True)
+
+    chosen = set()
+    used = 0
+    for i in ranked:
+        block_text = "\n".join(blocks[i])
+        tokens = count_tokens(block_text) + 1  # +1 for the joining newline
+        if used + tokens <= budget_tokens:
+            chosen.add(i)
+            used += tokens
+        elif not chosen:
+            # Even the best block is over budget: keep as many of its lines as fit
+            kept = []
+            for line in blocks[i]:
+                line_tokens = count_tokens(line) + 1
+                if used + line_tokens > budget_tokens:
+                    break
+                kept.append(line)
+                used += line_tokens
+            blocks[i] = kept
+            chosen.add(i)
+
+    text = "\n".join("\n".join(blocks[i]) for i in sorted(chosen) if blocks[i])
+    stats = {
+        "raw_tokens": count_tokens(raw_text),
+        "prepared_tokens": count_tokens(text),
+        "blocks_kept": len(chosen),
+        "blocks_total": len(blocks),
+    }
+    return text, stats
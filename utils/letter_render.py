@@ -0,0 +1,532 @@
+"""Render cover letters to DOCX and PDF from templates in templates/letters/.
+
+A template is a text file in the style of templates/old_cover_letter_template.txt
+with [Placeholder] fields: [Cover Letter], [Date], [Company Name], [Job Title]
+and [Your Name]; unknown placeholders are left as they are, and a template line
+whose placeholders are all empty is dropped. The same fields (except [Cover
+Letter]) are also filled in the letter itself when a value is given, so a
+generated letter signed "[Your Name]" gets the sender's name. "plain" is just
+the letter (generated letters already carry their own date and greeting),
+"classic" adds the sender's name, date, company and RE: lines of the old
+template. When laying out the filled text, lines starting with a tab are
+right-aligned and lines starting with "- " or "* " become bullets.
+
+Rendering runs in a process pool (RENDER_WORKERS processes per app worker,
+0 renders in the calling thread) so a batch does not hold the GIL of the
+worker serving requests. Rendered files are cached under a hash of the filled
+text, format and layout settings, so downloading the same letter again skips
+rendering altogether.
+"""
+import io
+import os
+import re
+import time
+import zlib
+import base64
+import asyncio
+import hashlib
+import logging
+import threading
+import zipfile
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from utils.cache import build_cache
+from utils.metrics import RENDERS, STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+RENDER_TEMPLATE_DIR = os.getenv(
+    "RENDER_TEMPLATE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates", "letters"),
+)
+RENDER_DEFAULT_TEMPLATE = os.getenv("RENDER_DEFAULT_TEMPLATE", "plain")
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", min(2, os.cpu_count() or 1)))
+RENDER_BATCH_MAX = int(os.getenv("RENDER_BATCH_MAX", 50))
+RENDER_FONT = os.getenv("RENDER_FONT", "Calibri")
+RENDER_FONT_SIZE = float(os.getenv("RENDER_FONT_SIZE", 11))
+# Bump when the layout code changes so cached files are not served stale
+RENDER_VERSION = "1"
+
+FORMATS = {
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "pdf": "application/pdf",
+}
+
+_PLACEHOLDER = re.compile(r"\[([^\[\]\n]+)\]")
+_TEMPLATE_NAME = re.compile(r"^[A-Za-z0-9_-]+$")
+_BULLET = re.compile(r"^\s*(?:[-*•])\s+")
+
+
+def list_templates():
+    try:
+        return sorted(name[:-4] for name in os.listdir(RENDER_TEMPLATE_DIR) if name.endswith(".txt"))
+    except OSError:
+        return []
+
+
+def load_template(name):
+    if not isinstance(name, str) or not _TEMPLATE_NAME.match(name):
+        raise ValueError(f"Invalid template name '{name}'")
+    try:
+        with open(os.path.join(RENDER_TEMPLATE_DIR, f"{name}.txt"), encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        raise ValueError(f"Unknown template '{name}' (available: {', '.join(list_templates())})")
+
+
+def text_field(value, label):
+    """A placeholder value as text: None is empty, numbers are converted, anything else raises ValueError."""
+    if value is None:
+        return ""
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise ValueError(f"{label} must be a string")
+    return str(value)
+
+
+def template_fields(letter, job_data=None, name=None):
+    job_data = job_data or {}
+    return {
+        "Cover Letter": letter.strip("\r\n").rstrip(),
+        "Date": datetime.today().strftime("%d %B %Y"),
+        "Company Name": text_field(job_data.get("company_name"), "job_data.company_name"),
+        "Job Title": text_field(job_data.get("job_title"), "job_data.job_title"),
+        "Your Name": text_field(name, "name"),
+    }
+
+
+def fill_template(template_text, fields):
+    """Replace known [Placeholder]s; lines left empty by empty fields are dropped."""
+    lines = []
+    for line in template_text.split("\n"):
+        filled = _PLACEHOLDER.sub(lambda m: fields.get(m.group(1), m.group(0)), line)
+        if filled.strip() or not _PLACEHOLDER.search(line):
+            lines.append(filled)
+    return "\n".join(lines)
+
+
+def fill_letter(letter, fields):
+    """Fill the placeholders a generated letter may contain (e.g. "[Your Name]") that have a value."""
+    return _PLACEHOLDER.sub(
+        lambda m: fields[m.group(1)] if m.group(1) != "Cover Letter" and fields.get(m.group(1)) else m.group(0),
+        letter,
+    )
+
+
+def letter_filename(job_data, fmt, fallback="cover_letter"):
+    job_data = job_data or {}
+    parts = [text_field(job_data.get(key), f"job_data.{key}") for key in ("company_name", "job_title")]
+    slug = "_".join(re.sub(r"[^A-Za-z0-9]+", "_", part).strip("_") for part in parts if part)
+    return f"{slug[:80] or fallback}.{fmt}"
+
+
+def _layout(text):
+    """[(kind, text)] with kind "right", "bullet", "line" or "blank", one per line of text."""
+    blocks = []
+    for line in text.replace("\r\n", "\n").split("\n"):
+        if not line.strip():
+            blocks.append(("blank", ""))
+        elif line.startswith("\t"):
+            blocks.append(("right", line.strip()))
+        elif _BULLET.match(line):
+            blocks.append(("bullet", _BULLET.sub("", line).strip()))
+        else:
+            blocks.append(("line", line.replace("\t", "    ").rstrip()))
+    while blocks and blocks[-1][0] == "blank":
+        blocks.pop()
+    return blocks
+
+
+def render_docx(text):
+    import docx
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+    from docx.shared import Pt
+
+    document = docx.Document()
+    normal = document.styles["Normal"]
+    normal.font.name = RENDER_FONT
+    normal.font.size = Pt(RENDER_FONT_SIZE)
+    # Spacing comes from the blank lines in the template, as in a typed letter
+    normal.paragraph_format.space_after = Pt(0)
+    for kind, line in _layout(text):
+        if kind == "bullet":
+            document.add_paragraph(line, style="List Bullet")
+        else:
+            paragraph = document.add_paragraph(line)
+            if kind == "right":
+                paragraph.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+    out = io.BytesIO()
+    document.save(out)
+    return out.getvalue()
+
+
+# Helvetica advance widths (1/1000 em) for WinAnsi codes 32-126, from the standard AFM
+_HELVETICA_WIDTHS = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]
+# Curly quotes, bullet and dashes, which generated letters use a lot
+_HELVETICA_EXTRA = {0x91: 222, 0x92: 222, 0x93: 333, 0x94: 333, 0x95: 350, 0x96: 556, 0x97: 1000}
+
+PDF_PAGE_WIDTH, PDF_PAGE_HEIGHT, PDF_MARGIN = 595, 842, 72  # A4, 1 inch margins
+PDF_BULLET_INDENT = 18
+
+
+def _pdf_width(encoded, size):
+    return sum(
+        _HELVETICA_WIDTHS[c - 32] if 32 <= c <= 126 else _HELVETICA_EXTRA.get(c, 556) for c in encoded
+    ) * size / 1000
+
+
+def _pdf_split_word(word, width, size):
+    """Hard-split a word (e.g. a long URL) wider than the line into pieces that fit."""
+    pieces, current = [], b""
+    for i in range(len(word)):
+        char = word[i:i + 1]
+        if current and _pdf_width(current + char, size) > width:
+            pieces.append(current)
+            current = b""
+        current += char
+    pieces.append(current)
+    return pieces
+
+
+def _pdf_wrap(encoded, width, size):
+    """Greedy word wrap of cp1252 bytes to lines at most `width` points wide."""
+    lines, current = [], b""
+    words = []
+    for word in encoded.split(b" "):
+        words.extend(_pdf_split_word(word, width, size) if _pdf_width(word, size) > width else [word])
+    for word in words:
+        candidate = current + b" " + word if current else word
+        if current and _pdf_width(candidate, size) > width:
+            lines.append(current)
+            current = word
+        else:
+            current = candidate
+    lines.append(current)
+    return lines
+
+
+def _pdf_escape(encoded):
+    return encoded.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def render_pdf(text):
+    """Minimal PDF 1.4 writer: Helvetica (built into every viewer), A4, wrapped lines, no dependencies."""
+    size = RENDER_FONT_SIZE
+    leading = size * 1.3
+    text_width = PDF_PAGE_WIDTH - 2 * PDF_MARGIN
+    pages, ops = [], []
+    y = PDF_PAGE_HEIGHT - PDF_MARGIN
+
+    def emit(x, encoded, bullet=False):
+        nonlocal y, ops
+        if y < PDF_MARGIN + leading:
+            pages.append(ops)
+            ops, y = [], PDF_PAGE_HEIGHT - PDF_MARGIN
+        y -= leading
+        if bullet:
+            ops.append(b"BT /F1 %.2f Tf %.2f %.2f Td (\x95) Tj ET" % (size, PDF_MARGIN + 4, y))
+        if encoded:
+            ops.append(b"BT /F1 %.2f Tf %.2f %.2f Td (%s) Tj ET" % (size, x, y, _pdf_escape(encoded)))
+
+    for kind, line in _layout(text):
+        encoded = line.encode("cp1252", errors="replace")
+        if kind == "blank":
+            emit(PDF_MARGIN, b"")
+        elif kind == "right":
+            for part in _pdf_wrap(encoded, text_width, size):
+                emit(PDF_PAGE_WIDTH - PDF_MARGIN - _pdf_width(part, size), part)
+        elif kind == "bullet":
+            for i, part in enumerate(_pdf_wrap(encoded, text_width - PDF_BULLET_INDENT, size)):
+                emit(PDF_MARGIN + PDF_BULLET_INDENT, part, bullet=i == 0)
+        else:
+            for part in _pdf_wrap(encoded, text_width, size):
+                emit(PDF_MARGIN, part)
+    pages.append(ops)
+
+    # Objects: 1 catalog, 2 page tree, 3 font, then a page and its content stream per page
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+            b" ".join(b"%d 0 R" % (4 + 2 * i) for i in range(len(pages))), len(pages)),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    for i, page_ops in enumerate(pages):
+        stream = zlib.compress(b"\n".join(page_ops))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources << /Font << /F1 3 0 R >> >> "
+            b"/Contents %d 0 R >>" % (PDF_PAGE_WIDTH, PDF_PAGE_HEIGHT, 5 + 2 * i)
+        )
+        objects.append(b"<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream" % (len(stream), stream))
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    out.write(b"".join(b"%010d 00000 n \n" % offset for offset in offsets))
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def render_document(fmt, text):
+    """Render filled template text to `fmt` bytes; runs in the render processes."""
+    return render_docx(text) if fmt == "docx" else render_pdf(text)
+
+
+_render_cache = None
+_render_cache_ready = False
+
+
+def get_render_cache():
+    """Return the configured cache of rendered files (built lazily from RENDER_CACHE_* env vars)."""
+    global _render_cache, _render_cache_ready
+    if not _render_cache_ready:
+        _render_cache = build_cache("RENDER_CACHE", "renders", default_max_entries=256, default_ttl=7 * 86400)
+        _render_cache_ready = True
+    return _render_cache
+
+
+def set_render_cache(cache):
+    """Swap in a different cache backend (or None to disable caching)."""
+    global _render_cache, _render_cache_ready
+    _render_cache = cache
+    _render_cache_ready = True
+
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    # Created on first use in each worker; spawned children never inherit the worker's threads or sockets
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ProcessPoolExecutor(max_workers=RENDER_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _reset_executor(executor):
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def prepare_letter(letter, fmt="docx", template=None, job_data=None, name=None):
+    """Validate a render request; returns {"key", "text", "fmt", "filename"} or raises ValueError."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format '{fmt}' (expected one of {', '.join(FORMATS)})")
+    if not isinstance(letter, str) or not letter.strip():
+        raise ValueError("No cover letter text provided")
+    if job_data is not None and not isinstance(job_data, dict):
+        raise ValueError("job_data must be an object")
+    fields = template_fields(letter, job_data, name)
+    fields["Cover Letter"] = fill_letter(fields["Cover Letter"], fields)
+    text = fill_template(load_template(template or RENDER_DEFAULT_TEMPLATE), fields)
+    settings = f"{RENDER_VERSION}\0{fmt}\0{RENDER_FONT}\0{RENDER_FONT_SIZE}\0"
+    return {
+        "key": hashlib.sha256((settings + text).encode("utf-8")).hexdigest(),
+        "text": text,
+        "fmt": fmt,
+        "filename": letter_filename(job_data, fmt),
+    }
+
+
+def _cached(item):
+    cache = get_render_cache()
+    value = cache.get(item["key"]) if cache is not None else None
+    if value is None:
+        return None
+    RENDERS.inc(format=item["fmt"], outcome="cache")
+    return base64.b64decode(value["data"])
+
+
+def _store(item, data, seconds):
+    RENDERS.inc(format=item["fmt"], outcome="rendered")
+    STAGE_SECONDS.observe(seconds, stage=f"render_{item['fmt']}")
+    cache = get_render_cache()
+    if cache is not None:
+        cache.set(item["key"], {"data": base64.b64encode(data).decode("ascii")})
+
+
+def _timed_render(fmt, text):
+    started = time.perf_counter()
+    data = render_document(fmt, text)
+    return data, time.perf_counter() - started
+
+
+def _failed(item, error):
+    RENDERS.inc(format=item["fmt"], outcome="failed")
+    if isinstance(error, BrokenProcessPool):
+        logger.error(f"Render process died while rendering {item['filename']}")
+    else:
+        logger.error(f"Rendering {item['filename']} failed: {error}")
+    return Exception("Error rendering cover letter, please try again")
+
+
+def render_letter(item):
+    """Bytes of a prepared letter, from the cache or rendered in the process pool."""
+    data = _cached(item)
+    if data is not None:
+        return data
+    try:
+        if RENDER_WORKERS <= 0:
+            data, seconds = _timed_render(item["fmt"], item["text"])
+        else:
+            executor = _get_executor()
+            try:
+                data, seconds = executor.submit(_timed_render, item["fmt"], item["text"]).result()
+            except BrokenProcessPool:
+                _reset_executor(executor)
+                raise
+    except Exception as e:
+        raise _failed(item, e)
+    _store(item, data, seconds)
+    return data
+
+
+async def async_render_letter(item):
+    data = await asyncio.to_thread(_cached, item)
+    if data is not None:
+        return data
+    try:
+        if RENDER_WORKERS <= 0:
+            data, seconds = await asyncio.to_thread(_timed_render, item["fmt"], item["text"])
+        else:
+            executor = _get_executor()
+            try:
+                data, seconds = await asyncio.get_running_loop().run_in_executor(
+                    executor, _timed_render, item["fmt"], item["text"]
+                )
+            except BrokenProcessPool:
+                _reset_executor(executor)
+                raise
+    except Exception as e:
+        raise _failed(item, e)
+    await asyncio.to_thread(_store, item, data, seconds)
+    return data
+
+
+def prepare_batch(letters, fmt="docx", template=None):
+    """Validate a batch: each entry is {"cover_letter", "job_data", "name", "template"}; raises ValueError."""
+    if not isinstance(letters, list) or not letters:
+        raise ValueError("No cover letters provided")
+    if len(letters) > RENDER_BATCH_MAX:
+        raise ValueError(f"Too many cover letters (max {RENDER_BATCH_MAX})")
+    items, names = [], set()
+    for i, entry in enumerate(letters, start=1):
+        if not isinstance(entry, dict):
+            raise ValueError(f"Letter {i} must be an object")
+        try:
+            item = prepare_letter(entry.get("cover_letter"), fmt, entry.get("template") or template,
+                                  entry.get("job_data"), entry.get("name"))
+        except ValueError as e:
+            raise ValueError(f"Letter {i}: {e}")
+        # Same company and title twice still needs two files in the zip
+        stem, filename, n = item["filename"].rsplit(".", 1)[0], item["filename"], 1
+        while filename in names:
+            n += 1
+            filename = f"{stem}_{n}.{fmt}"
+        names.add(filename)
+        item["filename"] = filename
+        items.append(item)
+    return items
+
+
+class _ZipStream:
+    """Write-only file for ZipFile that hands back what was written since the last drain()."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+def _zip_entry(archive, filename, data):
+    # DOCX is already a zip and our PDF streams are deflated, so store them as they are
+    info = zipfile.ZipInfo(filename, date_time=datetime.now().timetuple()[:6])
+    info.compress_type = zipfile.ZIP_DEFLATED if filename.endswith(".txt") else zipfile.ZIP_STORED
+    archive.writestr(info, data)
+
+
+def _errors_entry(errors):
+    return "\n".join(f"{filename}: {error}" for filename, error in errors) + "\n"
+
+
+def iter_zip_batch(items):
+    """Yield a zip of prepared letters chunk by chunk, each file added as soon as it is rendered.
+
+    Letters that fail to render are listed in errors.txt instead of failing the batch.
+    """
+    stream = _ZipStream()
+    errors = []
+    # Each letter waits on the process pool (or the cache) from its own thread, so the zip fills in completion order
+    threads = ThreadPoolExecutor(max_workers=max(1, min(len(items), RENDER_WORKERS)), thread_name_prefix="render")
+    try:
+        with zipfile.ZipFile(stream, "w") as archive:
+            futures = {threads.submit(render_letter, item): item for item in items}
+            for future in as_completed(futures):
+                try:
+                    _zip_entry(archive, futures[future]["filename"], future.result())
+                except Exception as e:
+                    errors.append((futures[future]["filename"], e))
+                yield stream.drain()
+            if errors:
+                _zip_entry(archive, "errors.txt", _errors_entry(errors))
+        yield stream.drain()
+    finally:
+        # If the client disconnects, drop the letters not started yet
+        threads.shutdown(wait=False, cancel_futures=True)
+
+
+async def async_iter_zip_batch(items):
+    """Async counterpart of iter_zip_batch for the async app."""
+    async def render(item):
+        try:
+            return item, await async_render_letter(item), None
+        except Exception as e:
+            return item, None, e
+
+    stream = _ZipStream()
+    errors = []
+    tasks = [asyncio.ensure_future(render(item)) for item in items]
+    try:
+        with zipfile.ZipFile(stream, "w") as archive:
+            for next_done in asyncio.as_completed(tasks):
+                item, data, error = await next_done
+                if error is not None:
+                    errors.append((item["filename"], error))
+                else:
+                    _zip_entry(archive, item["filename"], data)
+                yield stream.drain()
+            if errors:
+                _zip_entry(archive, "errors.txt", _errors_entry(errors))
+        yield stream.drain()
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,248 @@
+"""Stage timers, counters and histograms with Prometheus text exposition.
+
+Metrics are kept per process: with several gunicorn workers each /metrics
+scrape reports the worker that served it, so give Prometheus one target per
+worker (or run a single worker with threads) for exact totals.
+"""
+import os
+import time
+import cProfile
+import pstats
+import inspect
+import logging
+import threading
+import functools
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Per-request profiling is off unless enabled, since the header would let anyone profile
+PROFILE_REQUESTS = os.getenv("PROFILE_REQUESTS", "").lower() in ("1", "true", "yes")
+PROFILE_HEADER = "X-Profile"
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join("output", "profiles"))
+# cProfile allows one active profiler per process (Python 3.12+ raises for a second one)
+_profile_lock = threading.Lock()
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels.get(name, "") for name in self.labelnames), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            series = self._series.setdefault(key, [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels):
+        series = self._series.get(tuple(labels.get(name, "") for name in self.labelnames))
+        return series[-2] if series else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets + ("+Inf",), series[:len(self.buckets)] + [series[-2]]):
+                    labels = _format_labels(self.labelnames + ("le",), key + (bound,))
+                    lines.append(f"{self.name}_bucket{labels} {count}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_count{labels} {series[-2]}")
+                lines.append(f"{self.name}_sum{labels} {round(series[-1], 6)}")
+        return lines
+
+
+class Registry:
+    """Holds metrics plus collectors that turn existing stats objects into samples at scrape time."""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector):
+        """collector() yields (name, type, help, [(labels_dict, value), ...]) tuples."""
+        self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            try:
+                families = list(collector())
+            except Exception as e:  # a broken collector must not take /metrics down
+                logger.warning(f"Metrics collector failed: {e}")
+                continue
+            for name, kind, documentation, samples in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(tuple(labels), tuple(labels.values()))} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.histogram(
+    "cover_letter_stage_seconds", "Time spent in each stage of a request", ["stage"]
+)
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "cover_letter_http_request_seconds",
+    "Time to build each HTTP response (streaming responses are timed until their headers are ready)",
+    ["endpoint", "method", "status"],
+)
+SCRAPES = registry.counter(
+    "cover_letter_scrapes_total", "Job page scrapes by outcome (cache, direct, proxy, blocked, failed)", ["outcome"]
+)
+SCRAPE_FALLBACKS = registry.counter(
+    "cover_letter_scrape_fallbacks_total",
+    "Proxy fetches started, by reason (direct_failed, hedge_timeout, proxy_preferred, rate_limited, breaker_open)",
+    ["reason"],
+)
+RATE_LIMIT_WAIT_SECONDS = registry.histogram(
+    "cover_letter_rate_limit_wait_seconds", "Time spent waiting for a rate limit token", ["limiter"]
+)
+RATE_LIMIT_REJECTS = registry.counter(
+    "cover_letter_rate_limit_rejects_total", "Calls refused because the rate limit wait was too long", ["limiter"]
+)
+BREAKER_OPENS = registry.counter(
+    "cover_letter_breaker_opens_total", "Times a circuit breaker opened", ["breaker"]
+)
+OPENAI_RETRIES = registry.counter(
+    "cover_letter_openai_retries_total", "OpenAI calls retried, by reason (rate_limited, server_error)", ["reason"]
+)
+COALESCED_REQUESTS = registry.counter(
+    "cover_letter_coalesced_requests_total",
+    "Calls served by an identical call already in flight, by flight and scope (worker, host)",
+    ["flight", "scope"],
+)
+RENDERS = registry.counter(
+    "cover_letter_renders_total", "DOCX/PDF letters by format and outcome (cache, rendered, failed)",
+    ["format", "outcome"],
+)
+
+
+def timed(stage):
+    """Decorator recording a function's run time (sync or async) under STAGE_SECONDS{stage}."""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with STAGE_SECONDS.time(stage=stage):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with STAGE_SECONDS.time(stage=stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def stage_timer(stage):
+    """Context manager form of timed() for a block inside a function."""
+    return STAGE_SECONDS.time(stage=stage)
+
+
+def start_profile(headers):
+    """Start cProfile if profiling is enabled and the request asked for it via PROFILE_HEADER.
+
+    Only one request per process is profiled at a time; while one is, others
+    run unprofiled (returns None) instead of failing.
+    """
+    if not PROFILE_REQUESTS or not headers.get(PROFILE_HEADER):
+        return None
+    if not _profile_lock.acquire(blocking=False):
+        logger.info("Skipping request profile: another request is being profiled")
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:  # another profiling tool (e.g. a debugger or coverage) is active
+        _profile_lock.release()
+        logger.warning(f"Skipping request profile: {e}")
+        return None
+    return profiler
+
+
+def finish_profile(profiler, endpoint):
+    """Stop the profiler, save a .prof file (for snakeviz/pstats) and log the top functions; returns the path."""
+    try:
+        profiler.disable()
+    finally:
+        _profile_lock.release()
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = (endpoint or "request").strip("/").replace("/", "_").replace("<", "").replace(">", "") or "root"
+    path = os.path.join(PROFILE_DIR, f"{name}-{int(time.time() * 1000)}.prof")
+    profiler.dump_stats(path)
+    stats = pstats.Stats(profiler).stats
+    slowest = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:10]
+    top = [
+        f"{func[2]} ({os.path.basename(func[0])}:{func[1]}) {cumulative * 1000:.1f}ms"
+        for func, (_, _, _, cumulative, _) in slowest
+    ]
+    logger.info(f"Profile for {endpoint} saved to {path}; top functions: {'; '.join(top)}")
+    return path
@@ -1,76 +1,365 @@
 import os
+import re
 import json
+import time
+import asyncio
+import difflib
+import random
+import hashlib
 import logging
+import threading
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.cache import build_cache
+from utils.http_pools import pools
+from utils.job_text import count_tokens, prepare_job_text
+from utils.metrics import OPENAI_RETRIES, STAGE_SECONDS, registry, stage_timer
+from utils.prompts import COVER_LETTER_PROMPT, INTERPRET_PROMPT, ONE_SHOT_PROMPT
+from utils.rate_limit import CircuitBreaker, RateLimited, TokenBucket
+from utils.single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
-# Initialize OpenAI client when needed (lazy load)
+# OpenAI clients are created on first use and reused (one keep-alive pool per worker)
 def get_openai_client():
-    from openai import OpenAI
-    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return pools.openai_client()
 
-def interpret_job_details(raw_text):
-    """Use OpenAI API to extract job details."""
-    prompt = f"""
-    Extract and format job details in structured JSON format. Return ONLY valid JSON, no other text.
-
-    IMPORTANT: Filter out any irrelevant content such as:
-    - Advertisements or marketing content
-    - Website navigation elements
-    - Proxy service mentions (like BrightData, Bright Data, etc.)
-    - Cookie notices or privacy policies
-    - Social media links or unrelated content
-    
-    Focus ONLY on the actual job posting content including:
-    - Job title and company name
-    - Job description and responsibilities
-    - Required skills and experience
-    - Qualifications and software requirements
-
-    Required fields:
-    - "job_title": string
-    - "company_name": string  
-    - "job_description": string (summary of main responsibilities)
-    - "experience": array of strings (years required, specific experience)
-    - "skills": array of strings (technical and soft skills)
-    - "software": array of strings (specific software/tools mentioned)
-    - "additional_requirements": string (education, certifications, etc.)
-    - "preferred_qualifications": array of strings (nice-to-have qualifications)
-    - "other_notes": string (location, work type, salary range if mentioned)
-
-    Job Posting Text (may contain irrelevant content to filter out):
-    {raw_text[:3000]}
-
-    Return only valid JSON focusing on the actual job posting content:
+def get_async_openai_client():
+    return pools.async_openai_client()
+
+
+# gpt-4-turbo has no cached-input discount (see MODEL_PRICES), so the static-prefix
+# prompt layout in utils/prompts.py only saves money on a model with prompt caching
+# such as gpt-4o; set OPENAI_INTERPRET_MODEL / OPENAI_COVER_LETTER_MODEL to use one.
+INTERPRET_MODEL = os.getenv("OPENAI_INTERPRET_MODEL", "gpt-4-turbo")
+
+# Changes whenever the prompt changes, which invalidates cached job data.
+INTERPRET_PROMPT_VERSION = INTERPRET_PROMPT.fingerprint
+
+# Lines that appear on most job boards and never affect the extracted fields. Each
+# pattern must match the whole line, so a posting that merely mentions cookies or
+# privacy (a bakery, a data protection role) keeps that line and its own cache key.
+BOILERPLATE_PATTERNS = [
+    r"(sign in|log in|register|skip to content|menu|home)",
+    r"((accept|reject|allow|manage)( all)? )?cookies?( policy| settings| preferences)?",
+    r"(this (site|website) uses|we use) cookies\b.*",
+    r"(privacy( policy)?|privacy (and|&) cookies|terms (of use|and conditions))",
+    r"(share|save|save job|report this job( ad)?|apply now|quick apply)",
+    r"(powered by )?bright\s*data",
+    r"(©|copyright ©?).*",
+]
+_BOILERPLATE_RE = re.compile("|".join(f"(?:{pattern})" for pattern in BOILERPLATE_PATTERNS), re.IGNORECASE)
+# Bump when normalize_job_text changes, so entries keyed by the old normalization are not reused
+NORMALIZE_VERSION = 2
+
+# USD per million tokens: (input, cached input, output). Override with OPENAI_PRICES as JSON.
+# gpt-4-turbo bills cached input at the full rate; the gpt-4o family halves it.
+MODEL_PRICES = {
+    "gpt-4-turbo": (10.00, 10.00, 30.00),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+}
+MODEL_PRICES.update({model: tuple(prices) for model, prices in json.loads(os.getenv("OPENAI_PRICES", "{}")).items()})
+
+
+def _usage_counts(usage):
+    """(prompt, cached, completion) token counts from an API usage object (or None)."""
+    details = getattr(usage, "prompt_tokens_details", None)
+    return (
+        getattr(usage, "prompt_tokens", 0) or 0,
+        getattr(details, "cached_tokens", 0) or 0,
+        getattr(usage, "completion_tokens", 0) or 0,
+    )
+
+
+def usage_cost(model, prompt_tokens, cached_tokens, completion_tokens):
+    """Estimated USD cost of one call, or 0.0 for a model without a price."""
+    if model not in MODEL_PRICES:
+        return 0.0
+    input_price, cached_price, output_price = MODEL_PRICES[model]
+    return (
+        (prompt_tokens - cached_tokens) * input_price
+        + cached_tokens * cached_price
+        + completion_tokens * output_price
+    ) / 1_000_000
+
+
+class UsageStats:
+    """Token counts and estimated cost per call type, from the API's usage field.
+
+    Also tracks prompt-prefix cache hits (cached_tokens) and job text trimming.
     """
 
-    client = get_openai_client()
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def record(self, call, usage, template=None, model=None, letters=0, text_stats=None):
+        prompt_tokens, cached_tokens, completion_tokens = _usage_counts(usage)
+        with self._lock:
+            totals = self._calls.setdefault(call, {
+                "calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0,
+                "cost_usd": 0.0, "letters": 0,
+            })
+            totals["calls"] += 1
+            totals["prompt_tokens"] += prompt_tokens
+            totals["cached_tokens"] += cached_tokens
+            totals["completion_tokens"] += completion_tokens
+            totals["cost_usd"] += usage_cost(model, prompt_tokens, cached_tokens, completion_tokens)
+            totals["letters"] += letters
+            if template is not None:
+                totals["template"] = template.id
+            if text_stats:
+                totals["raw_text_tokens"] = totals.get("raw_text_tokens", 0) + text_stats["raw_tokens"]
+                totals["job_text_tokens"] = totals.get("job_text_tokens", 0) + text_stats["prepared_tokens"]
+
+    def stats(self):
+        """Per-call totals plus overall cache-hit ratio and cost per letter."""
+        with self._lock:
+            calls = {call: dict(totals) for call, totals in self._calls.items()}
+        prompt_tokens = sum(totals["prompt_tokens"] for totals in calls.values())
+        cached_tokens = sum(totals["cached_tokens"] for totals in calls.values())
+        cost = sum(totals["cost_usd"] for totals in calls.values())
+        # Extraction calls are part of what a letter costs, so they count towards cost per letter
+        letters = sum(totals["letters"] for totals in calls.values())
+        for totals in calls.values():
+            totals["cost_usd"] = round(totals["cost_usd"], 6)
+        calls["total"] = {
+            "prompt_tokens": prompt_tokens,
+            "cached_tokens": cached_tokens,
+            "completion_tokens": sum(totals["completion_tokens"] for totals in calls.values()),
+            "cache_hit_ratio": round(cached_tokens / prompt_tokens, 4) if prompt_tokens else 0.0,
+            "cost_usd": round(cost, 6),
+            "letters": letters,
+            "cost_per_letter_usd": round(cost / letters, 6) if letters else None,
+        }
+        return calls
+
+    def reset(self):
+        with self._lock:
+            self._calls.clear()
+
+
+usage_stats = UsageStats()
+
+STREAM_TTFB = registry.histogram(
+    "cover_letter_openai_stream_first_token_seconds", "Time from the streaming request to its first token"
+)
+
+
+def _usage_metrics():
+    calls = usage_stats.stats()
+    total = calls.pop("total")
+    for field in ("calls", "prompt_tokens", "cached_tokens", "completion_tokens", "letters"):
+        yield (f"cover_letter_openai_{field}_total", "counter", f"OpenAI {field.replace('_', ' ')} by call type",
+               [({"call": call}, totals[field]) for call, totals in calls.items()])
+    yield ("cover_letter_openai_cost_usd_total", "counter", "Estimated OpenAI spend in USD by call type",
+           [({"call": call}, totals["cost_usd"]) for call, totals in calls.items()])
+    yield ("cover_letter_openai_prompt_cache_hit_ratio", "gauge", "Share of prompt tokens served from the prompt cache",
+           [({}, total["cache_hit_ratio"])])
+
 
+registry.register_collector(_usage_metrics)
+
+# OpenAI requests per second (and burst) across all workers on the host. A call
+# that would wait longer than OPENAI_RATE_MAX_WAIT for its turn is refused.
+OPENAI_RATE = float(os.getenv("OPENAI_RATE", 8.0))
+OPENAI_BURST = float(os.getenv("OPENAI_BURST", 16))
+OPENAI_RATE_MAX_WAIT = float(os.getenv("OPENAI_RATE_MAX_WAIT", 10.0))
+# 429s, 5xx and connection errors are retried with full-jitter exponential backoff
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", 3))
+OPENAI_BACKOFF_BASE = float(os.getenv("OPENAI_BACKOFF_BASE", 1.0))
+OPENAI_BACKOFF_MAX = float(os.getenv("OPENAI_BACKOFF_MAX", 20.0))
+# Consecutive 5xx/connection failures after which calls fail fast for OPENAI_BREAKER_COOLDOWN seconds
+OPENAI_BREAKER_THRESHOLD = int(os.getenv("OPENAI_BREAKER_THRESHOLD", 5))
+OPENAI_BREAKER_COOLDOWN = float(os.getenv("OPENAI_BREAKER_COOLDOWN", 30))
+
+OPENAI_KEY = "api"
+openai_limiter = TokenBucket("openai", OPENAI_RATE, OPENAI_BURST)
+openai_breaker = CircuitBreaker("openai", OPENAI_BREAKER_THRESHOLD, OPENAI_BREAKER_COOLDOWN)
+
+
+def _is_rate_limit(err):
+    # An exhausted quota is also a 429, but waiting will not fix it
+    return getattr(err, "status_code", None) == 429 and getattr(err, "code", None) != "insufficient_quota"
+
+
+def _openai_retry_reason(err):
+    """"rate_limited" or "server_error" if err is worth retrying, else None."""
+    if _is_rate_limit(err):
+        return "rate_limited"
+    status = getattr(err, "status_code", None)
+    if status is not None:
+        return "server_error" if status >= 500 else None
+    from openai import APIConnectionError
+    return "server_error" if isinstance(err, APIConnectionError) else None
+
+
+def _retry_after_header(err):
+    headers = getattr(getattr(err, "response", None), "headers", None) or {}
     try:
-        response = client.chat.completions.create(
-            model="gpt-4-turbo",
-            messages=[
-                {"role": "system", "content": "You are an expert at extracting structured job data from web pages. Filter out irrelevant content like ads, navigation, and proxy service mentions. Focus only on actual job posting content. Return only valid JSON, no markdown or extra text."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=1000,
-            temperature=0.1
+        return float(headers.get("retry-after") or 0)
+    except ValueError:
+        return 0.0
+
+
+def _openai_failed(err, attempt):
+    """Feed a failed call to the limiter/breaker; returns seconds to wait before retrying, or None to give up."""
+    reason = _openai_retry_reason(err)
+    if reason == "rate_limited":
+        openai_limiter.penalize(OPENAI_KEY)
+    elif reason == "server_error":
+        openai_breaker.record_failure(OPENAI_KEY)
+    if reason is None or attempt >= OPENAI_MAX_RETRIES:
+        return None
+    OPENAI_RETRIES.inc(reason=reason)
+    backoff = random.uniform(0, min(OPENAI_BACKOFF_MAX, OPENAI_BACKOFF_BASE * 2 ** attempt))
+    delay = min(OPENAI_BACKOFF_MAX, max(backoff, _retry_after_header(err)))
+    logger.warning(f"OpenAI call failed ({err}); retry {attempt + 1}/{OPENAI_MAX_RETRIES} in {delay:.1f}s")
+    return delay
+
+
+def _openai_unavailable():
+    return RateLimited(
+        "The AI service is temporarily unavailable; please try again shortly",
+        retry_after=openai_breaker.retry_after(OPENAI_KEY),
+    )
+
+
+def _openai_busy(err):
+    return RateLimited(
+        "The AI service is busy; please try again shortly",
+        retry_after=_retry_after_header(err) or OPENAI_BACKOFF_MAX,
+    )
+
+
+def call_openai(create, **request):
+    """create(**request) under the shared OpenAI rate limit and circuit breaker, with retries.
+
+    Raises RateLimited when the breaker is open, the wait for a token is too
+    long, or OpenAI is still rate limiting once the retries are used up.
+    """
+    for attempt in range(OPENAI_MAX_RETRIES + 1):
+        if not openai_breaker.allow(OPENAI_KEY):
+            raise _openai_unavailable()
+        openai_limiter.acquire(OPENAI_KEY, OPENAI_RATE_MAX_WAIT)
+        try:
+            response = create(**request)
+        except Exception as err:
+            delay = _openai_failed(err, attempt)
+            if delay is None:
+                if _is_rate_limit(err):
+                    raise _openai_busy(err) from err
+                raise
+            time.sleep(delay)
+            continue
+        openai_breaker.record_success(OPENAI_KEY)
+        return response
+
+
+async def async_call_openai(create, **request):
+    """Async variant of call_openai; the shared state store is used from a worker thread."""
+    for attempt in range(OPENAI_MAX_RETRIES + 1):
+        if not await asyncio.to_thread(openai_breaker.allow, OPENAI_KEY):
+            raise _openai_unavailable()
+        await openai_limiter.async_acquire(OPENAI_KEY, OPENAI_RATE_MAX_WAIT)
+        try:
+            response = await create(**request)
+        except Exception as err:
+            delay = await asyncio.to_thread(_openai_failed, err, attempt)
+            if delay is None:
+                if _is_rate_limit(err):
+                    raise _openai_busy(err) from err
+                raise
+            await asyncio.sleep(delay)
+            continue
+        await asyncio.to_thread(openai_breaker.record_success, OPENAI_KEY)
+        return response
+
+_job_data_cache = None
+_job_data_cache_ready = False
+
+
+def get_job_data_cache():
+    """Return the configured job data cache (built lazily from JOB_DATA_CACHE_* env vars).
+
+    Defaults to the SQLite backend so every worker process shares one cache.
+    """
+    global _job_data_cache, _job_data_cache_ready
+    if not _job_data_cache_ready:
+        _job_data_cache = build_cache(
+            "JOB_DATA_CACHE", "job_data", default_max_entries=1024, default_ttl=86400, default_backend="sqlite"
         )
+        _job_data_cache_ready = True
+    return _job_data_cache
 
-        job_details_str = response.choices[0].message.content.strip()
-        logger.info(f"OpenAI job details response: {job_details_str[:200]}...")
-        
-        # Clean up response - remove markdown code blocks if present
-        if job_details_str.startswith('```'):
-            job_details_str = job_details_str.split('```')[1]
-            if job_details_str.startswith('json'):
-                job_details_str = job_details_str[4:]
-        
-        # Try to parse JSON
+
+def set_job_data_cache(cache):
+    """Swap in a different cache backend (or None to disable memoization)."""
+    global _job_data_cache, _job_data_cache_ready
+    _job_data_cache = cache
+    _job_data_cache_ready = True
+
+
+def normalize_job_text(raw_text):
+    """Collapse whitespace and drop boilerplate lines so near-identical postings match."""
+    lines = []
+    for line in raw_text.splitlines():
+        line = " ".join(line.split())
+        if line and not _BOILERPLATE_RE.fullmatch(line):
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def job_data_cache_key(job_text, model=INTERPRET_MODEL):
+    normalized = normalize_job_text(job_text)
+    digest = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+    return f"{model}:{INTERPRET_PROMPT_VERSION}:n{NORMALIZE_VERSION}:{digest}"
+
+
+def _prepare_interpret(raw_text):
+    """Trim raw_text to the token budget and look it up in the cache.
+
+    Returns (job_text, text_stats, cache, key, cached_job_data); cached_job_data
+    is None on a miss.
+    """
+    job_text, text_stats = prepare_job_text(raw_text)
+    logger.info(
+        f"Job text: {text_stats['raw_tokens']} -> {text_stats['prepared_tokens']} tokens "
+        f"({text_stats['blocks_kept']}/{text_stats['blocks_total']} blocks)"
+    )
+    cache = get_job_data_cache()
+    key = job_data_cache_key(job_text)
+    cached = cache.get(key) if cache is not None else None
+    if cached is not None:
+        logger.info("Job data cache hit")
+    return job_text, text_stats, cache, key, cached
+
+
+def _interpret_request(job_text):
+    """Keyword arguments for the chat completion that extracts job details."""
+    return {
+        "model": INTERPRET_MODEL,
+        "messages": INTERPRET_PROMPT.messages(job_text=job_text),
+        "max_tokens": 1000,
+        "temperature": 0.1,
+        "response_format": {"type": "json_object"},
+    }
+
+
+def _parse_job_details(job_details_str, cache, key):
+    """Parse the model's JSON reply, caching it on success; fall back to a placeholder dict."""
+    logger.info(f"OpenAI job details response: {job_details_str[:200]}...")
+
+    # JSON mode makes fences unlikely, but strip markdown code blocks if present
+    if job_details_str.startswith('```'):
+        job_details_str = job_details_str.split('```')[1]
+        if job_details_str.startswith('json'):
+            job_details_str = job_details_str[4:]
+
+    try:
         job_data = json.loads(job_details_str)
-        return job_data
-        
     except json.JSONDecodeError as e:
         logger.error(f"JSON parsing failed. Raw response: {job_details_str}")
         # Return a default structure if JSON parsing fails
@@ -85,58 +374,518 @@ def interpret_job_details(raw_text):
             "preferred_qualifications": [],
             "other_notes": f"JSON parsing error: {e}"
         }
+
+    if cache is not None:
+        cache.set(key, job_data)
+    return job_data
+
+
+def interpret_job_details(raw_text):
+    """Use OpenAI API to extract job details.
+
+    The text is first trimmed to its most job-relevant blocks within
+    JOB_TEXT_TOKEN_BUDGET tokens. Results are memoized by a hash of that text,
+    the model and the prompt version, so repeat postings skip OpenAI.
+    """
+    job_text, text_stats, cache, key, cached = _prepare_interpret(raw_text)
+    if cached is not None:
+        return cached
+    # The same posting being extracted for another request right now shares that call
+    return interpret_flight.do(key, lambda: _interpret(job_text, text_stats, cache, key))
+
+
+def _interpret(job_text, text_stats, cache, key):
+    client = get_openai_client()
+
+    try:
+        with stage_timer("openai_interpret"):
+            response = call_openai(client.chat.completions.create, **_interpret_request(job_text))
+        usage_stats.record("interpret", getattr(response, "usage", None), INTERPRET_PROMPT, INTERPRET_MODEL, text_stats=text_stats)
+        job_details_str = response.choices[0].message.content.strip()
+    except RateLimited:
+        raise
+    except Exception as e:
+        logger.error(f"Error interpreting job details: {e}")
+        raise Exception(f"Error interpreting job details: {e}")
+
+    return _parse_job_details(job_details_str, cache, key)
+
+
+async def async_interpret_job_details(raw_text):
+    """Async variant of interpret_job_details using AsyncOpenAI.
+
+    Tokenizing and the job data cache (SQLite by default) run in a thread so
+    they do not stall the event loop.
+    """
+    job_text, text_stats, cache, key, cached = await asyncio.to_thread(_prepare_interpret, raw_text)
+    if cached is not None:
+        return cached
+    return await interpret_flight.async_do(key, lambda: _async_interpret(job_text, text_stats, cache, key))
+
+
+async def _async_interpret(job_text, text_stats, cache, key):
+    client = get_async_openai_client()
+
+    try:
+        with stage_timer("openai_interpret"):
+            response = await async_call_openai(client.chat.completions.create, **_interpret_request(job_text))
+        usage_stats.record("interpret", getattr(response, "usage", None), INTERPRET_PROMPT, INTERPRET_MODEL, text_stats=text_stats)
+        job_details_str = response.choices[0].message.content.strip()
+    except RateLimited:
+        raise
     except Exception as e:
         logger.error(f"Error interpreting job details: {e}")
         raise Exception(f"Error interpreting job details: {e}")
 
+    return await asyncio.to_thread(_parse_job_details, job_details_str, cache, key)
+
+
+COVER_LETTER_MODEL = os.getenv("OPENAI_COVER_LETTER_MODEL", "gpt-4-turbo")
+
+interpret_flight = SingleFlight("interpret")
+generate_flight = SingleFlight("generate")
+one_shot_flight = SingleFlight("one_shot")
+
+
+def cover_letter_key(job_details, user_letter, *parts):
+    """Hash of everything that decides a generated letter, including today's date from the prompt."""
+    payload = json.dumps(
+        [job_details, user_letter.strip(), datetime.today().strftime("%d %B %Y"), *parts], sort_keys=True
+    )
+    return f"{COVER_LETTER_MODEL}:{COVER_LETTER_PROMPT.fingerprint}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+
+def _cover_letter_messages(job_details, user_letter, tone=None):
+    """Build the chat messages shared by the blocking, streaming and variant generators.
+
+    A tone preset is sent as a trailing message so every tone shares the same
+    prompt prefix.
+    """
+    messages = COVER_LETTER_PROMPT.messages(
+        user_letter=user_letter.strip(),
+        job_title=job_details.get('job_title', 'Unknown Title'),
+        company_name=job_details.get('company_name', 'Unknown Company'),
+        job_description=job_details.get('job_description', ''),
+        skills=", ".join(job_details.get('skills', [])),
+        experience=", ".join(job_details.get('experience', [])),
+        software=", ".join(job_details.get('software', [])),
+        current_date=datetime.today().strftime("%d %B %Y"),
+    )
+    if tone:
+        messages.append({"role": "user", "content": f"Write this version in a {tone} tone: {TONE_PRESETS[tone]}"})
+    return messages
+
+
 def generate_cover_letter(job_details, user_letter):
-    """Generate a personalized cover letter using OpenAI."""
-    current_date = datetime.today().strftime("%d %B %Y")
-    prompt = f"""
-    Generate a professional, personalized cover letter. Return only the cover letter text, no markdown or extra formatting.
-
-    Job Details:
-    - Job Title: {job_details.get('job_title', 'Unknown Title')}
-    - Company Name: {job_details.get('company_name', 'Unknown Company')}
-    - Job Description: {job_details.get('job_description', '')}
-    - Required Skills: {", ".join(job_details.get('skills', []))}
-    - Required Experience: {", ".join(job_details.get('experience', []))}
-    - Software/Tools: {", ".join(job_details.get('software', []))}
-    
-    Base this cover letter on the user's existing letter/profile below, but personalize it specifically for the job above:
-    
-    {user_letter}
-    
-    Requirements:
-    - Use today's date: {current_date}
-    - Professional, engaging tone
-    - Highlight relevant experience from user's background that matches the job requirements
-    - Address specific skills and requirements mentioned in the job posting
-    - Keep it concise (under 400 words)
-    - Use the exact company name and job title from the job posting
-    - Return only the cover letter text, no additional formatting
-    
-    DO NOT mention irrelevant companies like BrightData or proxy services.
-    Focus only on the actual job and company from the posting.
+    """Generate a personalized cover letter using OpenAI.
+
+    Concurrent requests with the same job data and profile share one call.
+    Raises on API errors, so a failure is never shared or cached as a letter.
     """
+    return generate_flight.do(
+        cover_letter_key(job_details, user_letter), lambda: _generate(job_details, user_letter)
+    )
+
 
+def _generate(job_details, user_letter):
     client = get_openai_client()
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4-turbo",
-            messages=[
-                {"role": "system", "content": "You are a professional cover letter writer. Create personalized, engaging cover letters that highlight relevant experience for specific job postings. Return only the cover letter text, no markdown formatting."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=800,
-            temperature=0.3
-        )
+        with stage_timer("openai_generate"):
+            response = call_openai(
+                client.chat.completions.create,
+                model=COVER_LETTER_MODEL,
+                messages=_cover_letter_messages(job_details, user_letter),
+                max_tokens=800,
+                temperature=0.3
+            )
+        usage_stats.record("generate", getattr(response, "usage", None), COVER_LETTER_PROMPT, COVER_LETTER_MODEL, letters=1)
         
         cover_letter = response.choices[0].message.content.strip()
         logger.info(f"Generated cover letter length: {len(cover_letter)} characters")
         return cover_letter
         
+    except RateLimited:
+        raise
+    except Exception as e:
+        logger.error(f"Error generating cover letter: {e}")
+        raise Exception(f"Error generating cover letter: {e}")
+
+
+def stream_cover_letter(job_details, user_letter):
+    """Generate a cover letter with the OpenAI streaming API, yielding text chunks as they arrive.
+
+    Errors are raised to the caller rather than returned as text, since part of
+    the letter may already have been sent to the client.
+    """
+    client = get_openai_client()
+
+    started = time.perf_counter()
+    stream = call_openai(
+        client.chat.completions.create,
+        model=COVER_LETTER_MODEL,
+        messages=_cover_letter_messages(job_details, user_letter),
+        max_tokens=800,
+        temperature=0.3,
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+
+    length = 0
+    usage = None
+    for chunk in stream:
+        # With include_usage the last chunk has no choices, only the usage totals
+        usage = getattr(chunk, "usage", None) or usage
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            if not length:
+                STREAM_TTFB.observe(time.perf_counter() - started)
+            length += len(delta)
+            yield delta
+    STAGE_SECONDS.observe(time.perf_counter() - started, stage="openai_stream")
+    usage_stats.record("stream", usage, COVER_LETTER_PROMPT, COVER_LETTER_MODEL, letters=1)
+    logger.info(f"Streamed cover letter length: {length} characters")
+
+
+async def async_generate_cover_letter(job_details, user_letter):
+    """Async variant of generate_cover_letter using AsyncOpenAI."""
+    return await generate_flight.async_do(
+        cover_letter_key(job_details, user_letter), lambda: _async_generate(job_details, user_letter)
+    )
+
+
+async def _async_generate(job_details, user_letter):
+    client = get_async_openai_client()
+
+    try:
+        with stage_timer("openai_generate"):
+            response = await async_call_openai(
+                client.chat.completions.create,
+                model=COVER_LETTER_MODEL,
+                messages=_cover_letter_messages(job_details, user_letter),
+                max_tokens=800,
+                temperature=0.3
+            )
+        usage_stats.record("generate", getattr(response, "usage", None), COVER_LETTER_PROMPT, COVER_LETTER_MODEL, letters=1)
+
+        cover_letter = response.choices[0].message.content.strip()
+        logger.info(f"Generated cover letter length: {len(cover_letter)} characters")
+        return cover_letter
+
+    except RateLimited:
+        raise
     except Exception as e:
         logger.error(f"Error generating cover letter: {e}")
-        return f"Error generating cover letter: {e}"
+        raise Exception(f"Error generating cover letter: {e}")
+
+
+async def async_stream_cover_letter(job_details, user_letter):
+    """Async variant of stream_cover_letter; an async generator of text chunks."""
+    client = get_async_openai_client()
+
+    started = time.perf_counter()
+    stream = await async_call_openai(
+        client.chat.completions.create,
+        model=COVER_LETTER_MODEL,
+        messages=_cover_letter_messages(job_details, user_letter),
+        max_tokens=800,
+        temperature=0.3,
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+
+    length = 0
+    usage = None
+    async for chunk in stream:
+        # With include_usage the last chunk has no choices, only the usage totals
+        usage = getattr(chunk, "usage", None) or usage
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            if not length:
+                STREAM_TTFB.observe(time.perf_counter() - started)
+            length += len(delta)
+            yield delta
+    STAGE_SECONDS.observe(time.perf_counter() - started, stage="openai_stream")
+    usage_stats.record("stream", usage, COVER_LETTER_PROMPT, COVER_LETTER_MODEL, letters=1)
+    logger.info(f"Streamed cover letter length: {length} characters")
+
+
+# Fields of the job data dict, with the value used when the model leaves one out
+JOB_DATA_FIELDS = {
+    "job_title": "",
+    "company_name": "",
+    "job_description": "",
+    "experience": [],
+    "skills": [],
+    "software": [],
+    "additional_requirements": "",
+    "preferred_qualifications": [],
+    "other_notes": "",
+}
+
+def _one_shot_request(job_text, user_letter):
+    """Keyword arguments for the single JSON-mode call that extracts job details and writes the letter."""
+    return {
+        "model": COVER_LETTER_MODEL,
+        "messages": ONE_SHOT_PROMPT.messages(
+            user_letter=user_letter.strip(),
+            job_text=job_text,
+            current_date=datetime.today().strftime("%d %B %Y"),
+        ),
+        "max_tokens": 1800,
+        "temperature": 0.3,
+        "response_format": {"type": "json_object"},
+    }
+
+
+def _parse_one_shot(content):
+    """Validate the one-shot reply; returns (job_data, cover_letter) or raises."""
+    try:
+        result = json.loads(content)
+    except json.JSONDecodeError as e:
+        logger.error(f"One-shot JSON parsing failed. Raw response: {content[:500]}")
+        raise Exception(f"Invalid JSON from model: {e}")
+
+    job_data = result.get("job_data") if isinstance(result, dict) else None
+    cover_letter = result.get("cover_letter") if isinstance(result, dict) else None
+    if not isinstance(job_data, dict) or not isinstance(cover_letter, str) or not cover_letter.strip():
+        raise Exception("Model response is missing job_data or cover_letter")
+
+    for field, default in JOB_DATA_FIELDS.items():
+        if not isinstance(job_data.get(field), type(default)):
+            job_data[field] = type(default)()
+    return job_data, cover_letter.strip()
+
+
+def _one_shot_cached(cached, user_letter):
+    """The job data is already cached, so only the letter needs generating."""
+    return cached, generate_cover_letter(cached, user_letter)
+
+
+def extract_and_generate(raw_text, user_letter):
+    """Extract job details and write the cover letter in one JSON-mode OpenAI call.
+
+    Returns (job_data, cover_letter). The job data is stored in the job data
+    cache, and a cache hit falls back to generate_cover_letter alone. Raises
+    on API errors or a malformed reply instead of returning placeholder data.
+    """
+    job_text, text_stats, cache, key, cached = _prepare_interpret(raw_text)
+    if cached is not None:
+        return _one_shot_cached(cached, user_letter)
+    job_data, cover_letter = one_shot_flight.do(
+        cover_letter_key(key, user_letter, ONE_SHOT_PROMPT.fingerprint),
+        lambda: _extract_and_generate(job_text, text_stats, cache, key, user_letter),
+    )
+    return job_data, cover_letter
+
+
+def _extract_and_generate(job_text, text_stats, cache, key, user_letter):
+    client = get_openai_client()
+
+    try:
+        with stage_timer("openai_one_shot"):
+            response = call_openai(client.chat.completions.create, **_one_shot_request(job_text, user_letter))
+        usage_stats.record("one_shot", getattr(response, "usage", None), ONE_SHOT_PROMPT, COVER_LETTER_MODEL, letters=1, text_stats=text_stats)
+        content = response.choices[0].message.content.strip()
+    except RateLimited:
+        raise
+    except Exception as e:
+        logger.error(f"Error in one-shot cover letter generation: {e}")
+        raise Exception(f"Error generating cover letter: {e}")
+
+    job_data, cover_letter = _parse_one_shot(content)
+    logger.info(f"Generated one-shot cover letter length: {len(cover_letter)} characters")
+    if cache is not None:
+        cache.set(key, job_data)
+    return job_data, cover_letter
+
+
+async def async_extract_and_generate(raw_text, user_letter):
+    """Async variant of extract_and_generate using AsyncOpenAI."""
+    job_text, text_stats, cache, key, cached = await asyncio.to_thread(_prepare_interpret, raw_text)
+    if cached is not None:
+        return cached, await async_generate_cover_letter(cached, user_letter)
+    job_data, cover_letter = await one_shot_flight.async_do(
+        cover_letter_key(key, user_letter, ONE_SHOT_PROMPT.fingerprint),
+        lambda: _async_extract_and_generate(job_text, text_stats, cache, key, user_letter),
+    )
+    return job_data, cover_letter
+
+
+async def _async_extract_and_generate(job_text, text_stats, cache, key, user_letter):
+    client = get_async_openai_client()
+
+    try:
+        with stage_timer("openai_one_shot"):
+            response = await async_call_openai(client.chat.completions.create, **_one_shot_request(job_text, user_letter))
+        usage_stats.record("one_shot", getattr(response, "usage", None), ONE_SHOT_PROMPT, COVER_LETTER_MODEL, letters=1, text_stats=text_stats)
+        content = response.choices[0].message.content.strip()
+    except RateLimited:
+        raise
+    except Exception as e:
+        logger.error(f"Error in one-shot cover letter generation: {e}")
+        raise Exception(f"Error generating cover letter: {e}")
+
+    job_data, cover_letter = _parse_one_shot(content)
+    logger.info(f"Generated one-shot cover letter length: {len(cover_letter)} characters")
+    if cache is not None:
+        await asyncio.to_thread(cache.set, key, job_data)
+    return job_data, cover_letter
+
+
+# Variants mode: several alternative letters from one request
+COVER_LETTER_VARIANTS_MAX = int(os.getenv("COVER_LETTER_VARIANTS_MAX", 5))
+VARIANT_TEMPERATURE = 0.8
+# Variants at least this similar (difflib ratio) to an earlier one are dropped
+VARIANT_SIMILARITY_THRESHOLD = 0.9
+
+TONE_PRESETS = {
+    "formal": "measured and professional, no contractions or exclamation marks",
+    "warm": "friendly and personable while staying professional",
+    "enthusiastic": "energetic, showing clear excitement about the role and company",
+    "concise": "direct and brief, around 200 words, with the strongest points first",
+}
+
+
+def _variant_plan(count, tones):
+    """Split count variants across tones as [(tone, n), ...]; one entry per API call."""
+    if not 1 <= count <= COVER_LETTER_VARIANTS_MAX:
+        raise ValueError(f"Number of variants must be between 1 and {COVER_LETTER_VARIANTS_MAX}")
+    tones = list(dict.fromkeys(tones or []))
+    unknown = [tone for tone in tones if tone not in TONE_PRESETS]
+    if unknown:
+        raise ValueError(f"Unknown tone '{unknown[0]}' (expected one of {', '.join(TONE_PRESETS)})")
+    if not tones:
+        return [(None, count)]
+    # Round-robin so every requested tone gets at least one variant when count allows
+    plan = {tone: 0 for tone in tones[:count]}
+    for i in range(count):
+        plan[tones[i % len(plan)]] += 1
+    return list(plan.items())
+
+
+def _variant_request(job_details, user_letter, tone, n):
+    return {
+        "model": COVER_LETTER_MODEL,
+        "messages": _cover_letter_messages(job_details, user_letter, tone),
+        "max_tokens": 800,
+        "temperature": VARIANT_TEMPERATURE,
+        "n": n,
+    }
+
+
+def _variants_from_response(response, tone, started):
+    """One dict per choice; n samples share one call, so they share its latency."""
+    latency_ms = round((time.perf_counter() - started) * 1000, 1)
+    usage = getattr(response, "usage", None)
+    variants = []
+    for choice in response.choices:
+        text = (choice.message.content or "").strip()
+        if text:
+            variants.append({
+                "cover_letter": text,
+                "tone": tone,
+                "latency_ms": latency_ms,
+                "completion_tokens": count_tokens(text),
+            })
+    return variants, getattr(usage, "prompt_tokens", 0) or 0
+
+
+def dedupe_variants(variants, threshold=VARIANT_SIMILARITY_THRESHOLD):
+    """Drop variants that are (near-)copies of an earlier one."""
+    kept = []
+    normalized = []
+    for variant in variants:
+        text = " ".join(variant["cover_letter"].lower().split())
+        if any(difflib.SequenceMatcher(None, text, other).ratio() >= threshold for other in normalized):
+            continue
+        normalized.append(text)
+        kept.append(variant)
+    return kept
+
+
+def _variants_report(results, started, count):
+    variants = [variant for batch, _ in results for variant in batch]
+    unique = dedupe_variants(variants)
+    prompt_tokens = sum(tokens for _, tokens in results)
+    completion_tokens = sum(variant["completion_tokens"] for variant in variants)
+    report = {
+        "variants": unique,
+        "requested": count,
+        "returned_by_model": len(variants),
+        "duplicates_dropped": len(variants) - len(unique),
+        "calls": len(results),
+        "total_ms": round((time.perf_counter() - started) * 1000, 1),
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "tokens_per_variant": round((prompt_tokens + completion_tokens) / len(unique), 1) if unique else None,
+    }
+    logger.info(
+        f"Generated {len(unique)} cover letter variants in {report['total_ms']}ms "
+        f"({report['calls']} calls, {report['duplicates_dropped']} duplicates dropped)"
+    )
+    return report
+
+
+def generate_cover_letter_variants(job_details, user_letter, count=3, tones=None):
+    """Generate up to `count` alternative cover letters from one request.
+
+    Without tones this is a single call with n=count, so the prompt (including
+    the user's letter) is paid for once. With tone presets there is one n-sampled
+    call per tone, run concurrently. Near-duplicate letters are dropped. Returns
+    a report with the variants and their latency and token cost.
+    """
+    plan = _variant_plan(count, tones)
+    client = get_openai_client()
+    started = time.perf_counter()
+
+    def run(step):
+        tone, n = step
+        with stage_timer("openai_variants"):
+            response = call_openai(client.chat.completions.create, **_variant_request(job_details, user_letter, tone, n))
+        variants = _variants_from_response(response, tone, started)
+        usage_stats.record("variants", getattr(response, "usage", None), COVER_LETTER_PROMPT, COVER_LETTER_MODEL, letters=len(variants[0]))
+        return variants
+
+    try:
+        if len(plan) == 1:
+            results = [run(plan[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=len(plan), thread_name_prefix="variants") as executor:
+                results = list(executor.map(run, plan))
+    except RateLimited:
+        raise
+    except Exception as e:
+        logger.error(f"Error generating cover letter variants: {e}")
+        raise Exception(f"Error generating cover letter: {e}")
+
+    return _variants_report(results, started, count)
+
+
+async def async_generate_cover_letter_variants(job_details, user_letter, count=3, tones=None):
+    """Async variant of generate_cover_letter_variants using AsyncOpenAI."""
+    plan = _variant_plan(count, tones)
+    client = get_async_openai_client()
+    started = time.perf_counter()
+
+    async def run(step):
+        tone, n = step
+        with stage_timer("openai_variants"):
+            response = await async_call_openai(client.chat.completions.create, **_variant_request(job_details, user_letter, tone, n))
+        variants = _variants_from_response(response, tone, started)
+        usage_stats.record("variants", getattr(response, "usage", None), COVER_LETTER_PROMPT, COVER_LETTER_MODEL, letters=len(variants[0]))
+        return variants
+
+    try:
+        results = await asyncio.gather(*(run(step) for step in plan))
+    except RateLimited:
+        raise
+    except Exception as e:
+        logger.error(f"Error generating cover letter variants: {e}")
+        raise Exception(f"Error generating cover letter: {e}")
+
+    return _variants_report(results, started, count)
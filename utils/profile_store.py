@@ -0,0 +1,173 @@
+import os
+import time
+import hashlib
+import logging
+
+from utils.cache import build_cache
+from utils.job_text import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Longest profile/résumé text accepted, in characters
+PROFILE_MAX_CHARS = int(os.getenv("PROFILE_MAX_CHARS", 50000))
+# The compact summary sent in prompts is cut to this many tokens
+PROFILE_SUMMARY_TOKEN_BUDGET = int(os.getenv("PROFILE_SUMMARY_TOKEN_BUDGET", 600))
+
+BULLETS = ("-", "*", "•", "–")
+
+# Used when the request has neither a profile ID nor letter text
+DEFAULT_PROFILE = """
+        Joshua Carr - Mechanical Engineer
+        Experience:
+        - Mincham Aviation: rebuilding and maintaining industrial equipment
+        - University of Glasgow: designing and prototyping mechanical systems  
+        - Buzz Drones: manufacturing high-precision components
+        """
+
+_store = None
+_store_ready = False
+
+
+def get_profile_store():
+    """Return the profile store, built lazily from PROFILE_STORE_* env vars.
+
+    Defaults to the SQLite backend so profiles survive restarts and are shared
+    by every worker; PROFILE_STORE_MAX_ENTRIES bounds it with LRU eviction.
+    """
+    global _store, _store_ready
+    if not _store_ready:
+        _store = build_cache(
+            "PROFILE_STORE", "profiles", default_max_entries=1000, default_ttl=90 * 86400, default_backend="sqlite"
+        )
+        _store_ready = True
+    return _store
+
+
+def set_profile_store(store):
+    """Swap in a different store backend (or None to disable stored profiles)."""
+    global _store, _store_ready
+    _store = store
+    _store_ready = True
+
+
+def _normalized_lines(text):
+    return [" ".join(line.split()) for line in text.splitlines() if line.strip()]
+
+
+def profile_hash(text):
+    """sha256 of the whitespace-normalized text, so re-saved copies of a file match."""
+    return hashlib.sha256("\n".join(_normalized_lines(text)).encode("utf-8")).hexdigest()
+
+
+def _unique_lines(text):
+    """Normalized lines with repeats (ignoring case) dropped."""
+    seen = set()
+    lines = []
+    for line in _normalized_lines(text):
+        if line.lower() not in seen:
+            seen.add(line.lower())
+            lines.append(line)
+    return lines
+
+
+def _is_heading(line):
+    return len(line.split()) <= 5 and not line.startswith(BULLETS) and (line.endswith(":") or line.isupper())
+
+
+def _sections(lines):
+    """Indexes of lines grouped into sections, each starting at a heading (the first may have none)."""
+    sections = [[]]
+    for i, line in enumerate(lines):
+        if _is_heading(line) and sections[-1]:
+            sections.append([])
+        sections[-1].append(i)
+    return sections
+
+
+def summarize_profile(text, budget_tokens=None):
+    """Compact prompt text: collapsed whitespace and repeated lines dropped, within the token budget.
+
+    An over-budget profile is not just cut off at the end: lines are taken from
+    each section in turn (heading first), so later sections such as skills or
+    education are still represented. save_profile reports what was left out.
+    """
+    budget_tokens = PROFILE_SUMMARY_TOKEN_BUDGET if budget_tokens is None else budget_tokens
+    lines = _unique_lines(text)
+    costs = [count_tokens(line) + 1 for line in lines]
+    if sum(costs) <= budget_tokens:
+        return "\n".join(lines)
+    kept = set()
+    used = 0
+    pending = _sections(lines)
+    while any(pending):
+        for section in pending:
+            if not section:
+                continue
+            i = section.pop(0)
+            if used + costs[i] > budget_tokens:
+                section.clear()  # keep each section's lines contiguous from its top
+                continue
+            kept.add(i)
+            used += costs[i]
+    return "\n".join(line for i, line in enumerate(lines) if i in kept)
+
+
+def summary_warning(profile):
+    """Message for API responses when the stored summary left part of the profile out, else None."""
+    omitted = profile.get("summary_omitted_lines")
+    if not omitted:
+        return None
+    return (
+        f"Profile is over the {profile.get('summary_budget_tokens', PROFILE_SUMMARY_TOKEN_BUDGET)}-token summary "
+        f"budget: {omitted} line(s) are left out of the summary used for generation. Shorten the profile, "
+        "or send the text as cover_letter_text to use all of it."
+    )
+
+
+def save_profile(text, filename=None):
+    """Store a profile and return its record; saving the same content again returns the existing one."""
+    if not text.strip():
+        raise ValueError("Profile text is empty")
+    if len(text) > PROFILE_MAX_CHARS:
+        raise ValueError(f"Profile is too long (max {PROFILE_MAX_CHARS} characters)")
+    store = get_profile_store()
+    if store is None:
+        raise ValueError("Profile storage is disabled")
+
+    content_hash = profile_hash(text)
+    profile_id = content_hash[:16]
+    record = store.get(profile_id)
+    if record is not None:
+        return record
+
+    summary = summarize_profile(text)
+    omitted = len(_unique_lines(text)) - len(summary.splitlines())
+    record = {
+        "profile_id": profile_id,
+        "content_hash": content_hash,
+        "filename": filename,
+        "text": text,
+        "summary": summary,
+        "text_tokens": count_tokens(text),
+        "summary_tokens": count_tokens(summary),
+        "summary_budget_tokens": PROFILE_SUMMARY_TOKEN_BUDGET,
+        "summary_truncated": omitted > 0,
+        "summary_omitted_lines": omitted,
+        "created_at": time.time(),
+    }
+    store.set(profile_id, record)
+    logger.info(f"Stored profile {profile_id} ({record['text_tokens']} -> {record['summary_tokens']} tokens)")
+    if omitted:
+        logger.warning(f"Profile {profile_id} summary leaves out {omitted} of its lines")
+    return record
+
+
+def get_profile(profile_id):
+    store = get_profile_store()
+    return store.get(profile_id) if store is not None and profile_id else None
+
+
+def delete_profile(profile_id):
+    store = get_profile_store()
+    if store is not None:
+        store.delete(profile_id)
@@ -0,0 +1,140 @@
+"""Versioned prompt templates for the OpenAI calls.
+
+Every template puts its static text first: one system message holding the
+role and all instructions, identical byte-for-byte on every request. The
+per-request parts follow in the user message, ordered from most to least
+stable (the user's profile, then the job, then today's date), so OpenAI's
+automatic prompt-prefix caching can reuse as much of each prompt as possible.
+That only lowers cost on models with prompt caching (gpt-4o and later); the
+default gpt-4-turbo bills cached tokens at the full input rate, so pick the
+models with OPENAI_INTERPRET_MODEL / OPENAI_COVER_LETTER_MODEL.
+
+Changing any template text changes its fingerprint; bump `version` as well
+when the change is deliberate so logs and metrics show which prompt ran.
+"""
+import hashlib
+
+
+class PromptTemplate:
+    """A named, versioned prompt: a static system prefix plus a per-request user message."""
+
+    def __init__(self, name, version, system, instructions, user_template):
+        self.name = name
+        self.version = version
+        self.system = system
+        self.instructions = instructions
+        self.user_template = user_template
+        self.prefix = f"{system}\n\n{instructions}"
+        self.fingerprint = hashlib.sha256(
+            (self.prefix + "\0" + user_template).encode("utf-8")
+        ).hexdigest()[:12]
+
+    @property
+    def id(self):
+        return f"{self.name}@{self.version}"
+
+    def messages(self, **fields):
+        return [
+            {"role": "system", "content": self.prefix},
+            {"role": "user", "content": self.user_template.format(**fields)},
+        ]
+
+
+JOB_DATA_SCHEMA = """Required fields:
+- "job_title": string
+- "company_name": string
+- "job_description": string (summary of main responsibilities)
+- "experience": array of strings (years required, specific experience)
+- "skills": array of strings (technical and soft skills)
+- "software": array of strings (specific software/tools mentioned)
+- "additional_requirements": string (education, certifications, etc.)
+- "preferred_qualifications": array of strings (nice-to-have qualifications)
+- "other_notes": string (location, work type, salary range if mentioned)"""
+
+IRRELEVANT_CONTENT = """Filter out any irrelevant content such as:
+- Advertisements or marketing content
+- Website navigation elements
+- Proxy service mentions (like BrightData, Bright Data, etc.)
+- Cookie notices or privacy policies
+- Social media links or unrelated content"""
+
+COVER_LETTER_REQUIREMENTS = """Cover letter requirements:
+- Base it on the user's existing letter/profile, personalized for the job
+- Use the date given as today's date
+- Professional, engaging tone
+- Highlight relevant experience from the user's background that matches the job requirements
+- Address specific skills and requirements mentioned in the job posting
+- Keep it concise (under 400 words)
+- Use the exact company name and job title from the job posting
+- Do not mention irrelevant companies like BrightData or proxy services
+- Return only the cover letter text, no markdown or extra formatting"""
+
+INTERPRET_PROMPT = PromptTemplate(
+    name="interpret",
+    version="2",
+    system=(
+        "You are an expert at extracting structured job data from web pages. "
+        "Focus only on actual job posting content. Return only valid JSON, no markdown or extra text."
+    ),
+    instructions=f"""Extract the job details from the job posting text in the user message as a JSON object.
+
+{IRRELEVANT_CONTENT}
+
+Focus ONLY on the actual job posting content: job title and company name, description and
+responsibilities, required skills and experience, qualifications and software requirements.
+
+{JOB_DATA_SCHEMA}""",
+    user_template="Job Posting Text (may contain irrelevant content to filter out):\n{job_text}",
+)
+
+COVER_LETTER_PROMPT = PromptTemplate(
+    name="cover_letter",
+    version="2",
+    system=(
+        "You are a professional cover letter writer. Create personalized, engaging cover letters "
+        "that highlight relevant experience for specific job postings."
+    ),
+    instructions=f"""Write a cover letter for the job described in the user message.
+
+{COVER_LETTER_REQUIREMENTS}""",
+    user_template="""User's existing letter/profile:
+{user_letter}
+
+Job Details:
+- Job Title: {job_title}
+- Company Name: {company_name}
+- Job Description: {job_description}
+- Required Skills: {skills}
+- Required Experience: {experience}
+- Software/Tools: {software}
+
+Today's date: {current_date}""",
+)
+
+ONE_SHOT_PROMPT = PromptTemplate(
+    name="one_shot",
+    version="2",
+    system=(
+        "You are an expert at reading job postings and a professional cover letter writer. "
+        "Return only a JSON object."
+    ),
+    instructions=f"""Extract the details of the job posting in the user message, then write a cover letter for it.
+Return a JSON object with exactly two keys:
+- "job_data": object with the fields below
+- "cover_letter": string, the cover letter text
+
+{IRRELEVANT_CONTENT}
+
+{JOB_DATA_SCHEMA}
+
+{COVER_LETTER_REQUIREMENTS}""",
+    user_template="""User's existing letter/profile:
+{user_letter}
+
+Job Posting Text (may contain irrelevant content to filter out):
+{job_text}
+
+Today's date: {current_date}""",
+)
+
+TEMPLATES = {template.name: template for template in (INTERPRET_PROMPT, COVER_LETTER_PROMPT, ONE_SHOT_PROMPT)}
@@ -0,0 +1,325 @@
+"""Adaptive token buckets and circuit breakers shared by every worker on the host.
+
+Direct scraping has a bucket and a breaker per target domain; the OpenAI API
+has one of each. Their state lives in a small SQLite file
+(RATE_LIMIT_BACKEND=sqlite, the default) so all gunicorn workers draw from the
+same buckets and see the same open breakers; "memory" keeps state per process.
+
+Buckets adapt: penalize() (after a block page or a 429) halves a key's rate
+and drains its burst, and the rate then climbs back linearly to the
+configured value.
+"""
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import logging
+import threading
+
+from utils.metrics import BREAKER_OPENS, RATE_LIMIT_REJECTS, RATE_LIMIT_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "sqlite").lower()
+RATE_LIMIT_PATH = os.getenv("RATE_LIMIT_PATH", os.path.join("cache", "rate_limit.sqlite3"))
+
+
+class RateLimited(Exception):
+    """Raised when a call would exceed a rate limit or its circuit breaker is open.
+
+    retry_after is a hint in seconds for the client (sent as Retry-After).
+    """
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class MemoryStateStore:
+    """Per-process store of small JSON-serializable state dicts."""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            state = self._data.get(key)
+            return dict(state) if state is not None else None
+
+    def update(self, key, func):
+        """Atomically replace the state at key with func(state)[0] (None deletes it); returns func(state)[1]."""
+        with self._lock:
+            state = self._data.get(key)
+            state, result = func(dict(state) if state is not None else None)
+            if state is None:
+                self._data.pop(key, None)
+            else:
+                self._data[key] = state
+            return result
+
+    def items(self, prefix):
+        with self._lock:
+            return [(key, dict(state)) for key, state in self._data.items() if key.startswith(prefix)]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SQLiteStateStore:
+    """State store in SQLite; update() runs in an immediate transaction so workers never race."""
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS limiter_state (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def get(self, key):
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT value FROM limiter_state WHERE key = ?", (key,)).fetchone()
+            return json.loads(row[0]) if row else None
+        finally:
+            conn.close()
+
+    def update(self, key, func):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT value FROM limiter_state WHERE key = ?", (key,)).fetchone()
+                state, result = func(json.loads(row[0]) if row else None)
+                if state is None:
+                    conn.execute("DELETE FROM limiter_state WHERE key = ?", (key,))
+                else:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO limiter_state (key, value) VALUES (?, ?)", (key, json.dumps(state))
+                    )
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return result
+        finally:
+            conn.close()
+
+    def items(self, prefix):
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT key, value FROM limiter_state WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+            ).fetchall()
+            return [(key, json.loads(value)) for key, value in rows]
+        finally:
+            conn.close()
+
+    def clear(self):
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM limiter_state")
+        finally:
+            conn.close()
+
+
+_store = None
+_store_ready = False
+_store_lock = threading.Lock()
+
+
+def get_rate_limit_store():
+    """Return the configured state store, building it on first use."""
+    global _store, _store_ready
+    with _store_lock:
+        if not _store_ready:
+            if RATE_LIMIT_BACKEND == "sqlite":
+                _store = SQLiteStateStore(RATE_LIMIT_PATH)
+            else:
+                if RATE_LIMIT_BACKEND != "memory":
+                    logger.warning(f"Unknown RATE_LIMIT_BACKEND '{RATE_LIMIT_BACKEND}', using in-memory state")
+                _store = MemoryStateStore()
+            _store_ready = True
+        return _store
+
+
+def set_rate_limit_store(store):
+    """Swap the state store (used by tests)."""
+    global _store, _store_ready
+    with _store_lock:
+        _store = store
+        _store_ready = True
+
+
+class TokenBucket:
+    """Token bucket per key (e.g. a domain), refilled at `rate` tokens/s up to `burst`.
+
+    Callers reserve a token and then sleep until it is due, so waiters are
+    served in arrival order without polling the store.
+    """
+
+    def __init__(self, name, rate, burst, min_rate=None, recovery=None):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate if min_rate is not None else rate / 16
+        # Rate regained per second after a penalty; from half rate back to full in 30s by default
+        self.recovery = recovery if recovery is not None else rate / 60
+
+    def _key(self, key):
+        return f"bucket:{self.name}:{key}"
+
+    def _refill(self, state, now):
+        if state is None:
+            return {"tokens": float(self.burst), "rate": self.rate, "at": now}
+        elapsed = max(0.0, now - state["at"])
+        rate = min(self.rate, state["rate"] + self.recovery * elapsed)
+        # Tokens earned at the average rate over the interval
+        earned = elapsed * (state["rate"] + rate) / 2
+        return {"tokens": min(float(self.burst), state["tokens"] + earned), "rate": rate, "at": now}
+
+    def reserve(self, key, max_wait):
+        """Reserve a token; returns (granted, seconds until it may be used).
+
+        Nothing is reserved when the wait would exceed max_wait.
+        """
+        now = time.time()
+
+        def take(state):
+            state = self._refill(state, now)
+            wait = max(0.0, (1 - state["tokens"]) / state["rate"])
+            if wait > max_wait:
+                return state, (False, wait)
+            state["tokens"] -= 1
+            return state, (True, wait)
+
+        return get_rate_limit_store().update(self._key(key), take)
+
+    def _rejected(self, key, wait):
+        RATE_LIMIT_REJECTS.inc(limiter=self.name)
+        return RateLimited(f"Rate limit for {key} reached; please try again shortly", retry_after=wait)
+
+    def acquire(self, key, max_wait):
+        """Block until a token is available; raises RateLimited if that would take longer than max_wait."""
+        granted, wait = self.reserve(key, max_wait)
+        if not granted:
+            raise self._rejected(key, wait)
+        RATE_LIMIT_WAIT_SECONDS.observe(wait, limiter=self.name)
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    async def async_acquire(self, key, max_wait):
+        granted, wait = await asyncio.to_thread(self.reserve, key, max_wait)
+        if not granted:
+            raise self._rejected(key, wait)
+        RATE_LIMIT_WAIT_SECONDS.observe(wait, limiter=self.name)
+        if wait:
+            await asyncio.sleep(wait)
+        return wait
+
+    def penalize(self, key, factor=0.5):
+        """Cut key's rate and drain its burst after the target pushed back; returns the new rate."""
+        now = time.time()
+
+        def cut(state):
+            state = self._refill(state, now)
+            state["rate"] = max(self.min_rate, state["rate"] * factor)
+            state["tokens"] = min(state["tokens"], 0.0)
+            return state, state["rate"]
+
+        rate = get_rate_limit_store().update(self._key(key), cut)
+        logger.info(f"Rate limit {self.name} for {key} lowered to {rate:.2f}/s")
+        return rate
+
+    def current_rate(self, key):
+        state = get_rate_limit_store().get(self._key(key))
+        return self._refill(state, time.time())["rate"]
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker per key.
+
+    After `threshold` failures in a row the breaker opens for `cooldown`
+    seconds and allow() returns False. Once that passes, one caller at a time
+    is let through as a probe: a success closes the breaker, a failure opens
+    it again.
+    """
+
+    def __init__(self, name, threshold, cooldown, probe_timeout=30.0):
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.probe_timeout = probe_timeout
+
+    def _key(self, key):
+        return f"breaker:{self.name}:{key}"
+
+    def allow(self, key):
+        store = get_rate_limit_store()
+        state = store.get(self._key(key))
+        # Closed breakers only need a read
+        if not state or state.get("open_until") is None:
+            return True
+        now = time.time()
+        if now < state["open_until"]:
+            return False
+
+        def probe(state):
+            if not state or state.get("open_until") is None:
+                return state, True
+            if now < state["open_until"]:
+                return state, False
+            # Hold other callers back while this probe runs
+            state["open_until"] = now + self.probe_timeout
+            return state, True
+
+        return store.update(self._key(key), probe)
+
+    def retry_after(self, key):
+        state = get_rate_limit_store().get(self._key(key))
+        if not state or state.get("open_until") is None:
+            return 0.0
+        return max(0.0, state["open_until"] - time.time())
+
+    def record_success(self, key):
+        store = get_rate_limit_store()
+        if store.get(self._key(key)) is not None:
+            store.update(self._key(key), lambda state: (None, None))
+
+    def record_failure(self, key):
+        """Count a failure; returns True if the breaker is (now) open."""
+        now = time.time()
+
+        def fail(state):
+            state = state or {"failures": 0, "open_until": None}
+            state["failures"] += 1
+            opened = state["failures"] >= self.threshold
+            if opened:
+                state["open_until"] = now + self.cooldown
+            return state, (opened, state["failures"] == self.threshold)
+
+        is_open, just_opened = get_rate_limit_store().update(self._key(key), fail)
+        if just_opened:
+            BREAKER_OPENS.inc(breaker=self.name)
+            logger.warning(f"Circuit breaker {self.name} opened for {key} for {self.cooldown:.0f}s")
+        return is_open
+
+    def open_keys(self):
+        """{key: seconds until a probe is allowed} for every breaker of this name that is open."""
+        prefix = self._key("")
+        now = time.time()
+        return {
+            key[len(prefix):]: round(state["open_until"] - now, 1)
+            for key, state in get_rate_limit_store().items(prefix)
+            if state.get("open_until") is not None and state["open_until"] > now
+        }
@@ -0,0 +1,277 @@
+"""Single-flight coalescing: concurrent calls with the same key share one computation.
+
+Within a process, callers that arrive while a call for their key is running
+wait for it and get its result (or exception). With the shared SQLite store
+(SINGLE_FLIGHT_BACKEND=sqlite, the default) the same holds across gunicorn
+workers: the first worker takes a lease on the key, the others poll for the
+result it publishes. A leader whose call raises publishes a short-lived
+failure instead, which its followers re-raise, so a failing upstream is not
+retried once per waiting worker. If the leader goes away without publishing
+(crash, cancellation, expired lease), a waiting worker runs the call itself.
+
+SINGLE_FLIGHT_BACKEND=memory coalesces within each process only; "none"
+turns coalescing off.
+"""
+import os
+import time
+import uuid
+import asyncio
+import logging
+import threading
+
+from utils.cache import SQLiteCache
+from utils.metrics import COALESCED_REQUESTS
+from utils.rate_limit import RateLimited, SQLiteStateStore
+
+logger = logging.getLogger(__name__)
+
+SINGLE_FLIGHT_BACKEND = os.getenv("SINGLE_FLIGHT_BACKEND", "sqlite").lower()
+SINGLE_FLIGHT_PATH = os.getenv("SINGLE_FLIGHT_PATH", os.path.join("cache", "single_flight.sqlite3"))
+# A lease outliving this many seconds is treated as a crashed leader
+SINGLE_FLIGHT_LEASE_TTL = float(os.getenv("SINGLE_FLIGHT_LEASE_TTL", 120))
+# Longest a worker waits on another worker's call before running its own
+SINGLE_FLIGHT_WAIT = float(os.getenv("SINGLE_FLIGHT_WAIT", 90))
+SINGLE_FLIGHT_POLL = float(os.getenv("SINGLE_FLIGHT_POLL", 0.1))
+# Published results only need to outlive the waiting workers' next poll
+SINGLE_FLIGHT_RESULT_TTL = int(os.getenv("SINGLE_FLIGHT_RESULT_TTL", 60))
+# A published failure is shared with the workers already waiting, then forgotten so later calls retry
+SINGLE_FLIGHT_ERROR_TTL = int(os.getenv("SINGLE_FLIGHT_ERROR_TTL", 5))
+
+_shared = None
+_shared_ready = False
+_shared_lock = threading.Lock()
+
+
+def get_shared_flights():
+    """(lease store, result cache) shared by the workers on this host, or None when coalescing is per process."""
+    global _shared, _shared_ready
+    with _shared_lock:
+        if not _shared_ready:
+            if SINGLE_FLIGHT_BACKEND == "sqlite":
+                _shared = (
+                    SQLiteStateStore(SINGLE_FLIGHT_PATH),
+                    SQLiteCache(SINGLE_FLIGHT_PATH, namespace="single_flight", max_entries=1000,
+                                ttl=SINGLE_FLIGHT_RESULT_TTL),
+                )
+            elif SINGLE_FLIGHT_BACKEND not in ("memory", "none"):
+                logger.warning(f"Unknown SINGLE_FLIGHT_BACKEND '{SINGLE_FLIGHT_BACKEND}', coalescing per process")
+            _shared_ready = True
+        return _shared
+
+
+def set_shared_flights(shared):
+    """Swap the shared (lease store, result cache) pair; None coalesces per process (used by tests)."""
+    global _shared, _shared_ready
+    with _shared_lock:
+        _shared = shared
+        _shared_ready = True
+
+
+def _take_lease(flight_id, now):
+    def take(state):
+        if state is None or state["expires_at"] <= now:
+            return {"id": flight_id, "expires_at": now + SINGLE_FLIGHT_LEASE_TTL}, flight_id
+        return state, state["id"]
+    return take
+
+
+def _release_lease(flight_id):
+    def release(state):
+        if state is not None and state["id"] == flight_id:
+            return None, None
+        return state, None
+    return release
+
+
+def _error_record(err):
+    record = {"error": str(err), "kind": "exception"}
+    if isinstance(err, RateLimited):
+        record.update(kind="rate_limited", retry_after=err.retry_after)
+    elif isinstance(err, ValueError):
+        record["kind"] = "value_error"
+    return record
+
+
+def _error_from_record(record):
+    if record["kind"] == "rate_limited":
+        return RateLimited(record["error"], retry_after=record.get("retry_after"))
+    if record["kind"] == "value_error":
+        return ValueError(record["error"])
+    return Exception(record["error"])
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls per key; `name` labels the metrics and lease keys."""
+
+    def __init__(self, name):
+        self.name = name
+        self._flights = {}
+        self._async_flights = {}
+        self._lock = threading.Lock()
+
+    def _lease_key(self, key):
+        return f"flight:{self.name}:{key}"
+
+    def _lead(self, shared, lease_key):
+        """Try to take the lease; returns (our flight id, id of the flight holding the lease)."""
+        flight_id = uuid.uuid4().hex
+        return flight_id, shared[0].update(lease_key, _take_lease(flight_id, time.time()))
+
+    def _publish(self, shared, lease_key, flight_id, value):
+        shared[1].set(f"{lease_key}:{flight_id}", {"value": value})
+        shared[0].update(lease_key, _release_lease(flight_id))
+
+    def _publish_error(self, shared, lease_key, flight_id, err):
+        shared[1].set(f"{lease_key}:{flight_id}", _error_record(err), ttl=SINGLE_FLIGHT_ERROR_TTL)
+        shared[0].update(lease_key, _release_lease(flight_id))
+
+    def _poll(self, shared, lease_key, holder):
+        """("done", value) once the holder published, ("failed", error) if its call raised,
+        ("gone", None) if it stopped without publishing, else ("waiting", None)."""
+        leases, results = shared
+        result = results.get(f"{lease_key}:{holder}")
+        if result is None:
+            lease = leases.get(lease_key)
+            if lease is not None and lease["id"] == holder and lease["expires_at"] > time.time():
+                return "waiting", None
+            # The result may have been published between the two reads
+            result = results.get(f"{lease_key}:{holder}")
+            if result is None:
+                return "gone", None
+        if "error" in result:
+            return "failed", _error_from_record(result)
+        return "done", result["value"]
+
+    def _run_shared(self, key, func):
+        shared = get_shared_flights()
+        if shared is None:
+            return func()
+        lease_key = self._lease_key(key)
+        deadline = time.time() + SINGLE_FLIGHT_WAIT
+        while time.time() < deadline:
+            flight_id, holder = self._lead(shared, lease_key)
+            if holder == flight_id:
+                try:
+                    value = func()
+                except Exception as err:
+                    self._publish_error(shared, lease_key, flight_id, err)
+                    raise
+                except BaseException:
+                    shared[0].update(lease_key, _release_lease(flight_id))
+                    raise
+                self._publish(shared, lease_key, flight_id, value)
+                return value
+            status, value = "waiting", None
+            while status == "waiting" and time.time() < deadline:
+                time.sleep(SINGLE_FLIGHT_POLL)
+                status, value = self._poll(shared, lease_key, holder)
+            if status in ("done", "failed"):
+                COALESCED_REQUESTS.inc(flight=self.name, scope="host")
+                if status == "failed":
+                    raise value
+                return value
+        logger.warning(f"Gave up waiting on another worker for {self.name}; running the call here")
+        return func()
+
+    def do(self, key, func):
+        """Return func(), or the result of the identical call already in flight."""
+        if SINGLE_FLIGHT_BACKEND == "none":
+            return func()
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            COALESCED_REQUESTS.inc(flight=self.name, scope="worker")
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        succeeded = False
+        try:
+            flight.value = self._run_shared(key, func)
+            succeeded = True
+            return flight.value
+        except Exception as err:
+            flight.error = err
+            raise
+        finally:
+            if not succeeded and flight.error is None:
+                # KeyboardInterrupt, SystemExit and the like: followers must not wake up to a None result
+                flight.error = Exception(f"The shared {self.name} call was interrupted")
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    async def _async_run_shared(self, key, func):
+        shared = await asyncio.to_thread(get_shared_flights)
+        if shared is None:
+            return await func()
+        lease_key = self._lease_key(key)
+        deadline = time.time() + SINGLE_FLIGHT_WAIT
+        while time.time() < deadline:
+            flight_id, holder = await asyncio.to_thread(self._lead, shared, lease_key)
+            if holder == flight_id:
+                try:
+                    value = await func()
+                except Exception as err:
+                    await asyncio.to_thread(self._publish_error, shared, lease_key, flight_id, err)
+                    raise
+                except BaseException:
+                    await asyncio.to_thread(shared[0].update, lease_key, _release_lease(flight_id))
+                    raise
+                await asyncio.to_thread(self._publish, shared, lease_key, flight_id, value)
+                return value
+            status, value = "waiting", None
+            while status == "waiting" and time.time() < deadline:
+                await asyncio.sleep(SINGLE_FLIGHT_POLL)
+                status, value = await asyncio.to_thread(self._poll, shared, lease_key, holder)
+            if status in ("done", "failed"):
+                COALESCED_REQUESTS.inc(flight=self.name, scope="host")
+                if status == "failed":
+                    raise value
+                return value
+        logger.warning(f"Gave up waiting on another worker for {self.name}; running the call here")
+        return await func()
+
+    async def async_do(self, key, func):
+        """Async variant of do(); func is a coroutine function taking no arguments."""
+        if SINGLE_FLIGHT_BACKEND == "none":
+            return await func()
+        flight = self._async_flights.get(key)
+        if flight is not None:
+            COALESCED_REQUESTS.inc(flight=self.name, scope="worker")
+            try:
+                return await asyncio.shield(flight)
+            except asyncio.CancelledError:
+                if flight.cancelled():
+                    # The leading request went away; start again rather than fail this one
+                    return await self.async_do(key, func)
+                raise
+
+        flight = asyncio.get_running_loop().create_future()
+        self._async_flights[key] = flight
+        try:
+            value = await self._async_run_shared(key, func)
+        except Exception as err:
+            flight.set_exception(err)
+            flight.exception()  # mark retrieved, so a flight without followers does not log a warning
+            raise
+        except BaseException:
+            flight.cancel()
+            raise
+        else:
+            flight.set_result(value)
+            return value
+        finally:
+            if self._async_flights.get(key) is flight:
+                del self._async_flights[key]
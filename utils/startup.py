@@ -0,0 +1,40 @@
+"""Startup hooks for running under gunicorn with preload_app (see gunicorn.conf.py).
+
+Heavy libraries are imported where they are first used, so `import app` and a
+worker booted without preload only pay for what they touch. With preload the
+master calls preload() once before forking: the libraries every worker needs
+are imported and the tokenizer is loaded there, so their memory is shared
+copy-on-write instead of being rebuilt in each worker. Sockets and API
+clients cannot be shared, so warm_worker() builds them after the fork.
+"""
+import gc
+import os
+import time
+import logging
+
+from utils.http_pools import optional_import, pools
+from utils.job_text import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Imported in the master; python-docx (uploads only) and httpx (async app) are left to first use
+PRELOAD_MODULES = [
+    name.strip()
+    for name in os.getenv("PRELOAD_MODULES", "requests,cloudscraper,openai,tiktoken,lxml.html").split(",")
+    if name.strip()
+]
+
+
+def preload():
+    """Import PRELOAD_MODULES and load the tokenizer in the gunicorn master, before workers fork."""
+    started = time.perf_counter()
+    loaded = [name for name in PRELOAD_MODULES if optional_import(name) is not None]
+    count_tokens("warm up")  # loads the tiktoken encoding once for every worker
+    # Keep the collector from touching (and so copying) the preloaded objects in each worker
+    gc.freeze()
+    logger.info(f"Preloaded {', '.join(loaded) or 'nothing'} in {(time.perf_counter() - started) * 1000:.0f}ms")
+
+
+def warm_worker():
+    """Build the per-worker clients once, right after the fork, so no request pays for them."""
+    pools.warm()